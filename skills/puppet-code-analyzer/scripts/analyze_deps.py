@@ -8,77 +8,593 @@ detect circular dependencies, and identify missing or unused dependencies.
 Usage:
     python3 analyze_deps.py <path-to-module-or-manifests>
     python3 analyze_deps.py --mermaid <path-to-module-or-manifests>
+    python3 analyze_deps.py --format dot --output deps.dot <path-to-module-or-manifests>
+    python3 analyze_deps.py --condense --focus profile --depth 2 <path-to-control-repo>
+    python3 analyze_deps.py --jobs 8 <path-to-control-repo>
+    python3 analyze_deps.py --impacted-by profile::base <path-to-control-repo>
+    python3 analyze_deps.py --watch --mermaid <path-to-module-or-manifests>
+    python3 analyze_deps.py --changed-since origin/main <path-to-control-repo>
+    python3 analyze_deps.py --profile --no-cache <path-to-control-repo>
 """
 
 import argparse
+import ctypes
+import ctypes.util
+import hashlib
+import heapq
+import io
+import json
+import os
 import re
+import select
+import sqlite3
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from array import array
+from collections import defaultdict, deque
+from collections.abc import Mapping, Sequence, Set as AbstractSet
 from pathlib import Path
-from typing import Dict, List, Set, Tuple
-from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Set, TextIO, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+from analyzer_common import SqliteCache, default_cache_dir, git_changed_files
+
+
+class _NodeView(AbstractSet):
+    """Read-only set view of the classes currently in a graph."""
+
+    def __init__(self, graph: "DependencyGraph"):
+        self._graph = graph
+
+    @classmethod
+    def _from_iterable(cls, iterable) -> Set[str]:
+        return set(iterable)
+
+    def __contains__(self, class_name) -> bool:
+        node = self._graph._ids.get(class_name)
+        return node is not None and self._graph._alive(node)
+
+    def __iter__(self) -> Iterator[str]:
+        graph = self._graph
+        for node, name in enumerate(graph._names):
+            if graph._alive(node):
+                yield name
+
+    def __len__(self) -> int:
+        return len(self._graph._names) - self._graph._dead_nodes
+
+
+class _EdgeView(Sequence):
+    """Read-only ``(source, target, relationship)`` view of a graph's edges."""
+
+    def __init__(self, graph: "DependencyGraph"):
+        self._graph = graph
+
+    def __len__(self) -> int:
+        return len(self._graph._edge_source) - self._graph._dead_edges
+
+    def __getitem__(self, i: int) -> Tuple[str, str, str]:
+        g = self._graph
+        g._compact()
+        return g._names[g._edge_source[i]], g._names[g._edge_target[i]], g._relationships[g._edge_kind[i]]
+
+    def __iter__(self) -> Iterator[Tuple[str, str, str]]:
+        g = self._graph
+        names, relationships = g._names, g._relationships
+        for source, target, kind in zip(g._edge_source, g._edge_target, g._edge_kind):
+            if kind != g.REMOVED:
+                yield names[source], names[target], relationships[kind]
+
+
+class _AdjacencyView(Mapping):
+    """Read-only ``class -> direct dependencies`` view backed by the CSR arrays."""
+
+    def __init__(self, graph: "DependencyGraph"):
+        self._graph = graph
+        self._offsets, self._targets, _ = graph._adjacency_csr()
+
+    def __getitem__(self, class_name: str) -> Tuple[str, ...]:
+        node = self._graph._ids[class_name]
+        names = self._graph._names
+        return tuple(names[t] for t in self._targets[self._offsets[node]:self._offsets[node + 1]])
+
+    def __iter__(self) -> Iterator[str]:
+        offsets = self._offsets
+        for node, name in enumerate(self._graph._names):
+            if offsets[node + 1] > offsets[node]:
+                yield name
+
+    def __len__(self) -> int:
+        offsets = self._offsets
+        return sum(1 for node in range(len(offsets) - 1) if offsets[node + 1] > offsets[node])
 
 
 class DependencyGraph:
-    """Represents Puppet class dependencies."""
+    """Represents Puppet class dependencies.
+
+    Class names are interned to integer ids and each typed edge is stored
+    once, in parallel arrays, with a reference count so that edges and
+    classes contributed by several files can be removed again one file at a
+    time. Graph algorithms run over a CSR (compressed sparse row) adjacency
+    that is built on first use. Changes made after that are kept in a small
+    per-node overlay, so cycle detection can be updated incrementally
+    instead of rebuilding the whole structure.
+    """
+
+    # Edge kind marking a removed edge until the arrays are compacted
+    REMOVED = 255
 
     def __init__(self):
-        self.nodes: Set[str] = set()
-        self.edges: List[Tuple[str, str, str]] = []  # (from, to, relationship)
-        self.adjacency: Dict[str, Set[str]] = defaultdict(set)
+        self._ids: Dict[str, int] = {}
+        self._names: List[str] = []
+        self._class_refs = array("I")  # add_class calls per node
+        self._edge_count = array("I")  # live typed edges touching each node
+        self._dead_nodes = 0
+        self._relationship_ids: Dict[str, int] = {}
+        self._relationships: List[str] = []
+        self._edge_source = array("I")
+        self._edge_target = array("I")
+        self._edge_kind = array("B")
+        self._edge_refs = array("I")
+        self._edge_index: Dict[int, int] = {}  # edge key -> position in the arrays
+        self._dead_edges = 0
+        # (offsets, targets, rank): neighbours of node n are
+        # targets[offsets[n]:offsets[n + 1]], ordered by class name
+        self._csr: Optional[Tuple[array, array, array]] = None
+        # node -> full neighbour list (by name) for nodes changed since the CSR build
+        self._overlay: Dict[int, List[int]] = {}
+        self._scc: Optional[List[List[int]]] = None
+        # Cyclic components by start node: (members, representative cycle)
+        self._cyclic: Optional[Dict[int, Tuple[List[int], List[str]]]] = None
+        self._cyclic_key: Dict[int, int] = {}
+        self._added_pairs: Set[Tuple[int, int]] = set()
+        self._removed_pairs: Set[Tuple[int, int]] = set()
+        self._cycles: Optional[List[List[str]]] = None
+        self._reachability: Optional["ReachabilityIndex"] = None
+
+    @property
+    def nodes(self) -> AbstractSet[str]:
+        """All class names, as a read-only set view."""
+        return _NodeView(self)
+
+    @property
+    def edges(self) -> Sequence[Tuple[str, str, str]]:
+        """Unique ``(source, target, relationship)`` edges in insertion order."""
+        return _EdgeView(self)
+
+    @property
+    def adjacency(self) -> Mapping[str, Tuple[str, ...]]:
+        """Direct dependencies of each class, sorted by name."""
+        return _AdjacencyView(self)
+
+    def _alive(self, node: int) -> bool:
+        return bool(self._class_refs[node] or self._edge_count[node])
+
+    def _intern(self, class_name: str) -> int:
+        """Return the id for a class name, assigning one if it is new."""
+        node = self._ids.get(class_name)
+        if node is None:
+            class_name = sys.intern(class_name)
+            node = len(self._names)
+            self._ids[class_name] = node
+            self._names.append(class_name)
+            self._class_refs.append(0)
+            self._edge_count.append(0)
+            # Born dead; the caller's reference brings it to life
+            self._dead_nodes += 1
+        return node
+
+    def _retain(self, node: int, counter: array):
+        if not self._alive(node):
+            self._dead_nodes -= 1
+            self._scc = None
+            self._reachability = None
+        counter[node] += 1
+
+    def _release(self, node: int, counter: array):
+        counter[node] -= 1
+        if not self._alive(node):
+            self._dead_nodes += 1
+            self._scc = None
+            self._reachability = None
 
     def add_class(self, class_name: str):
         """Add a class to the graph."""
-        self.nodes.add(class_name)
+        # An isolated node cannot close a cycle, so the cycle cache stays valid
+        self._retain(self._intern(class_name), self._class_refs)
+
+    def remove_class(self, class_name: str):
+        """Undo one ``add_class``; the class stays while edges still use it."""
+        node = self._ids.get(class_name)
+        if node is not None and self._class_refs[node]:
+            self._release(node, self._class_refs)
+
+    def _edge_key(self, source: str, target: str, relationship: str) -> Tuple[int, int, int]:
+        kind = self._relationship_ids.get(relationship)
+        if kind is None:
+            kind = len(self._relationships)
+            self._relationship_ids[relationship] = kind
+            self._relationships.append(relationship)
+        src = self._intern(source)
+        dst = self._intern(target)
+        return src, dst, (src << 40) | (dst << 8) | kind
+
+    def _has_pair(self, src: int, dst: int) -> bool:
+        """Whether any live edge, of any relationship, links src to dst."""
+        base = (src << 40) | (dst << 8)
+        return any(base | kind in self._edge_index for kind in range(len(self._relationships)))
 
     def add_dependency(self, source: str, target: str, relationship: str):
-        """Add a dependency edge."""
-        self.nodes.add(source)
-        self.nodes.add(target)
-        self.edges.append((source, target, relationship))
-        self.adjacency[source].add(target)
+        """Add a dependency edge; repeated edges are stored once and counted."""
+        src, dst, key = self._edge_key(source, target, relationship)
+        position = self._edge_index.get(key)
+        if position is not None:
+            self._edge_refs[position] += 1
+            return
+
+        new_pair = not self._has_pair(src, dst)
+        self._edge_index[key] = len(self._edge_source)
+        self._edge_source.append(src)
+        self._edge_target.append(dst)
+        self._edge_kind.append(key & 0xFF)
+        self._edge_refs.append(1)
+        self._retain(src, self._edge_count)
+        self._retain(dst, self._edge_count)
+        if new_pair:
+            self._pair_changed(src, dst, True)
+
+    def remove_dependency(self, source: str, target: str, relationship: str):
+        """Undo one ``add_dependency``; the edge goes once no reference remains."""
+        if source not in self._ids or target not in self._ids or relationship not in self._relationship_ids:
+            return
+        src, dst, key = self._edge_key(source, target, relationship)
+        position = self._edge_index.get(key)
+        if position is None:
+            return
+
+        self._edge_refs[position] -= 1
+        if self._edge_refs[position]:
+            return
+
+        del self._edge_index[key]
+        self._edge_kind[position] = self.REMOVED
+        self._dead_edges += 1
+        self._release(src, self._edge_count)
+        self._release(dst, self._edge_count)
+        if not self._has_pair(src, dst):
+            self._pair_changed(src, dst, False)
+
+    def _pair_changed(self, src: int, dst: int, present: bool):
+        """Record that the untyped adjacency src -> dst appeared or vanished."""
+        if self._csr is not None:
+            neighbors = [n for n in self._neighbors(src) if n != dst]
+            if present:
+                neighbors.append(dst)
+                neighbors.sort(key=self._names.__getitem__)
+            self._overlay[src] = neighbors
+
+        if self._cyclic is not None:
+            pair = (src, dst)
+            added, removed = (self._added_pairs, self._removed_pairs) if present \
+                else (self._removed_pairs, self._added_pairs)
+            # A pair removed and re-added (or vice versa) is no change at all
+            if pair in removed:
+                removed.discard(pair)
+            else:
+                added.add(pair)
+
+        self._scc = None
+        self._cycles = None
+        self._reachability = None
+
+    def _neighbors(self, node: int) -> Sequence[int]:
+        """Current direct dependencies of node, ordered by name (CSR must exist)."""
+        changed = self._overlay.get(node)
+        if changed is not None:
+            return changed
+        offsets, targets, _ = self._csr
+        if node + 1 < len(offsets):
+            return targets[offsets[node]:offsets[node + 1]]
+        return ()
+
+    def _compact(self):
+        """Drop removed edges and dead classes from the arrays, renumbering ids."""
+        if not self._dead_edges and not self._dead_nodes:
+            return
+
+        remap = array("i", [-1]) * len(self._names)
+        names: List[str] = []
+        class_refs = array("I")
+        for node, name in enumerate(self._names):
+            if self._alive(node):
+                remap[node] = len(names)
+                names.append(name)
+                class_refs.append(self._class_refs[node])
+
+        edge_source, edge_target = array("I"), array("I")
+        edge_kind, edge_refs = array("B"), array("I")
+        edge_count = array("I", bytes(4 * len(names)))
+        edge_index: Dict[int, int] = {}
+        for position, kind in enumerate(self._edge_kind):
+            if kind == self.REMOVED:
+                continue
+            src = remap[self._edge_source[position]]
+            dst = remap[self._edge_target[position]]
+            edge_index[(src << 40) | (dst << 8) | kind] = len(edge_source)
+            edge_source.append(src)
+            edge_target.append(dst)
+            edge_kind.append(kind)
+            edge_refs.append(self._edge_refs[position])
+            edge_count[src] += 1
+            edge_count[dst] += 1
+
+        renumbered = self._dead_nodes > 0
+        self._ids = {name: node for node, name in enumerate(names)}
+        self._names = names
+        self._class_refs, self._edge_count = class_refs, edge_count
+        self._edge_source, self._edge_target = edge_source, edge_target
+        self._edge_kind, self._edge_refs = edge_kind, edge_refs
+        self._edge_index = edge_index
+        self._dead_nodes = self._dead_edges = 0
+
+        if renumbered:
+            # Every id-keyed cache is stale; cycles are recomputed in full
+            self._csr = None
+            self._overlay = {}
+            self._scc = None
+            self._cyclic = None
+            self._cycles = None
+            self._reachability = None
+
+    def _adjacency_csr(self) -> Tuple[array, array, array]:
+        """Build (or reuse) the CSR adjacency and the name-order rank of each node."""
+        self._compact()
+        if self._csr is None or self._overlay or len(self._csr[0]) != len(self._names) + 1:
+            count = len(self._names)
+            order = sorted(range(count), key=self._names.__getitem__)
+            rank = array("I", bytes(4 * count))
+            for position, node in enumerate(order):
+                rank[node] = position
+
+            # Unique (source, target) pairs, sorted by source id then target name
+            pairs = sorted({(src << 32) | rank[dst]
+                            for src, dst in zip(self._edge_source, self._edge_target)})
+            offsets = array("I", bytes(4 * (count + 1)))
+            targets = array("I", bytes(4 * len(pairs)))
+            for position, pair in enumerate(pairs):
+                offsets[(pair >> 32) + 1] += 1
+                targets[position] = order[pair & 0xFFFFFFFF]
+            for node in range(count):
+                offsets[node + 1] += offsets[node]
+
+            self._csr = (offsets, targets, rank)
+            self._overlay = {}
+        return self._csr
+
+    def _tarjan(self, roots: List[int], region: Optional[Set[int]] = None) -> List[List[int]]:
+        """Iterative Tarjan search from roots, optionally confined to region.
+
+        Components are returned in reverse topological order of the
+        condensed graph: every component appears after all components it
+        depends on.
+        """
+        count = len(self._names)
+        index = array("i", [-1]) * count
+        lowlink = array("i", [0]) * count
+        on_stack = bytearray(count)
+        stack: List[int] = []
+        components: List[List[int]] = []
+        counter = 0
+
+        for root in roots:
+            if index[root] >= 0:
+                continue
+
+            index[root] = lowlink[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = 1
+            # Explicit DFS stack of (node, neighbours, next position)
+            work = [(root, self._neighbors(root), 0)]
+
+            while work:
+                node, neighbors, position = work[-1]
+                descended = False
+                while position < len(neighbors):
+                    neighbor = neighbors[position]
+                    position += 1
+                    if region is not None and neighbor not in region:
+                        continue
+                    if index[neighbor] < 0:
+                        work[-1] = (node, neighbors, position)
+                        index[neighbor] = lowlink[neighbor] = counter
+                        counter += 1
+                        stack.append(neighbor)
+                        on_stack[neighbor] = 1
+                        work.append((neighbor, self._neighbors(neighbor), 0))
+                        descended = True
+                        break
+                    if on_stack[neighbor] and index[neighbor] < lowlink[node]:
+                        lowlink[node] = index[neighbor]
+                if descended:
+                    continue
+
+                # All neighbours done: finish node and propagate lowlink
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    if lowlink[node] < lowlink[parent]:
+                        lowlink[parent] = lowlink[node]
+
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = 0
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+
+        return components
+
+    def _components(self) -> List[List[int]]:
+        """Strongly connected components of the whole graph, as node ids."""
+        if self._scc is None:
+            _, _, rank = self._adjacency_csr()
+            self._scc = self._tarjan(sorted(range(len(self._names)), key=rank.__getitem__))
+        return self._scc
+
+    def strongly_connected_components(self) -> List[List[str]]:
+        """Find strongly connected components with an iterative Tarjan search.
+
+        Runs in O(V + E) without recursion, so arbitrarily deep include
+        chains are safe. Nodes and neighbours are visited in name order to
+        keep the result stable between runs.
+        """
+        names = self._names
+        return [[names[node] for node in component] for component in self._components()]
+
+    def _is_cyclic(self, component: List[int]) -> bool:
+        return len(component) > 1 or component[0] in self._neighbors(component[0])
+
+    def _cycle_path(self, component: List[int]) -> List[str]:
+        """Shortest cycle through the component's smallest class, via BFS."""
+        members = set(component)
+        start = min(component, key=self._names.__getitem__)
+        parent: Dict[int, int] = {start: -1}
+        queue = deque([start])
+
+        while queue:
+            node = queue.popleft()
+            for neighbor in self._neighbors(node):
+                if neighbor == start:
+                    path = [node]
+                    while parent[path[-1]] >= 0:
+                        path.append(parent[path[-1]])
+                    return [self._names[n] for n in reversed(path)] + [self._names[start]]
+                if neighbor in members and neighbor not in parent:
+                    parent[neighbor] = node
+                    queue.append(neighbor)
+
+        return [self._names[start], self._names[start]]
+
+    def _store_cyclic(self, component: List[int]):
+        path = self._cycle_path(component)
+        key = self._ids[path[0]]
+        self._cyclic[key] = (component, path)
+        for node in component:
+            self._cyclic_key[node] = key
+
+    def _closing_nodes(self, src: int, dst: int) -> Set[int]:
+        """Nodes on some path dst -> ... -> src, i.e. those a new src -> dst edge puts on a cycle."""
+        forward = {dst}
+        queue = [dst]
+        while queue:
+            for neighbor in self._neighbors(queue.pop()):
+                if neighbor not in forward:
+                    forward.add(neighbor)
+                    queue.append(neighbor)
+        if src not in forward:
+            return set()
+
+        reverse: Dict[int, List[int]] = defaultdict(list)
+        for node in forward:
+            for neighbor in self._neighbors(node):
+                if neighbor in forward:
+                    reverse[neighbor].append(node)
+        closing = {src}
+        queue = [src]
+        while queue:
+            for node in reverse[queue.pop()]:
+                if node not in closing:
+                    closing.add(node)
+                    queue.append(node)
+        return closing
+
+    def _update_cycles(self):
+        """Recompute cyclic components touched by the pending adjacency changes.
+
+        A removed edge can only split the component that contained both of
+        its ends; an added edge src -> dst can only merge the components on
+        paths from dst back to src. Tarjan is re-run on that region alone.
+        """
+        region: Set[int] = set()
+        for src, dst in self._removed_pairs:
+            key = self._cyclic_key.get(src)
+            if key is not None and key == self._cyclic_key.get(dst):
+                region.update(self._cyclic[key][0])
+        for src, dst in self._added_pairs:
+            region |= self._closing_nodes(src, dst) if src != dst else {src}
+
+        for key in {self._cyclic_key[node] for node in region if node in self._cyclic_key}:
+            members, _ = self._cyclic.pop(key)
+            for node in members:
+                del self._cyclic_key[node]
+            region.update(members)
+
+        region = {node for node in region if self._alive(node)}
+        roots = sorted(region, key=self._names.__getitem__)
+        for component in self._tarjan(roots, region):
+            if self._is_cyclic(component):
+                self._store_cyclic(component)
+
+        self._added_pairs.clear()
+        self._removed_pairs.clear()
 
     def find_circular_dependencies(self) -> List[List[str]]:
-        """Detect circular dependencies using DFS."""
-        cycles = []
-        visited = set()
-        rec_stack = set()
-        path = []
-
-        def dfs(node):
-            visited.add(node)
-            rec_stack.add(node)
-            path.append(node)
-
-            for neighbor in self.adjacency[node]:
-                if neighbor not in visited:
-                    if dfs(neighbor):
-                        return True
-                elif neighbor in rec_stack:
-                    # Found a cycle
-                    cycle_start = path.index(neighbor)
-                    cycles.append(path[cycle_start:] + [neighbor])
-                    return True
-
-            path.pop()
-            rec_stack.remove(node)
-            return False
-
-        for node in self.nodes:
-            if node not in visited:
-                dfs(node)
-
-        return cycles
+        """Detect circular dependencies.
+
+        Returns one representative cycle for every strongly connected
+        component that contains a cycle (including self-dependencies). The
+        result is cached; after later changes only the affected components
+        are recomputed.
+        """
+        if self._dead_edges > len(self._edge_source) // 2:
+            self._compact()
+
+        if self._cyclic is None:
+            components = self._components()
+            self._cyclic = {}
+            self._cyclic_key = {}
+            self._added_pairs.clear()
+            self._removed_pairs.clear()
+            for component in components:
+                if self._is_cyclic(component):
+                    self._store_cyclic(component)
+        elif self._added_pairs or self._removed_pairs:
+            self._update_cycles()
+
+        if self._cycles is None:
+            self._cycles = sorted(path for _, path in self._cyclic.values())
+        return list(self._cycles)
+
+    def reachability(self) -> "ReachabilityIndex":
+        """Transitive dependency index, built once and cached until the graph changes."""
+        if self._reachability is None:
+            self._reachability = ReachabilityIndex(self)
+        return self._reachability
 
     def find_unused_classes(self) -> Set[str]:
         """Find classes that are never referenced."""
-        referenced = {target for _, target, _ in self.edges}
-        defined = self.nodes - referenced
-        return defined
+        referenced = bytearray(len(self._names))
+        for target, kind in zip(self._edge_target, self._edge_kind):
+            if kind != self.REMOVED:
+                referenced[target] = 1
+        return {name for node, name in enumerate(self._names)
+                if not referenced[node] and self._alive(node)}
 
     def to_mermaid(self) -> str:
         """Generate Mermaid diagram."""
-        lines = ["graph TD"]
+        buffer = io.StringIO()
+        self.write_mermaid(buffer)
+        return buffer.getvalue().rstrip("\n")
 
-        # Add edges
+    def write_mermaid(self, handle: TextIO):
+        """Stream a Mermaid diagram to handle, one edge at a time."""
         edge_labels = {
             "include": "--include-->",
             "require": "==require==>",
@@ -87,105 +603,951 @@ class DependencyGraph:
             "subscribe": "-.subscribe.->"
         }
 
+        handle.write("graph TD\n")
         for source, target, relationship in self.edges:
             arrow = edge_labels.get(relationship, "-->")
-            lines.append(f"    {source.replace('::', '_')} {arrow} {target.replace('::', '_')}")
+            handle.write(f"    {source.replace('::', '_')} {arrow} {target.replace('::', '_')}\n")
+
+    def write_dot(self, handle: TextIO):
+        """Stream a Graphviz DOT digraph to handle."""
+        def quote(name: str) -> str:
+            return '"' + name.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+        handle.write("digraph dependencies {\n")
+        for name in self.nodes:
+            handle.write(f"    {quote(name)};\n")
+        for source, target, relationship in self.edges:
+            handle.write(f"    {quote(source)} -> {quote(target)} [label={quote(relationship)}];\n")
+        handle.write("}\n")
+
+    def write_graphml(self, handle: TextIO):
+        """Stream a GraphML document to handle."""
+        handle.write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+            '  <key id="relationship" for="edge" attr.name="relationship" attr.type="string"/>\n'
+            '  <graph id="dependencies" edgedefault="directed">\n'
+        )
+        for name in self.nodes:
+            handle.write(f"    <node id={quoteattr(name)}/>\n")
+        for source, target, relationship in self.edges:
+            handle.write(
+                f"    <edge source={quoteattr(source)} target={quoteattr(target)}>"
+                f'<data key="relationship">{escape(relationship)}</data></edge>\n'
+            )
+        handle.write("  </graph>\n</graphml>\n")
+
+    def write_jsonl(self, handle: TextIO):
+        """Stream newline-delimited JSON to handle: one object per node, then per edge."""
+        for name in self.nodes:
+            handle.write(json.dumps({"type": "node", "id": name}) + "\n")
+        for source, target, relationship in self.edges:
+            handle.write(json.dumps({
+                "type": "edge",
+                "source": source,
+                "target": target,
+                "relationship": relationship
+            }) + "\n")
+
+
+class ReachabilityIndex:
+    """Transitive dependency queries over the condensed (SCC) graph.
+
+    Every strongly connected component gets a bitset, stored as a Python
+    int, of the components it reaches (or is reached from). Bitsets are
+    filled in topological order of the condensed DAG, each direction on
+    first use. A query is then a lookup plus decoding the set bits.
+    """
+
+    def __init__(self, graph: DependencyGraph):
+        self._graph = graph
+        offsets, targets, _ = graph._adjacency_csr()
+        self._members = graph._components()
+
+        self._component_of = array("I", bytes(4 * len(graph._names)))
+        for component, members in enumerate(self._members):
+            for node in members:
+                self._component_of[node] = component
+
+        # Edges of the condensed DAG; successors always have lower numbers
+        self._successors: List[Set[int]] = [set() for _ in self._members]
+        self._predecessors: List[Set[int]] = [set() for _ in self._members]
+        for node in range(len(graph._names)):
+            source = self._component_of[node]
+            for target in targets[offsets[node]:offsets[node + 1]]:
+                target = self._component_of[target]
+                if target != source:
+                    self._successors[source].add(target)
+                    self._predecessors[target].add(source)
+
+        self._descendants: Optional[List[int]] = None
+        self._ancestors: Optional[List[int]] = None
+
+    def _fill(self, links: List[Set[int]], order: range) -> List[int]:
+        """Compute reach bitsets, visiting components in dependency order."""
+        reach = [0] * len(self._members)
+        for component in order:
+            bits = 1 << component
+            for linked in links[component]:
+                bits |= reach[linked]
+            reach[component] = bits
+        return reach
+
+    def _decode(self, bits: int, exclude: str) -> List[str]:
+        """Class names of all components whose bit is set."""
+        names = self._graph._names
+        result = []
+        flags = bin(bits)[:1:-1]  # lowest bit first
+        component = flags.find("1")
+        while component >= 0:
+            result.extend(names[node] for node in self._members[component])
+            component = flags.find("1", component + 1)
+        return sorted(name for name in result if name != exclude)
+
+    def depends_on(self, class_name: str) -> List[str]:
+        """All classes that class_name depends on, directly or transitively."""
+        component = self._component_of[self._graph._ids[class_name]]
+        if self._descendants is None:
+            self._descendants = self._fill(self._successors, range(len(self._members)))
+        return self._decode(self._descendants[component], class_name)
+
+    def impacted_by(self, class_name: str) -> List[str]:
+        """All classes that depend on class_name, directly or transitively."""
+        component = self._component_of[self._graph._ids[class_name]]
+        if self._ancestors is None:
+            self._ancestors = self._fill(self._predecessors, range(len(self._members) - 1, -1, -1))
+        return self._decode(self._ancestors[component], class_name)
+
+
+class CondensedGraph:
+    """Module-level overview of a DependencyGraph with cycles collapsed.
+
+    Classes are grouped by their top-level module (the part of the name
+    before ``::``). Modules that depend on each other in a cycle are merged
+    into a single node. Each edge carries the number of class-level edges
+    it stands for, so the view stays small however many classes there are.
+    """
+
+    def __init__(self, nodes: Dict[str, Dict], edges: Dict[Tuple[str, str], int]):
+        # label -> {"modules": [...], "classes": int, "internal": int}
+        self.nodes = nodes
+        self.edges = edges
+
+    @staticmethod
+    def module_of(class_name: str) -> str:
+        return class_name.split("::", 1)[0]
+
+    @classmethod
+    def from_graph(cls, graph: DependencyGraph) -> "CondensedGraph":
+        """Aggregate the class graph by module in one pass over its edges."""
+        module_ids: Dict[str, int] = {}
+        module_names: List[str] = []
+        class_counts: List[int] = []
+        module_of = array("I", bytes(4 * len(graph._names)))
+        for node, name in enumerate(graph._names):
+            if not graph._alive(node):
+                continue
+            module = cls.module_of(name)
+            index = module_ids.get(module)
+            if index is None:
+                index = module_ids[module] = len(module_names)
+                module_names.append(module)
+                class_counts.append(0)
+            module_of[node] = index
+            class_counts[index] += 1
 
-        return "\n".join(lines)
+        internal = [0] * len(module_names)
+        counts: Dict[Tuple[int, int], int] = defaultdict(int)
+        for src, dst, kind in zip(graph._edge_source, graph._edge_target, graph._edge_kind):
+            if kind == graph.REMOVED:
+                continue
+            a, b = module_of[src], module_of[dst]
+            if a == b:
+                internal[a] += 1
+            else:
+                counts[(a, b)] += 1
+
+        # Collapse module-level cycles using the class graph's own SCC search
+        modules = DependencyGraph()
+        for name in module_names:
+            modules.add_class(name)
+        for a, b in counts:
+            modules.add_dependency(module_names[a], module_names[b], "module")
+
+        label_of: List[str] = [""] * len(module_names)
+        nodes: Dict[str, Dict] = {}
+        for component in modules.strongly_connected_components():
+            members = sorted(component)
+            label = " + ".join(members)
+            indexes = [module_ids[m] for m in members]
+            for index in indexes:
+                label_of[index] = label
+            nodes[label] = {
+                "modules": members,
+                "classes": sum(class_counts[i] for i in indexes),
+                "internal": sum(internal[i] for i in indexes),
+            }
+
+        edges: Dict[Tuple[str, str], int] = defaultdict(int)
+        for (a, b), count in counts.items():
+            source, target = label_of[a], label_of[b]
+            if source == target:
+                nodes[source]["internal"] += count
+            else:
+                edges[(source, target)] += count
+
+        return cls(dict(sorted(nodes.items())), dict(sorted(edges.items())))
+
+    def focus(self, name: str, depth: int) -> "CondensedGraph":
+        """Restrict the view to nodes within depth hops of name's node.
+
+        name may be a class or module; hops follow edges in either direction.
+        """
+        module = self.module_of(name)
+        start = next((label for label, node in self.nodes.items() if module in node["modules"]), None)
+        if start is None:
+            raise LookupError(f"Module not found in dependency graph: {module}")
+
+        neighbors: Dict[str, Set[str]] = defaultdict(set)
+        for source, target in self.edges:
+            neighbors[source].add(target)
+            neighbors[target].add(source)
+
+        keep = {start}
+        frontier = [start]
+        for _ in range(depth):
+            frontier = [n for label in frontier for n in neighbors[label] if n not in keep]
+            keep.update(frontier)
+
+        return CondensedGraph(
+            {label: node for label, node in self.nodes.items() if label in keep},
+            {pair: count for pair, count in self.edges.items() if pair[0] in keep and pair[1] in keep}
+        )
+
+    def cycles(self) -> List[str]:
+        """Labels of nodes that stand for a module-level cycle."""
+        return [label for label, node in self.nodes.items() if len(node["modules"]) > 1]
+
+    @staticmethod
+    def _node_id(label: str) -> str:
+        return re.sub(r"\W+", "_", label)
+
+    def write_mermaid(self, handle: TextIO):
+        """Stream a Mermaid diagram with edge counts as labels."""
+        handle.write("graph TD\n")
+        for label in self.nodes:
+            handle.write(f'    {self._node_id(label)}["{label}"]\n')
+        for (source, target), count in self.edges.items():
+            handle.write(f"    {self._node_id(source)} -- {count} --> {self._node_id(target)}\n")
+
+    def write_dot(self, handle: TextIO):
+        """Stream a Graphviz DOT digraph with edge counts as labels."""
+        handle.write("digraph modules {\n")
+        for label, node in self.nodes.items():
+            handle.write(f'    "{label}" [classes={node["classes"]}];\n')
+        for (source, target), count in self.edges.items():
+            handle.write(f'    "{source}" -> "{target}" [label="{count}", weight={count}];\n')
+        handle.write("}\n")
+
+    def write_graphml(self, handle: TextIO):
+        """Stream a GraphML document with class and edge counts."""
+        handle.write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+            '  <key id="classes" for="node" attr.name="classes" attr.type="int"/>\n'
+            '  <key id="count" for="edge" attr.name="count" attr.type="int"/>\n'
+            '  <graph id="modules" edgedefault="directed">\n'
+        )
+        for label, node in self.nodes.items():
+            handle.write(f'    <node id={quoteattr(label)}><data key="classes">{node["classes"]}</data></node>\n')
+        for (source, target), count in self.edges.items():
+            handle.write(
+                f"    <edge source={quoteattr(source)} target={quoteattr(target)}>"
+                f'<data key="count">{count}</data></edge>\n'
+            )
+        handle.write("  </graph>\n</graphml>\n")
+
+    def write_jsonl(self, handle: TextIO):
+        """Stream newline-delimited JSON: one object per node, then per edge."""
+        for label, node in self.nodes.items():
+            handle.write(json.dumps({"type": "node", "id": label, **node}) + "\n")
+        for (source, target), count in self.edges.items():
+            handle.write(json.dumps({"type": "edge", "source": source, "target": target, "count": count}) + "\n")
 
 
 class PuppetParser:
     """Parse Puppet manifests to extract dependencies."""
 
-    # Pattern to match class definitions
-    CLASS_DEF = re.compile(r'class\s+([a-z][a-z0-9_:]*)\s*(?:\(|\s*\{|\s*$)', re.MULTILINE)
+    # Single-pass scanner for class definitions, include, the relationship
+    # functions (Require/Contain/Notify/Subscribe) and chain arrows.
+    # Comments, string literals, heredocs and regex literals are consumed as
+    # whole tokens so their contents never produce edges, and a quote or
+    # ``#`` inside one cannot open a token that swallows the code after it.
+    # A heredoc runs from ``@(TAG)`` to its end marker; the rest of its
+    # opening line is still code and is captured to be scanned on its own.
+    # ``/`` opens a regex literal only where a value cannot end (after
+    # ``=~``, ``node``, ``{``, ``,`` ...), so division is left alone.
+    # Names after ``include`` and the relationship functions are captured by
+    # lookahead, so a chain arrow that follows them is still seen. Bare words
+    # are consumed whole to keep the chain alternative from re-matching every
+    # suffix of an identifier.
+    SCANNER = re.compile(r'''
+        (?P<comment>\#[^\n]*|/\*.*?\*/)
+      | (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+      | (?P<heredoc>@\([ \t]*"?(?P<heredoc_tag>[^\s):/"]+)"?[^)\n]*\)
+            (?P<heredoc_line>[^\n]*)\n
+            .*?^[ \t]*(?:\|[ \t]*)?(?:-[ \t]*)?(?P=heredoc_tag)[ \t]*$)
+      | (?P<regex>(?:[~=({\[,;:}>]|(?<!\$)node)\s*/(?:[^/\\\n]|\\.)*/)
+      | class\s+(?P<class_name>[a-z][a-z0-9_:]*)\s*(?=\(|\s*\{|\s*$)
+      | include\s+(?=(?P<include>[a-z][a-z0-9_:]*))
+      | (?P<function>Require|Contain|Notify|Subscribe)\s*\(\s*
+            (?=[\'"]?(?P<function_target>[a-z][a-z0-9_:]*))
+      | (?P<chain_source>[a-z][a-z0-9_:]*)\s*(?P<arrow>->|~>|<-|<~)\s*
+            (?P<chain_target>[a-z][a-z0-9_:]*)
+      | [a-z][a-z0-9_:]*
+    ''', re.MULTILINE | re.DOTALL | re.VERBOSE)
 
-    # Patterns for dependency relationships
-    INCLUDES = re.compile(r'include\s+([a-z][a-z0-9_:]*)')
-    REQUIRE = re.compile(r'Require\s*\(\s*[\'"]?([a-z][a-z0-9_:]*)')
-    CONTAIN = re.compile(r'Contain\s*\(\s*[\'"]?([a-z][a-z0-9_:]*)')
-    NOTIFY = re.compile(r'Notify\s*\(\s*[\'"]?([a-z][a-z0-9_:]*)')
-    SUBSCRIBE = re.compile(r'Subscribe\s*\(\s*[\'"]?([a-z][a-z0-9_:]*)')
+    # Edges are emitted grouped by relationship in this order, so edge lists
+    # (and therefore Mermaid output) match the historical per-pattern parser.
+    RELATIONSHIP_ORDER = ("include", "require", "contain", "notify", "subscribe", "chain")
 
-    # Chain arrows
-    CHAIN_ARROW = re.compile(r'([a-z][a-z0-9_:]*)\s*(->|~>|<-|<~)\s*([a-z][a-z0-9_:]*)')
+    # Part of every ParseCache key; bump whenever extract_edges output changes
+    PARSER_VERSION = "2"
 
-    def __init__(self):
+    def __init__(self, track_files: bool = False):
         self.graph = DependencyGraph()
+        # Per-file scan results, kept when files may later be re-parsed
+        self.file_results: Optional[Dict[Path, Tuple[Optional[str], List[Tuple[str, str, str]]]]] = \
+            {} if track_files else None
 
-    def parse_file(self, filepath: Path) -> Tuple[str, Set[str]]:
-        """Parse a single Puppet manifest file."""
+    @classmethod
+    def extract_edges(cls, content: str) -> Tuple[Optional[str], List[Tuple[str, str, str]]]:
+        """Scan manifest content once and return its class and edges.
+
+        Returns ``(class_name, edges)`` where edges are ``(source, target,
+        relationship)`` tuples. ``class_name`` is None when the manifest
+        does not define a class, in which case no edges are returned.
+        """
+        current_class = None
+        found: Dict[str, List[Tuple[Optional[str], Optional[str], str]]] = {
+            kind: [] for kind in cls.RELATIONSHIP_ORDER
+        }
+
+        # Edges are recorded against a placeholder for the current class,
+        # since the class definition may appear after the first relationship.
+        for match in cls._tokens(content):
+            kind = match.lastgroup
+            if kind is None or kind in ("comment", "string", "regex"):
+                continue
+            if kind == "class_name":
+                if current_class is None:
+                    current_class = match.group("class_name")
+            elif kind == "include":
+                found["include"].append((None, match.group("include"), "include"))
+            elif kind == "function_target":
+                relationship = match.group("function").lower()
+                found[relationship].append((None, match.group("function_target"), relationship))
+            elif kind == "chain_target":
+                source = match.group("chain_source")
+                arrow = match.group("arrow")
+                target = match.group("chain_target")
+                if arrow in ("->", "~>"):
+                    relationship = "require" if arrow == "->" else "notify"
+                    found["chain"].append((None, target, relationship))
+                else:
+                    relationship = "require" if arrow == "<-" else "subscribe"
+                    found["chain"].append((source, None, relationship))
+
+        if not current_class:
+            return None, []
+
+        edges = []
+        for kind in cls.RELATIONSHIP_ORDER:
+            for source, target, relationship in found[kind]:
+                edges.append((source or current_class, target or current_class, relationship))
+        return current_class, edges
+
+    @classmethod
+    def _tokens(cls, content: str) -> Iterator[re.Match]:
+        """Scanner matches for content, descending into heredoc opening lines."""
+        for match in cls.SCANNER.finditer(content):
+            if match.lastgroup == "heredoc":
+                yield from cls._tokens(match.group("heredoc_line"))
+            else:
+                yield match
+
+    @classmethod
+    def scan_bytes(cls, filepath: Path,
+                   data: bytes) -> Tuple[Optional[str], List[Tuple[str, str, str]], Optional[str]]:
+        """Scan already-read manifest bytes without touching the graph.
+
+        Returns ``(class_name, edges, warning)``; ``warning`` is set when
+        the content could not be decoded. This is the unit of work handed to
+        worker processes by ``parse_directory``.
+        """
+        try:
+            content = data.decode()
+        except UnicodeDecodeError as e:
+            return None, [], f"Warning: Could not read {filepath}: {e}"
+
+        class_name, edges = cls.extract_edges(content)
+        return class_name, edges, None
+
+    @classmethod
+    def scan_file(cls, filepath: Path) -> Tuple[Optional[str], List[Tuple[str, str, str]], Optional[str]]:
+        """Read and scan one manifest without touching the graph."""
         try:
-            content = filepath.read_text()
+            data = filepath.read_bytes()
         except Exception as e:
-            print(f"Warning: Could not read {filepath}: {e}")
+            return None, [], f"Warning: Could not read {filepath}: {e}"
+        return cls.scan_bytes(filepath, data)
+
+    def add_file_result(self, class_name: Optional[str],
+                        edges: List[Tuple[str, str, str]]) -> Tuple[str, Set[str]]:
+        """Merge one file's scan result into the graph."""
+        if not class_name:
             return "", set()
 
-        # Extract class name
-        class_match = self.CLASS_DEF.search(content)
-        current_class = class_match.group(1) if class_match else None
+        self.graph.add_class(class_name)
+        for source, target, relationship in edges:
+            self.graph.add_dependency(source, target, relationship)
 
-        if not current_class:
-            return "", set()
+        return class_name, self.dependencies_of(class_name, edges)
+
+    @staticmethod
+    def dependencies_of(class_name: str, edges: List[Tuple[str, str, str]]) -> Set[str]:
+        """Classes a file's class depends on: the "other end" of each of its edges."""
+        return {target if source == class_name else source for source, target, _ in edges}
+
+    def remove_file_result(self, class_name: Optional[str], edges: List[Tuple[str, str, str]]):
+        """Undo ``add_file_result`` for a file that changed or was deleted."""
+        if not class_name:
+            return
+
+        for source, target, relationship in edges:
+            self.graph.remove_dependency(source, target, relationship)
+        self.graph.remove_class(class_name)
+
+    def parse_file(self, filepath: Path) -> Tuple[str, Set[str]]:
+        """Parse a single Puppet manifest file."""
+        class_name, edges, warning = self.scan_file(filepath)
+        if warning:
+            print(warning)
+        return self.add_file_result(class_name, edges)
+
+    @classmethod
+    def scan_paths(cls, files: List[Path], jobs: int = 1, cache: Optional["ParseCache"] = None,
+                   profiler: Optional["Profiler"] = None
+                   ) -> List[Tuple[Optional[str], List[Tuple[str, str, str]], Optional[str]]]:
+        """Scan files, returning ``(class_name, edges, warning)`` per path.
+
+        Every file is read and hashed once, and each distinct content is
+        scanned only once: files with identical bytes share one result.
+        Contents found in ``cache`` are not scanned at all. The rest are
+        scanned in a process pool when ``jobs > 1``, unless a ``profiler``
+        is given: then they are scanned here so every file can be timed.
+        """
+        results: List[Tuple[Optional[str], List[Tuple[str, str, str]], Optional[str]]] = [None] * len(files)
+        # content digest -> indexes of every file with that content
+        by_digest: Dict[str, List[int]] = {}
+
+        # (digest, path, content) for contents to scan
+        pending = []
+        for index, pp_file in enumerate(files):
+            if profiler:
+                start = time.perf_counter()
+            try:
+                data = pp_file.read_bytes()
+            except Exception as e:
+                results[index] = (None, [], f"Warning: Could not read {pp_file}: {e}")
+                continue
+
+            digest = hashlib.sha256(data).hexdigest()
+            if profiler:
+                profiler.add("read", time.perf_counter() - start, len(data))
+            if digest in by_digest:
+                by_digest[digest].append(index)
+                continue
+            by_digest[digest] = [index]
+
+            cached = cache.get(cache.key(digest)) if cache else None
+            if cached is not None:
+                results[index] = cached + (None,)
+            else:
+                pending.append((digest, pp_file, data))
+
+        paths = [item[1] for item in pending]
+        contents = [item[2] for item in pending]
+        if profiler:
+            with profiler.instrument():
+                scanned = [profiler.scan_file(cls.scan_bytes, path, data) for path, data in zip(paths, contents)]
+        elif jobs > 1 and len(pending) > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                chunksize = max(1, len(pending) // (jobs * 4))
+                scanned = list(pool.map(cls.scan_bytes, paths, contents, chunksize=chunksize))
+        else:
+            scanned = map(cls.scan_bytes, paths, contents)
+
+        for (digest, _, _), result in zip(pending, scanned):
+            results[by_digest[digest][0]] = result
+            class_name, edges, warning = result
+            if cache and not warning:
+                cache.put(cache.key(digest), class_name, edges)
+
+        if cache:
+            cache.flush()
+
+        for indexes in by_digest.values():
+            for index in indexes[1:]:
+                results[index] = results[indexes[0]]
+
+        return results
+
+    def merge_results(self, files: List[Path],
+                      results: List[Tuple[Optional[str], List[Tuple[str, str, str]], Optional[str]]],
+                      profiler: Optional["Profiler"] = None) -> Dict[str, Set[str]]:
+        """Add ``scan_paths`` results to the graph in file order."""
+        if profiler:
+            start = time.perf_counter()
+            all_dependencies = self.merge_results(files, results)
+            profiler.add("merge", time.perf_counter() - start, len(files))
+            return all_dependencies
 
-        self.graph.add_class(current_class)
-        dependencies = set()
-
-        # Extract include statements
-        for match in self.INCLUDES.finditer(content):
-            dep = match.group(1)
-            dependencies.add(dep)
-            self.graph.add_dependency(current_class, dep, "include")
-
-        # Extract require relationships
-        for match in self.REQUIRE.finditer(content):
-            dep = match.group(1)
-            dependencies.add(dep)
-            self.graph.add_dependency(current_class, dep, "require")
-
-        # Extract contain relationships
-        for match in self.CONTAIN.finditer(content):
-            dep = match.group(1)
-            dependencies.add(dep)
-            self.graph.add_dependency(current_class, dep, "contain")
-
-        # Extract notify relationships
-        for match in self.NOTIFY.finditer(content):
-            dep = match.group(1)
-            dependencies.add(dep)
-            self.graph.add_dependency(current_class, dep, "notify")
-
-        # Extract subscribe relationships
-        for match in self.SUBSCRIBE.finditer(content):
-            dep = match.group(1)
-            dependencies.add(dep)
-            self.graph.add_dependency(current_class, dep, "subscribe")
-
-        # Extract chain arrows
-        for match in self.CHAIN_ARROW.finditer(content):
-            source, arrow, target = match.groups()
-            if arrow in ["->", "~>"]:
-                relationship = "require" if arrow == "->" else "notify"
-                self.graph.add_dependency(current_class, target, relationship)
-                dependencies.add(target)
-            elif arrow in ["<-", "<~"]:
-                relationship = "require" if arrow == "<-" else "subscribe"
-                self.graph.add_dependency(source, current_class, relationship)
-                dependencies.add(source)
-
-        return current_class, dependencies
-
-    def parse_directory(self, directory: Path) -> Dict[str, Set[str]]:
-        """Parse all .pp files in a directory."""
         all_dependencies = {}
 
-        for pp_file in directory.rglob("*.pp"):
-            class_name, deps = self.parse_file(pp_file)
+        for pp_file, (class_name, edges, warning) in zip(files, results):
+            if warning:
+                print(warning)
+            if self.file_results is not None:
+                self.file_results[pp_file] = (class_name, edges)
+            class_name, deps = self.add_file_result(class_name, edges)
             if class_name:
                 all_dependencies[class_name] = deps
 
         return all_dependencies
 
+    def parse_directory(self, directory: Path, jobs: int = 1, cache: Optional["ParseCache"] = None,
+                        profiler: Optional["Profiler"] = None) -> Dict[str, Set[str]]:
+        """Parse all .pp files in a directory.
+
+        Results are merged in sorted path order, so the graph is identical
+        regardless of worker scheduling or cache state.
+        """
+        files = sorted(directory.rglob("*.pp"))
+        return self.merge_results(files, self.scan_paths(files, jobs, cache, profiler), profiler)
+
+
+def find_environments(root: Path) -> Dict[str, List[Path]]:
+    """Map each environment directory under root to its sorted .pp files."""
+    return {
+        env.name: sorted(env.rglob("*.pp"))
+        for env in sorted(root.iterdir())
+        if env.is_dir() and not env.name.startswith(".")
+    }
+
+
+def parse_environments(root: Path, jobs: int = 1, cache: Optional["ParseCache"] = None,
+                       profiler: Optional["Profiler"] = None
+                       ) -> Dict[str, Tuple[DependencyGraph, Dict[str, Set[str]]]]:
+    """Build one dependency graph per environment under an r10k-style root.
+
+    All environments are scanned together, so content shared between them
+    (typically most module files) is hashed per path but scanned once, and
+    the per-environment graphs share the same scan results.
+    """
+    environments = find_environments(root)
+    files = [pp_file for env_files in environments.values() for pp_file in env_files]
+    results = PuppetParser.scan_paths(files, jobs, cache, profiler)
+
+    graphs = {}
+    offset = 0
+    for env, env_files in environments.items():
+        parser = PuppetParser()
+        env_results = results[offset:offset + len(env_files)]
+        offset += len(env_files)
+        dependencies = parser.merge_results(env_files, env_results, profiler)
+        graphs[env] = (parser.graph, dependencies)
+
+    unique = len({id(result[1]) for result in results})
+    print(f"Environments: {len(environments)}, files: {len(files)}, unique contents: {unique}",
+          file=sys.stderr)
+    return graphs
+
+
+def parse_changed(target: Path, ref: str, jobs: int = 1, cache: Optional["ParseCache"] = None,
+                  profiler: Optional["Profiler"] = None) -> Tuple[PuppetParser, Dict[str, Set[str]]]:
+    """Build the dependency graph of files changed since ref and their reverse dependents.
+
+    Classes defined in changed or deleted files seed the search. Every file
+    with a relationship into a class already selected is added, and that
+    relationship's source class is selected in turn. The resulting graph
+    contains every user of each selected class, so cycles through changed
+    classes and unused-class results match a full analysis. All files are
+    scanned, but with the parse cache only changed files are parsed.
+    """
+    changed, deleted = git_changed_files(target, ref, deleted_content=True)
+    files = [target] if target.is_file() else sorted(target.rglob("*.pp"))
+    results = PuppetParser.scan_paths(files, jobs, cache, profiler)
+
+    changed_set = set(changed)
+    selected = {i for i, pp_file in enumerate(files) if pp_file.resolve() in changed_set}
+    seeds = {results[i][0] for i in selected}
+    seeds.update(PuppetParser.scan_bytes(path, data)[0] for path, data in deleted.items())
+    seeds.discard(None)
+
+    # class -> (source class, file index) of every relationship into it
+    users = defaultdict(list)
+    for index, (_, edges, _) in enumerate(results):
+        for source, edge_target, _ in edges:
+            users[edge_target].append((source, index))
+
+    closure = set(seeds)
+    queue = deque(seeds)
+    while queue:
+        for source, index in users.get(queue.popleft(), ()):
+            selected.add(index)
+            if source not in closure:
+                closure.add(source)
+                queue.append(source)
+
+    subset = sorted(selected)
+    parser = PuppetParser()
+    dependencies = parser.merge_results([files[i] for i in subset], [results[i] for i in subset], profiler)
+    print(f"Changed since {ref}: {len(changed)} file(s), {len(deleted)} deleted; "
+          f"analyzing {len(subset)} of {len(files)} file(s)", file=sys.stderr)
+    return parser, dependencies
+
+
+class ParseCache(SqliteCache):
+    """Persistent cache of per-file scan results, keyed by content hash.
+
+    See ``SqliteCache`` for storage, sharing and eviction.
+    """
+
+    FILENAME = "analyze_deps.sqlite3"
+    LABEL = "Parse cache"
+
+    def __init__(self, cache_dir: Path, max_bytes: int = 256 * 1024 * 1024):
+        super().__init__(cache_dir, max_bytes)
+
+    @staticmethod
+    def key(digest: str) -> str:
+        """Cache key for a manifest's SHA-256 hex digest under the current parser version."""
+        return f"{PuppetParser.PARSER_VERSION}:{digest}"
+
+    def get(self, key: str) -> Optional[Tuple[Optional[str], List[Tuple[str, str, str]]]]:
+        """Return the cached ``(class_name, edges)`` for key, if present."""
+        payload = self._load(key)
+        if payload is None:
+            return None
+        class_name, edges = json.loads(payload)
+        return class_name, [tuple(edge) for edge in edges]
+
+    def put(self, key: str, class_name: Optional[str], edges: List[Tuple[str, str, str]]):
+        """Queue a scan result for storage on the next ``flush``."""
+        self._store(key, json.dumps([class_name, edges], separators=(",", ":")))
+
+
+class _ProfiledScanner:
+    """Stand-in for ``PuppetParser.SCANNER`` that times scanning and counts matches.
+
+    Matches are also counted by the alternative that produced them; the
+    alternatives share one regex, so their time cannot be split.
+    """
+
+    def __init__(self, pattern: re.Pattern, profiler: "Profiler"):
+        self.pattern = pattern
+        self.profiler = profiler
+
+    def finditer(self, *args):
+        stats = self.profiler.regexes["SCANNER"]
+        alternatives = self.profiler.alternatives
+        stats[0] += 1
+        matches = self.pattern.finditer(*args)
+        while True:
+            start = time.perf_counter()
+            match = next(matches, None)
+            stats[2] += time.perf_counter() - start
+            if match is None:
+                return
+            stats[1] += 1
+            alternatives[match.lastgroup or "word"] += 1
+            yield match
+
+
+class Profiler:
+    """Wall time and counts per phase, for the scanner regex and per file, for --profile.
+
+    ``phases`` and ``regexes`` map names to ``[calls, items, seconds]``,
+    where items are bytes read, edges found or files merged. Only the
+    ``top`` slowest files to scan are kept. Parsing does no timing at all
+    unless a profiler is passed in.
+    """
+
+    def __init__(self, top: int = 10):
+        self.top = top
+        self.phases: Dict[str, List] = defaultdict(lambda: [0, 0, 0.0])
+        self.regexes: Dict[str, List] = defaultdict(lambda: [0, 0, 0.0])
+        self.alternatives: Dict[str, int] = defaultdict(int)
+        self.slowest: List[Tuple[float, str]] = []  # min-heap of (seconds, file)
+
+    def add(self, phase: str, seconds: float, items: int = 0):
+        """Add one timed call of phase."""
+        stats = self.phases[phase]
+        stats[0] += 1
+        stats[1] += items
+        stats[2] += seconds
+
+    def scan_file(self, scan, filepath: Path, data: bytes):
+        """Call ``scan(filepath, data)``, recording it as a scan of filepath."""
+        start = time.perf_counter()
+        result = scan(filepath, data)
+        seconds = time.perf_counter() - start
+        self.add("scan", seconds, len(result[1]))
+        if len(self.slowest) < self.top:
+            heapq.heappush(self.slowest, (seconds, str(filepath)))
+        elif self.top and seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (seconds, str(filepath)))
+        return result
+
+    @contextmanager
+    def instrument(self):
+        """Route ``PuppetParser.SCANNER`` through a counting proxy while the block runs.
+
+        The original pattern is put back on exit, so later scans in this
+        process are neither slowed down nor counted.
+        """
+        scanner = PuppetParser.SCANNER
+        if isinstance(scanner, re.Pattern):
+            PuppetParser.SCANNER = _ProfiledScanner(scanner, self)
+        try:
+            yield
+        finally:
+            PuppetParser.SCANNER = scanner
+
+    def to_dict(self) -> Dict:
+        def rows(table: Dict[str, List]) -> List[Dict]:
+            return [{"name": name, "calls": calls, "items": items, "seconds": seconds}
+                    for name, (calls, items, seconds) in table.items()]
+
+        return {
+            "phases": rows(self.phases),
+            "regexes": rows(self.regexes),
+            "scanner_matches": dict(sorted(self.alternatives.items(), key=lambda item: -item[1])),
+            "slowest_files": [{"file": path, "seconds": seconds}
+                              for seconds, path in sorted(self.slowest, reverse=True)],
+        }
+
+    def format_table(self) -> str:
+        """Format the profile as markdown tables."""
+        report = self.to_dict()
+        total = sum(row["seconds"] for row in report["phases"])
+        output = [f"## Profile: {total:.3f} s", "",
+                  "| Phase | Calls | Items | Seconds |",
+                  "|-------|-------|-------|---------|"]
+        for row in report["phases"]:
+            output.append(f"| {row['name']} | {row['calls']} | {row['items']} | {row['seconds']:.4f} |")
+
+        output.extend(["", "### Regexes", "| Regex | Calls | Matches | Seconds |", "|-------|-------|---------|---------|"])
+        for row in report["regexes"]:
+            output.append(f"| {row['name']} | {row['calls']} | {row['items']} | {row['seconds']:.4f} |")
+
+        output.extend(["", "### Scanner matches", "| Alternative | Matches |", "|-------------|---------|"])
+        output.extend(f"| {name} | {count} |" for name, count in report["scanner_matches"].items())
+
+        output.extend(["", "### Slowest files", "| File | Seconds |", "|------|---------|"])
+        output.extend(f"| {row['file']} | {row['seconds']:.4f} |" for row in report["slowest_files"])
+        return "\n".join(output)
+
+
+class _InotifySource:
+    """Report changed .pp files under a directory tree using Linux inotify."""
+
+    WATCH_MASK = 0x008 | 0x040 | 0x080 | 0x100 | 0x200  # close_write, moved_from/to, create, delete
+    IN_MOVED_FROM = 0x040
+    IN_DELETE = 0x200
+    IN_ISDIR = 0x40000000
+    IN_Q_OVERFLOW = 0x4000
+    EVENT = struct.Struct("iIII")
+
+    def __init__(self, root: Path):
+        self._root = root
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: Dict[int, Path] = {}
+        # Manifests known to exist, so a directory moved out of the tree
+        # can report the ones it took along
+        self._files: Set[Path] = set()
+        self._watch_tree(root)
+
+    def _watch_tree(self, directory: Path) -> Set[Path]:
+        """Watch directory and its subdirectories; return the .pp files in them."""
+        found = set()
+        for current, _, files in os.walk(directory):
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(current), self.WATCH_MASK)
+            if wd >= 0:
+                self._dirs[wd] = Path(current)
+            found.update(Path(current) / name for name in files if name.endswith(".pp"))
+        self._files.update(found)
+        return found
+
+    def _forget_tree(self, directory: Path) -> Set[Path]:
+        """Stop watching directory and its subdirectories; return the .pp files known in them."""
+        for wd, watched in list(self._dirs.items()):
+            if watched == directory or directory in watched.parents:
+                # The watch follows the inode, so a moved directory would
+                # keep reporting events under its old path
+                self._libc.inotify_rm_watch(self._fd, wd)
+                del self._dirs[wd]
+        gone = {path for path in self._files if directory in path.parents}
+        self._files -= gone
+        return gone
+
+    def wait(self, settle: float = 0.05) -> Set[Path]:
+        """Block until .pp files change, then collect events until quiet for settle seconds."""
+        changed: Set[Path] = set()
+        timeout = None
+        while True:
+            ready, _, _ = select.select([self._fd], [], [], timeout)
+            if not ready:
+                return changed
+            data = os.read(self._fd, 65536)
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = self.EVENT.unpack_from(data, offset)
+                name = data[offset + self.EVENT.size:offset + self.EVENT.size + length].rstrip(b"\0")
+                offset += self.EVENT.size + length
+
+                if mask & self.IN_Q_OVERFLOW:
+                    # Events were lost; treat every known manifest as touched
+                    current = set(self._root.rglob("*.pp"))
+                    changed.update(self._files | current)
+                    self._files = current
+                    continue
+                directory = self._dirs.get(wd)
+                if directory is None or not name:
+                    continue
+                path = directory / os.fsdecode(name)
+                removed = mask & (self.IN_MOVED_FROM | self.IN_DELETE)
+                if mask & self.IN_ISDIR:
+                    if removed:
+                        changed.update(self._forget_tree(path))
+                    elif path.is_dir():
+                        changed.update(self._watch_tree(path))
+                elif path.suffix == ".pp":
+                    changed.add(path)
+                    if removed:
+                        self._files.discard(path)
+                    else:
+                        self._files.add(path)
+            if changed:
+                timeout = settle
+
+
+class _PollingSource:
+    """Report changed .pp files by comparing modification times."""
+
+    def __init__(self, root: Path, interval: float = 1.0):
+        self._root = root
+        self._interval = interval
+        self._stamps = self._snapshot()
+
+    def _snapshot(self) -> Dict[Path, Tuple[int, int]]:
+        stamps = {}
+        for pp_file in self._root.rglob("*.pp"):
+            try:
+                stat = pp_file.stat()
+            except OSError:
+                continue
+            stamps[pp_file] = (stat.st_mtime_ns, stat.st_size)
+        return stamps
+
+    def wait(self) -> Set[Path]:
+        """Block until at least one .pp file was added, changed or removed."""
+        while True:
+            time.sleep(self._interval)
+            stamps = self._snapshot()
+            changed = {path for path in stamps.keys() | self._stamps.keys()
+                       if stamps.get(path) != self._stamps.get(path)}
+            self._stamps = stamps
+            if changed:
+                return changed
+
+
+class DependencyWatcher:
+    """Keep a parsed dependency graph warm and apply manifest edits incrementally.
+
+    Each changed file's previous edges are removed from the graph before its
+    new scan result is added, so cycle detection only revisits the
+    components those edges touch.
+    """
+
+    def __init__(self, parser: PuppetParser, directory: Path,
+                 poll: bool = False, interval: float = 1.0):
+        if parser.file_results is None:
+            raise ValueError("DependencyWatcher needs a PuppetParser created with track_files=True")
+        self.parser = parser
+        # class name -> files defining it, so a class defined twice keeps
+        # its entry in ``dependencies`` while either file remains
+        self._files_by_class: Dict[str, Set[Path]] = defaultdict(set)
+        for path, (class_name, _) in parser.file_results.items():
+            if class_name:
+                self._files_by_class[class_name].add(path)
+
+        self.source = None
+        if not poll and sys.platform.startswith("linux"):
+            try:
+                self.source = _InotifySource(directory)
+                self.backend = "inotify"
+            except (OSError, AttributeError):
+                self.source = None
+        if self.source is None:
+            self.source = _PollingSource(directory, interval)
+            self.backend = f"polling every {interval:g}s"
+
+    def apply(self, paths: Set[Path], dependencies: Dict[str, Set[str]]):
+        """Re-scan the given files (deleted ones are dropped) and update the graph.
+
+        ``dependencies`` is the per-class mapping from ``parse_directory``
+        and is updated in place. As in a full parse, a class defined by
+        several files maps to the dependencies of the last one in path order.
+        """
+        touched = set()
+        for path in sorted(paths):
+            old = self.parser.file_results.pop(path, None)
+            if old is not None:
+                self.parser.remove_file_result(*old)
+                if old[0]:
+                    self._files_by_class[old[0]].discard(path)
+                    touched.add(old[0])
+
+            if not path.is_file():
+                continue
+            class_name, edges, warning = self.parser.scan_file(path)
+            if warning:
+                print(warning, file=sys.stderr)
+            self.parser.file_results[path] = (class_name, edges)
+            self.parser.add_file_result(class_name, edges)
+            if class_name:
+                self._files_by_class[class_name].add(path)
+                touched.add(class_name)
+
+        for class_name in touched:
+            files = self._files_by_class.get(class_name)
+            if files:
+                _, edges = self.parser.file_results[max(files)]
+                dependencies[class_name] = self.parser.dependencies_of(class_name, edges)
+            else:
+                self._files_by_class.pop(class_name, None)
+                dependencies.pop(class_name, None)
+
+    def changes(self) -> Iterator[Set[Path]]:
+        """Yield batches of changed .pp files, forever."""
+        while True:
+            yield self.source.wait()
+
 
 def format_analysis(graph: DependencyGraph, dependencies: Dict[str, Set[str]]) -> str:
     """Format dependency analysis results."""
@@ -222,6 +1584,158 @@ def format_analysis(graph: DependencyGraph, dependencies: Dict[str, Set[str]]) -
     return "\n".join(output)
 
 
+def format_condensed(view: CondensedGraph) -> str:
+    """Format the module-level overview."""
+    output = ["## Puppet Module Dependency Overview\n"]
+
+    output.append("### Summary")
+    output.append(f"- **Modules**: {len(view.nodes)} "
+                  f"({sum(node['classes'] for node in view.nodes.values())} classes)")
+    output.append(f"- **Module dependencies**: {len(view.edges)} "
+                  f"({sum(view.edges.values())} class-level edges)")
+
+    cycles = view.cycles()
+    if cycles:
+        output.append("\n### ⚠️ MODULE CYCLES")
+        for i, label in enumerate(cycles, 1):
+            output.append(f"{i}. {label} ({view.nodes[label]['classes']} classes)")
+
+    output.append("\n### Module Dependencies")
+    targets: Dict[str, List[Tuple[str, int]]] = defaultdict(list)
+    for (source, target), count in view.edges.items():
+        targets[source].append((target, count))
+    for label, node in view.nodes.items():
+        output.append(f"\n**{label}** ({node['classes']} classes, {node['internal']} internal edges):")
+        for target, count in targets[label]:
+            output.append(f"  → {target} ({count})")
+
+    return "\n".join(output)
+
+
+def format_reachability(title: str, class_name: str, classes: List[str]) -> str:
+    """Format the result of an --impacted-by or --depends-on query."""
+    output = [f"## {title} {class_name} ({len(classes)})\n"]
+    for cls in classes:
+        output.append(f"- {cls}")
+    return "\n".join(output)
+
+
+# --format values streamed by the write_<format> methods of
+# DependencyGraph and CondensedGraph
+GRAPH_FORMATS = ("mermaid", "dot", "graphml", "jsonl")
+
+
+def render_queries(args: argparse.Namespace, graph: DependencyGraph) -> str:
+    """Answer --impacted-by / --depends-on.
+
+    Raises LookupError when a queried class is not in the graph.
+    """
+    queries = [(args.impacted_by, "Classes impacted by", "impacted_by"),
+               (args.depends_on, "Dependencies of", "depends_on")]
+
+    sections = []
+    for class_name, title, method in queries:
+        if not class_name:
+            continue
+        if class_name not in graph.nodes:
+            raise LookupError(f"Class not found in dependency graph: {class_name}")
+        classes = getattr(graph.reachability(), method)(class_name)
+        sections.append(format_reachability(title, class_name, classes))
+    return "\n\n".join(sections)
+
+
+def write_output(output: str, path: Optional[Path]):
+    """Print output, or write it to path."""
+    if path:
+        path.write_text(output)
+        print(f"Analysis written to: {path}")
+    else:
+        print(output)
+
+
+def build_view(args: argparse.Namespace, graph: DependencyGraph):
+    """Return the graph, or the module-level view selected by --condense / --focus."""
+    if not (args.condense or args.focus):
+        return graph
+    view = CondensedGraph.from_graph(graph)
+    if args.focus:
+        view = view.focus(args.focus, args.depth)
+    return view
+
+
+def render_text(args: argparse.Namespace, graph: DependencyGraph,
+                dependencies: Dict[str, Set[str]]) -> str:
+    """Render the text report selected by args (queries, module view or analysis)."""
+    if args.impacted_by or args.depends_on:
+        return render_queries(args, graph)
+    view = build_view(args, graph)
+    return format_condensed(view) if view is not graph else format_analysis(graph, dependencies)
+
+
+def emit_output(args: argparse.Namespace, graph: DependencyGraph,
+                dependencies: Dict[str, Set[str]]) -> int:
+    """Write the report selected by args and return the exit code it implies.
+
+    Graph formats are streamed straight to the output file (or stdout)
+    without building the document in memory. Raises LookupError when a
+    queried class is not in the graph.
+    """
+    if args.format == "text" or args.impacted_by or args.depends_on:
+        write_output(render_text(args, graph, dependencies), args.output)
+        if args.impacted_by or args.depends_on:
+            return 0
+    elif args.output:
+        with args.output.open("w") as handle:
+            getattr(build_view(args, graph), f"write_{args.format}")(handle)
+        print(f"Analysis written to: {args.output}")
+    else:
+        getattr(build_view(args, graph), f"write_{args.format}")(sys.stdout)
+
+    return 1 if graph.find_circular_dependencies() else 0
+
+
+def emit_environments(args: argparse.Namespace,
+                      environments: Dict[str, Tuple[DependencyGraph, Dict[str, Set[str]]]]) -> int:
+    """Write one report per environment and return the combined exit code.
+
+    Text reports are concatenated under an ``# Environment:`` heading each.
+    Graph formats are streamed to one file per environment, ``DIR/<environment>.<format>``.
+    """
+    queries = args.impacted_by or args.depends_on
+    status = 0
+
+    if args.format == "text" or queries:
+        sections = []
+        for env, (graph, dependencies) in environments.items():
+            try:
+                report = render_text(args, graph, dependencies)
+            except LookupError as e:
+                report = f"Error: {e}"
+            sections.append(f"# Environment: {env}\n\n{report}")
+            if not queries and graph.find_circular_dependencies():
+                status = 1
+        write_output("\n\n".join(sections), args.output)
+        return status
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    for env, (graph, _) in environments.items():
+        path = args.output / f"{env}.{args.format}"
+        with path.open("w") as handle:
+            getattr(build_view(args, graph), f"write_{args.format}")(handle)
+        if graph.find_circular_dependencies():
+            status = 1
+    print(f"Analysis written to: {args.output}")
+    return status
+
+
+def emit_profile(args: argparse.Namespace, profiler: Profiler):
+    """Print the profile table to stderr and write the JSON report if requested."""
+    print(profiler.format_table(), file=sys.stderr)
+    if args.profile_json:
+        args.profile_json.write_text(json.dumps(profiler.to_dict(), indent=2) + "\n")
+        print(f"Profile written to: {args.profile_json}", file=sys.stderr)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Analyze Puppet module dependencies"
@@ -231,38 +1745,206 @@ def main():
         type=Path,
         help="Path to Puppet module or manifests directory"
     )
+    parser.add_argument(
+        "--changed-since",
+        metavar="REF",
+        help="Only analyze files changed since the merge base with git REF, plus their reverse dependents"
+    )
+    parser.add_argument(
+        "--environments",
+        action="store_true",
+        help="Treat target as an environments directory (e.g. r10k) and report each environment"
+    )
+    parser.add_argument(
+        "--format",
+        choices=["text", *GRAPH_FORMATS],
+        default="text",
+        help="Output format (default: text analysis)"
+    )
     parser.add_argument(
         "--mermaid",
         action="store_true",
-        help="Output Mermaid diagram"
+        help="Output Mermaid diagram (same as --format mermaid)"
     )
     parser.add_argument(
         "--output",
         type=Path,
         help="Write output to file"
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes for parsing (0 = one per CPU)"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        help="Directory for the parse cache (default: ~/.cache/puppet-code-analyzer)"
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=256,
+        help="Maximum parse cache size in MB (default: 256)"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the parse cache"
+    )
+    parser.add_argument(
+        "--impacted-by",
+        metavar="CLASS",
+        help="List classes that depend on CLASS, directly or transitively"
+    )
+    parser.add_argument(
+        "--depends-on",
+        metavar="CLASS",
+        help="List classes that CLASS depends on, directly or transitively"
+    )
+    parser.add_argument(
+        "--condense",
+        action="store_true",
+        help="Show a module-level view with cycles collapsed into single nodes"
+    )
+    parser.add_argument(
+        "--focus",
+        metavar="NAME",
+        help="Limit the module-level view to the module of class or module NAME (implies --condense)"
+    )
+    parser.add_argument(
+        "--depth",
+        type=int,
+        default=1,
+        help="With --focus, how many module hops to include (default: 1)"
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and re-emit output whenever a manifest changes"
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Report time per phase, scanner match counts and the slowest files on stderr"
+    )
+    parser.add_argument(
+        "--profile-json",
+        type=Path,
+        metavar="FILE",
+        help="Write the --profile report as JSON to FILE (implies --profile)"
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=10,
+        metavar="N",
+        help="Number of slowest files in the profile (default: 10)"
+    )
+    parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="With --watch, poll modification times instead of using inotify"
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=1.0,
+        help="Seconds between polls with --watch --poll (default: 1.0)"
+    )
 
     args = parser.parse_args()
+    if args.mermaid:
+        args.format = "mermaid"
 
     if not args.target.exists():
         print(f"Error: Target path does not exist: {args.target}")
         return 1
 
-    parser_obj = PuppetParser()
-    dependencies = parser_obj.parse_directory(args.target)
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
 
-    if args.mermaid:
-        output = parser_obj.graph.to_mermaid()
-    else:
-        output = format_analysis(parser_obj.graph, dependencies)
+    cache = None
+    if not args.no_cache:
+        try:
+            cache = ParseCache(args.cache_dir or default_cache_dir(),
+                               args.cache_size * 1024 * 1024)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Warning: Parse cache disabled: {e}", file=sys.stderr)
 
-    if args.output:
-        args.output.write_text(output)
-        print(f"Analysis written to: {args.output}")
+    profiler = Profiler(args.profile_top) if args.profile or args.profile_json else None
+
+    if args.environments:
+        if args.watch or args.changed_since:
+            print("Error: --watch and --changed-since cannot be combined with --environments")
+            return 1
+        if args.format != "text" and not (args.impacted_by or args.depends_on) and not args.output:
+            print(f"Error: --environments with --format {args.format} requires --output DIR")
+            return 1
+        environments = parse_environments(args.target, jobs, cache, profiler)
+        if cache:
+            print(cache.stats(), file=sys.stderr)
+        start = time.perf_counter()
+        try:
+            status = emit_environments(args, environments)
+        except LookupError as e:
+            print(f"Error: {e}")
+            return 1
+        if profiler:
+            profiler.add("output", time.perf_counter() - start)
+            emit_profile(args, profiler)
+        return status
+
+    watcher = None
+    if args.changed_since:
+        if args.watch:
+            print("Error: --watch cannot be combined with --changed-since")
+            return 1
+        try:
+            parser_obj, dependencies = parse_changed(args.target, args.changed_since, jobs, cache, profiler)
+        except RuntimeError as e:
+            print(f"Error: {e}")
+            return 1
     else:
-        print(output)
+        parser_obj = PuppetParser(track_files=args.watch)
+        # Start watching before the initial parse so no edit can slip in between
+        if args.watch:
+            watcher = DependencyWatcher(parser_obj, args.target, args.poll, args.poll_interval)
+        dependencies = parser_obj.parse_directory(args.target, jobs, cache, profiler)
+
+    if cache:
+        # stderr keeps redirected Mermaid/analysis output clean
+        print(cache.stats(), file=sys.stderr)
+
+    graph = parser_obj.graph
+    start = time.perf_counter()
+    try:
+        status = emit_output(args, graph, dependencies)
+    except LookupError as e:
+        print(f"Error: {e}")
+        return 1
+    if profiler:
+        # Covers the analysis (cycles, unused classes, views) and writing it
+        profiler.add("output", time.perf_counter() - start)
+        emit_profile(args, profiler)
+
+    if watcher:
+        print(f"Watching {args.target} ({watcher.backend}), press Ctrl+C to stop", file=sys.stderr)
+        try:
+            for changed in watcher.changes():
+                start = time.perf_counter()
+                watcher.apply(changed, dependencies)
+                try:
+                    status = emit_output(args, graph, dependencies)
+                except LookupError as e:
+                    print(f"Error: {e}", file=sys.stderr)
+                    continue
+                elapsed = (time.perf_counter() - start) * 1000
+                print(f"Updated {len(changed)} file(s) in {elapsed:.1f} ms", file=sys.stderr)
+        except KeyboardInterrupt:
+            pass
 
-    return 1 if parser_obj.graph.find_circular_dependencies() else 0
+    return status
 
 
 if __name__ == "__main__":
@@ -0,0 +1,248 @@
+"""
+Puppet Analyzer Common - Helpers shared by the analyzer scripts
+
+The analyzer scripts are run directly, so they import this module from
+their own directory.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import subprocess
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+def run_git(cwd: Path, *args: str) -> bytes:
+    """Run git in cwd and return its output. Raises RuntimeError if git fails."""
+    try:
+        result = subprocess.run(["git", *args], cwd=cwd, capture_output=True, check=False)
+    except FileNotFoundError:
+        raise RuntimeError("git not found")
+    if result.returncode != 0:
+        raise RuntimeError(f"git {' '.join(args)} failed: {result.stderr.decode(errors='replace').strip()}")
+    return result.stdout
+
+
+def git_changed_files(target: Path, ref: str,
+                      deleted_content: bool = False) -> Tuple[List[Path], Dict[Path, bytes]]:
+    """Find .pp files under target that changed since the merge base of ref and HEAD.
+
+    Committed, staged, unstaged and untracked changes all count. Returns
+    the resolved paths of changed files that still exist, and the deleted
+    ones mapped to their content at the merge base (only looked up with
+    ``deleted_content``; empty otherwise). Raises RuntimeError if git fails.
+    """
+    target = target.resolve()
+    cwd = target if target.is_dir() else target.parent
+    top = Path(run_git(cwd, "rev-parse", "--show-toplevel").decode().strip())
+    base = run_git(cwd, "merge-base", ref, "HEAD").decode().strip()
+
+    diff = run_git(top, "diff", "--name-status", "--no-renames", "-z", base, "--").split(b"\0")
+    untracked = run_git(top, "ls-files", "--others", "--exclude-standard", "-z").split(b"\0")
+    # name-status output alternates status and path
+    entries = list(zip(diff[0::2], diff[1::2])) + [(b"A", name) for name in untracked if name]
+
+    changed, deleted = [], {}
+    for status, name in entries:
+        path = top / os.fsdecode(name)
+        if path.suffix != ".pp" or not (path == target or target in path.parents):
+            continue
+        if status != b"D":
+            changed.append(path)
+        elif deleted_content:
+            deleted[path] = run_git(top, "show", f"{base}:{os.fsdecode(name)}")
+    return sorted(changed), deleted
+
+
+def relative_to_target(target: Path, paths: List[Path]) -> List[Path]:
+    """Name resolved paths under target the way a walk of target does.
+
+    For a directory target each path becomes ``target / <path below it>``,
+    so a relative target gives relative paths; a file target names itself.
+    """
+    if not target.is_dir():
+        return [target for _ in paths]
+    resolved = target.resolve()
+    return [target / path.relative_to(resolved) for path in paths]
+
+
+class Baseline:
+    """Fingerprints of known findings, so that only new ones are reported.
+
+    A fingerprint hashes the rule, the file's path relative to ``root`` and
+    the text of the finding's line with whitespace normalized, so it still
+    matches after lines are inserted or removed above it. Fingerprints are
+    counted: each recorded occurrence suppresses one identical finding.
+    """
+
+    VERSION = 1
+
+    def __init__(self, root: Path, counts: Optional[Dict[str, int]] = None):
+        self.root = root.resolve()
+        self.counts: Dict[str, int] = defaultdict(int, counts or {})
+        self.suppressed = 0
+        # (file as reported, path relative to root, lines) of the last file
+        # read; findings arrive grouped by file
+        self._file: Tuple[Optional[str], str, List[str]] = (None, "", [])
+
+    @classmethod
+    def load(cls, path: Path, root: Path) -> "Baseline":
+        """Read a baseline file. Raises ValueError if it is not one."""
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError) as e:
+            raise ValueError(f"Could not read baseline {path}: {e}")
+        if not isinstance(data, dict) or data.get("version") != cls.VERSION:
+            raise ValueError(f"Not a version {cls.VERSION} baseline: {path}")
+        return cls(root, data.get("fingerprints", {}))
+
+    def save(self, path: Path):
+        data = {"version": self.VERSION, "fingerprints": dict(sorted(self.counts.items()))}
+        path.write_text(json.dumps(data, indent=2) + "\n")
+
+    def fingerprint(self, rule_name: str, file: str, line: int) -> str:
+        """Stable fingerprint of a finding of rule_name at file:line."""
+        if self._file[0] != file:
+            path = Path(file)
+            if not path.is_absolute():
+                # Relative paths are tried against root before the working
+                # directory, so a fingerprint does not depend on where the
+                # tool runs
+                under_root = self.root / path
+                path = under_root if under_root.exists() or not path.exists() else path
+            try:
+                lines = path.read_text(errors="replace").splitlines()
+            except OSError:
+                lines = []
+            try:
+                relative = path.resolve().relative_to(self.root).as_posix()
+            except ValueError:
+                relative = Path(file).as_posix()
+            self._file = (file, relative, lines)
+
+        _, relative, lines = self._file
+        text = " ".join(lines[line - 1].split()) if 0 < line <= len(lines) else ""
+        return hashlib.sha256(f"{rule_name}\0{relative}\0{text}".encode()).hexdigest()[:32]
+
+    def add(self, rule_name: str, file: str, line: int):
+        """Record a finding as known."""
+        self.counts[self.fingerprint(rule_name, file, line)] += 1
+
+    def is_known(self, rule_name: str, file: str, line: int) -> bool:
+        """Whether a finding is recorded; each recorded occurrence matches once."""
+        key = self.fingerprint(rule_name, file, line)
+        if self.counts.get(key, 0) > 0:
+            self.counts[key] -= 1
+            self.suppressed += 1
+            return True
+        return False
+
+
+def sarif_uri(path: str) -> str:
+    """SARIF artifact URI for a reported path: file URI if absolute, else relative."""
+    path = Path(path)
+    return path.as_uri() if path.is_absolute() else path.as_posix()
+
+
+class SqliteCache:
+    """Persistent cache of text payloads by key, in one SQLite file.
+
+    SQLite's locking serialises concurrent writers, so parallel CI jobs
+    can share one cache directory. Lookups count hits and misses; new
+    entries, removals and LRU timestamps are queued and written together
+    by ``flush``, which then evicts the least recently used entries once
+    payloads exceed ``max_bytes``. Subclasses set ``FILENAME`` and
+    ``LABEL`` and encode their own payloads.
+    """
+
+    FILENAME = "cache.sqlite3"
+    LABEL = "Cache"
+
+    def __init__(self, cache_dir: Path, max_bytes: int):
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self.path = cache_dir / self.FILENAME
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._used: List[str] = []
+        self._new: List[Tuple[str, str]] = []
+        self._stale: List[str] = []
+
+        self._db = sqlite3.connect(str(self.path), timeout=60)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " payload TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)"
+            )
+
+    def _load(self, key: str) -> Optional[str]:
+        """Return the payload stored for key, if present."""
+        row = self._db.execute(
+            "SELECT payload FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._used.append(key)
+        return row[0]
+
+    def _store(self, key: str, payload: str):
+        """Queue a payload for storage on the next ``flush``."""
+        self._new.append((key, payload))
+
+    def delete(self, key: str):
+        """Queue an entry for removal on the next ``flush``."""
+        self._stale.append(key)
+
+    def flush(self):
+        """Write queued changes, refresh LRU timestamps and enforce the size cap."""
+        now = time.time()
+        with self._db:
+            self._db.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in self._stale])
+            self._db.executemany(
+                "INSERT OR REPLACE INTO entries (key, payload, size, last_used) VALUES (?, ?, ?, ?)",
+                [(key, payload, len(payload), now) for key, payload in self._new]
+            )
+            self._db.executemany(
+                "UPDATE entries SET last_used = ? WHERE key = ?",
+                [(now, key) for key in self._used]
+            )
+
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total > self.max_bytes:
+                evict = []
+                for key, size in self._db.execute("SELECT key, size FROM entries ORDER BY last_used"):
+                    if total <= self.max_bytes:
+                        break
+                    evict.append((key,))
+                    total -= size
+                self._db.executemany("DELETE FROM entries WHERE key = ?", evict)
+
+        self._new.clear()
+        self._used.clear()
+        self._stale.clear()
+
+    def stats(self) -> str:
+        """One-line hit ratio summary."""
+        lookups = self.hits + self.misses
+        ratio = 100.0 * self.hits / lookups if lookups else 0.0
+        return f"{self.LABEL}: {self.hits}/{lookups} hits ({ratio:.1f}%)"
+
+
+def default_cache_dir() -> Path:
+    """Per-user cache directory, honouring XDG_CACHE_HOME."""
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "puppet-code-analyzer"
@@ -8,14 +8,41 @@ It validates naming conventions, resource ordering, parameter handling, and more
 Usage:
     python3 check_best_practices.py <path-to-manifest-or-directory>
     python3 check_best_practices.py --style-guide <path-to-style-guide.md> <target>
+    python3 check_best_practices.py --environments <path-to-environments-dir>
+    python3 check_best_practices.py --disable string-quotes --severity parameter-types=warning <target>
+    python3 check_best_practices.py --list-rules
+    python3 check_best_practices.py --jobs 8 --stream <directory>
+    python3 check_best_practices.py --format sarif --output results.sarif <directory>
+    python3 check_best_practices.py --changed-since origin/main <directory>
+    python3 check_best_practices.py --profile --profile-json profile.json <directory>
+    python3 check_best_practices.py --baseline known.json --write-baseline <directory>
+    python3 check_best_practices.py --baseline known.json <directory>
 """
 
 import argparse
+import hashlib
+import heapq
 import json
+import os
 import re
+import sys
+import time
+from array import array
+from bisect import bisect_right
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, List, Set, Tuple
-from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+from dataclasses import dataclass, replace
+
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants
+    import sre_parse
+
+from analyzer_common import Baseline, git_changed_files, relative_to_target, sarif_uri
 
 
 @dataclass
@@ -27,6 +54,7 @@ class PracticeIssue:
     category: str
     message: str
     suggestion: str = ""
+    rule: str = ""
 
     def to_dict(self) -> Dict:
         return {
@@ -35,9 +63,388 @@ class PracticeIssue:
             "severity": self.severity,
             "category": self.category,
             "message": self.message,
-            "suggestion": self.suggestion
+            "suggestion": self.suggestion,
+            "rule": self.rule
+        }
+
+
+class IssueStore:
+    """Compact, append-only store of practice issues.
+
+    Each stored issue is three integers: its file, its line and its kind,
+    where a kind is a distinct ``(severity, category, message, suggestion,
+    rule)`` tuple shared by every identical finding, and files are
+    interned the same way. Counts per rule and per ``(category,
+    severity)`` cover every issue added, but with ``info_limit`` only the
+    first that many info issues of each category are kept, so a flood of
+    low-severity findings costs a counter rather than memory.
+    """
+
+    __slots__ = ("info_limit", "_files", "_file_ids", "_kinds", "_kind_ids",
+                 "_file_col", "_line_col", "_kind_col", "_kept_info", "rule_counts", "group_counts")
+
+    def __init__(self, issues: Iterable[PracticeIssue] = (), info_limit: Optional[int] = None):
+        self.info_limit = info_limit
+        self._files: List[str] = []
+        self._file_ids: Dict[str, int] = {}
+        self._kinds: List[Tuple[str, str, str, str, str]] = []
+        self._kind_ids: Dict[Tuple[str, str, str, str, str], int] = {}
+        self._file_col = array("I")
+        self._line_col = array("I")
+        self._kind_col = array("I")
+        self._kept_info: Dict[str, int] = defaultdict(int)
+        self.rule_counts: Dict[str, int] = defaultdict(int)
+        self.group_counts: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.extend(issues)
+
+    def add(self, issue: PracticeIssue):
+        self.rule_counts[issue.rule] += 1
+        self.group_counts[(issue.category, issue.severity)] += 1
+        if issue.severity == "info" and self.info_limit is not None:
+            if self._kept_info[issue.category] >= self.info_limit:
+                return
+            self._kept_info[issue.category] += 1
+
+        file_id = self._file_ids.get(issue.file)
+        if file_id is None:
+            file_id = self._file_ids[issue.file] = len(self._files)
+            self._files.append(issue.file)
+        kind = (issue.severity, issue.category, issue.message, issue.suggestion, issue.rule)
+        kind_id = self._kind_ids.get(kind)
+        if kind_id is None:
+            kind_id = self._kind_ids[kind] = len(self._kinds)
+            self._kinds.append(kind)
+
+        self._file_col.append(file_id)
+        self._line_col.append(issue.line)
+        self._kind_col.append(kind_id)
+
+    def extend(self, issues: Iterable[PracticeIssue]):
+        for issue in issues:
+            self.add(issue)
+
+    def __len__(self) -> int:
+        """Number of issues added, including any not kept."""
+        return sum(self.group_counts.values())
+
+    def __iter__(self) -> Iterator[PracticeIssue]:
+        """Rebuild the kept issues, in the order they were added."""
+        files, kinds = self._files, self._kinds
+        for file_id, line, kind_id in zip(self._file_col, self._line_col, self._kind_col):
+            severity, category, message, suggestion, rule = kinds[kind_id]
+            yield PracticeIssue(files[file_id], line, severity, category, message, suggestion, rule)
+
+
+class LineIndex:
+    """Offsets of line starts in a manifest, for bisect line/column lookups."""
+
+    def __init__(self, content: str):
+        self.starts = [0]
+        self.starts.extend(m.end() for m in re.finditer('\n', content))
+
+    def line(self, offset: int) -> int:
+        """1-based line number of the character at offset."""
+        return bisect_right(self.starts, offset)
+
+    def column(self, offset: int) -> int:
+        """1-based column of the character at offset."""
+        return offset - self.starts[bisect_right(self.starts, offset) - 1] + 1
+
+
+@dataclass
+class Rule:
+    """A registered best practice rule.
+
+    ``scope`` selects what the rule subscribes to from the shared scan:
+    ``"file"`` rules are called once with the scan, ``"line"`` rules once
+    per line and ``"resource"`` rules once per resource declaration. Each
+    call returns ``(line, message, suggestion)`` tuples, optionally
+    extended with ``(severity, category)`` to override the rule's own.
+    """
+    name: str
+    category: str
+    severity: str
+    scope: str
+    check: Callable
+    description: str = ""
+    enabled: bool = True
+
+
+RULES: Dict[str, Rule] = {}
+SEVERITIES = ("critical", "warning", "info")
+
+
+def rule(name: str, category: str, severity: str, scope: str, enabled: bool = True):
+    """Register the decorated function as a best practice rule."""
+    def register(check: Callable) -> Callable:
+        RULES[name] = Rule(name, category, severity, scope, check,
+                           (check.__doc__ or "").strip(), enabled)
+        return check
+    return register
+
+
+class ProfiledPattern:
+    """Stand-in for a compiled regex that counts calls, matches and time.
+
+    Only installed by ``Profiler.instrument``; ``stats`` is the
+    ``[calls, matches, seconds]`` entry the counts are added to.
+    """
+
+    def __init__(self, pattern: re.Pattern, stats: List):
+        self.pattern = pattern
+        self.stats = stats
+
+    def _timed(self, method: Callable, args: tuple):
+        start = time.perf_counter()
+        result = method(*args)
+        self.stats[2] += time.perf_counter() - start
+        self.stats[0] += 1
+        return result
+
+    def search(self, *args):
+        match = self._timed(self.pattern.search, args)
+        self.stats[1] += match is not None
+        return match
+
+    def match(self, *args):
+        match = self._timed(self.pattern.match, args)
+        self.stats[1] += match is not None
+        return match
+
+    def findall(self, *args):
+        found = self._timed(self.pattern.findall, args)
+        self.stats[1] += len(found)
+        return found
+
+    def finditer(self, *args):
+        # Matching happens as the iterator is consumed, so time each step
+        stats = self.stats
+        stats[0] += 1
+        matches = self.pattern.finditer(*args)
+        while True:
+            start = time.perf_counter()
+            match = next(matches, None)
+            stats[2] += time.perf_counter() - start
+            if match is None:
+                return
+            stats[1] += 1
+            yield match
+
+
+class Profiler:
+    """Wall time and match counts per rule, per regex and per file, for --profile.
+
+    ``rules`` and ``regexes`` map names to ``[calls, matches, seconds]``;
+    for rules, matches are the issues reported. Only the ``top`` slowest
+    files are kept. The checker does no timing at all unless it is given
+    a profiler.
+    """
+
+    def __init__(self, top: int = 10):
+        self.top = top
+        self.rules: Dict[str, List] = defaultdict(lambda: [0, 0, 0.0])
+        self.regexes: Dict[str, List] = defaultdict(lambda: [0, 0, 0.0])
+        self.slowest: List[Tuple[float, str]] = []  # min-heap of (seconds, file)
+        self.files = 0
+        self.seconds = 0.0
+
+    def timed(self, name: str, check: Callable) -> Callable:
+        """Wrap a rule's check function so each call is timed and counted."""
+        stats = self.rules[name]
+
+        def run(*args):
+            start = time.perf_counter()
+            found = list(check(*args))
+            stats[2] += time.perf_counter() - start
+            stats[0] += 1
+            stats[1] += len(found)
+            return found
+        return run
+
+    def record_file(self, path: str, seconds: float):
+        """Record the time taken to check one file."""
+        self.files += 1
+        self.seconds += seconds
+        if len(self.slowest) < self.top:
+            heapq.heappush(self.slowest, (seconds, path))
+        elif self.top and seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (seconds, path))
+
+    @contextmanager
+    def instrument(self, owner, style_guide: Optional["StyleGuideMatcher"] = None, prefix: str = ""):
+        """Count the compiled regexes among owner's attributes while the block runs.
+
+        Each is replaced by a counting proxy, as are the anchor scan and
+        patterns of ``style_guide`` (counted separately). The originals
+        are put back on exit; until then, patching a class affects every
+        user of it in this process.
+        """
+        patterns = {name: value for name, value in vars(owner).items() if isinstance(value, re.Pattern)}
+        saved = (style_guide.anchors, style_guide.compiled) if style_guide else None
+        try:
+            for name, value in patterns.items():
+                setattr(owner, name, ProfiledPattern(value, self.regexes[prefix + name]))
+            if style_guide:
+                if style_guide.anchors is not None:
+                    style_guide.anchors = ProfiledPattern(style_guide.anchors,
+                                                          self.regexes["style-guide anchors"])
+                style_guide.compiled = [ProfiledPattern(c, self.regexes[f"style-guide `{p.pattern}`"])
+                                        for p, c in zip(style_guide.patterns, style_guide.compiled)]
+            yield
+        finally:
+            for name, value in patterns.items():
+                setattr(owner, name, value)
+            if style_guide:
+                style_guide.anchors, style_guide.compiled = saved
+
+    @staticmethod
+    def _rows(table: Dict[str, List]) -> List[Dict]:
+        rows = [{"name": name, "calls": calls, "matches": matches, "seconds": seconds}
+                for name, (calls, matches, seconds) in table.items()]
+        return sorted(rows, key=lambda row: -row["seconds"])
+
+    def to_dict(self) -> Dict:
+        return {
+            "files": self.files,
+            "seconds": self.seconds,
+            "rules": self._rows(self.rules),
+            "regexes": self._rows(self.regexes),
+            "slowest_files": [{"file": path, "seconds": seconds}
+                              for seconds, path in sorted(self.slowest, reverse=True)],
         }
 
+    def format_table(self) -> str:
+        """Format the profile as markdown tables, slowest first."""
+        report = self.to_dict()
+        output = [f"## Profile: {report['files']} file(s) in {report['seconds']:.3f} s"]
+        for title, key in (("Rules", "rules"), ("Regexes", "regexes")):
+            output.append(f"\n### {title}")
+            output.append("| Name | Calls | Matches | Seconds |")
+            output.append("|------|-------|---------|---------|")
+            for row in report[key]:
+                if not row["calls"]:
+                    continue
+                output.append(f"| {row['name']} | {row['calls']} | {row['matches']} | {row['seconds']:.4f} |")
+        output.append("\n### Slowest files")
+        output.append("| File | Seconds |")
+        output.append("|------|---------|")
+        for row in report["slowest_files"]:
+            output.append(f"| {row['file']} | {row['seconds']:.4f} |")
+        return "\n".join(output)
+
+
+@dataclass
+class StylePattern:
+    """A forbidden or required pattern from a style guide bullet."""
+    kind: str  # forbidden, required
+    pattern: str
+    message: str
+    severity: str
+    category: str
+
+
+def literal_anchor(pattern: str) -> Optional[str]:
+    """Longest run of literal characters every match of pattern must contain.
+
+    Only top-level literals count; returns None when there are none, or
+    when the pattern is case-insensitive.
+    """
+    parsed = sre_parse.parse(pattern)
+    if parsed.state.flags & re.IGNORECASE:
+        return None
+    best, run = "", ""
+    for op, value in parsed:
+        if op == sre_constants.LITERAL:
+            run += chr(value)
+            best = max(best, run, key=len)
+        elif op != sre_constants.AT:
+            run = ""
+        # zero-width assertions (^, $, \b) neither extend nor break a run
+    return best or None
+
+
+def trie_pattern(words: Iterable[str]) -> str:
+    """Regex source matching any of words, factored into a prefix trie.
+
+    The regex engine tries alternatives one by one, so a flat alternation
+    of many words costs one attempt per word per position; a trie costs
+    one character test per level instead.
+    """
+    trie: Dict[str, Dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        # Optional suffixes are greedy, so the longest word matches
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+class StyleGuideMatcher:
+    """Style guide patterns compiled into one combined matcher.
+
+    Each pattern contributes its longest required literal (its anchor) to
+    a single trie-shaped regex, so one scan of a file finds every anchor
+    that occurs, however many house rules there are. Only patterns whose
+    anchor occurs (and the rare patterns without one) then run their own
+    regex. Forbidden patterns are reported once per line they match;
+    required patterns are reported when they never match.
+    """
+
+    def __init__(self, patterns: List[StylePattern]):
+        self.patterns = patterns
+        self.compiled = [re.compile(p.pattern, re.MULTILINE) for p in patterns]
+        self.anchor_of = [literal_anchor(p.pattern) for p in patterns]
+        anchors = {anchor for anchor in self.anchor_of if anchor}
+        self.anchors = re.compile(f"(?=({trie_pattern(anchors)}))") if anchors else None
+        self.anchor_set = anchors
+
+    def check(self, scan: "ManifestScan") -> Iterator[Tuple[int, str, str, str, str]]:
+        """Yield ``(line, message, suggestion, severity, category)`` for each violation."""
+        content = scan.content
+        present = set()
+        if self.anchors:
+            # The trie reports the longest anchor at each position; any
+            # shorter anchor starting there is one of its prefixes
+            for hit in {match.group(1) for match in self.anchors.finditer(content)}:
+                present.update(hit[:end] for end in range(1, len(hit) + 1)
+                               if hit[:end] in self.anchor_set)
+
+        for p, compiled, anchor in zip(self.patterns, self.compiled, self.anchor_of):
+            candidate = anchor is None or anchor in present
+            if p.kind == "required":
+                if not (candidate and compiled.search(content)):
+                    yield 1, p.message, "", p.severity, p.category
+            elif candidate:
+                reported = set()
+                for match in compiled.finditer(content):
+                    line = scan.index.line(match.start())
+                    if line not in reported:
+                        reported.add(line)
+                        yield line, p.message, "", p.severity, p.category
+
+
+class ManifestScan:
+    """One scan of a manifest, shared by every rule that checks it."""
+
+    def __init__(self, content: str, filepath: Path, style_guide: StyleGuideMatcher = None):
+        self.content = content
+        self.file = str(filepath)
+        self.style_guide = style_guide
+        self.lines = content.splitlines()
+        self.index = LineIndex(content)
+        # (line number, resource type) of every resource declaration,
+        # filled in during the line pass
+        self.resources: List[Tuple[int, str]] = []
+
 
 class BestPracticeChecker:
     """Check Puppet manifests against best practices."""
@@ -46,169 +453,165 @@ class BestPracticeChecker:
     CLASS_DEF = re.compile(r'^class\s+([a-z][a-z0-9_:]*)\s*(?:\(|\s*\{)', re.MULTILINE)
     RESOURCE_DECL = re.compile(r'^\s*([a-z][a-z0-9_]*)\s*\{', re.MULTILINE)
     PARAMETER_DEF = re.compile(r'(\$\w+)\s*=\s*([^,)]+)', re.MULTILINE)
+    PARAMETER_ASSIGN = re.compile(r'^\s*(\$\w+)\s*=', re.MULTILINE)
     HIERA_LOOKUP = re.compile(r'hiera\([\'"]([^\'"]+)[\'"]\s*,\s*([^)]+)\)', re.MULTILINE)
     AUTO_LOOKUP = re.compile(r'(\$\w+)\s*=', re.MULTILINE)
     STRING_QUOTE_DOUBLE = re.compile(r'^\s*\w+\s*\{[^}]*"[^"]*"[^}]*\}', re.MULTILINE)
+    DOUBLE_QUOTED = re.compile(r'"([^$"]*)"')
     SELECTOR_STMT = re.compile(r'\$[a-z_]+\s*\?\s*\{[^}]+\}', re.MULTILINE | re.DOTALL)
     CASE_STMT = re.compile(r'case\s*\$[^{]+\{[^}]+\}', re.MULTILINE | re.DOTALL)
+    LOWERCASE_NAME = re.compile(r'^[a-z][a-z0-9_]*$')
 
-    def __init__(self, style_guide_path: Path = None):
+    def __init__(self, style_guide_path: Path = None, enable: Iterable[str] = (),
+                 disable: Iterable[str] = (), severities: Dict[str, str] = None,
+                 profiler: Optional[Profiler] = None):
+        """Configure the registered rules.
+
+        Rules named in ``enable``/``disable`` are switched on or off, and
+        ``severities`` maps rule names to a severity overriding the
+        default, and any severity a finding sets itself. Raises ValueError for unknown rule names or severities.
+        With a ``profiler``, every rule call and checked file is timed.
+        """
         self.issues: List[PracticeIssue] = []
+        self.profiler = profiler
         self.style_guide_rules: Dict[str, List[str]] = {}
+        self.style_guide: StyleGuideMatcher = None
         if style_guide_path and style_guide_path.exists():
             self._load_style_guide(style_guide_path)
 
+        severities = severities or {}
+        enable, disable = set(enable), set(disable)
+        for name in enable | disable | set(severities):
+            if name not in RULES:
+                raise ValueError(f"Unknown rule: {name}")
+        for name, severity in severities.items():
+            if severity not in SEVERITIES:
+                raise ValueError(f"Unknown severity for {name}: {severity}")
+
+        # Kept to apply after per-finding overrides such as a style guide entry's
+        self.severities = dict(severities)
+        self.rules: Dict[str, Rule] = {
+            name: replace(
+                registered,
+                severity=severities.get(name, registered.severity),
+                enabled=(registered.enabled or name in enable) and name not in disable,
+            )
+            for name, registered in RULES.items()
+        }
+
+    # "Forbidden (critical): `regex` - message" or "Required: `regex` - message"
+    STYLE_BULLET = re.compile(
+        r'^(forbidden|required)\s*(?:\((critical|warning|info)\))?\s*:\s*`([^`]+)`\s*(?:[-—:]\s*(.*))?$',
+        re.IGNORECASE
+    )
+
     def _load_style_guide(self, path: Path):
-        """Load custom style guide rules from markdown file."""
+        """Load custom style guide rules from markdown file.
+
+        Bullets of the form ``Forbidden: `regex` - message`` or
+        ``Required: `regex` - message`` (optionally ``Forbidden (critical):``)
+        are compiled into ``self.style_guide``; other bullets are kept as
+        text in ``style_guide_rules``.
+        """
         content = path.read_text()
         # Simple parsing - in production, use proper markdown parser
         current_section = "general"
+        in_code = False
+        patterns = []
         for line in content.splitlines():
-            if line.startswith("##"):
-                current_section = line.lower().replace("##", "").strip()
+            if line.startswith("```"):
+                in_code = not in_code
+            elif in_code:
+                continue
+            elif line.startswith("##"):
+                current_section = line.lower().lstrip("#").strip()
             elif line.strip().startswith("-"):
                 rule = line.strip().lstrip("-").strip()
                 if current_section not in self.style_guide_rules:
                     self.style_guide_rules[current_section] = []
                 self.style_guide_rules[current_section].append(rule)
 
-    def check_naming_conventions(self, content: str, filepath: Path) -> List[PracticeIssue]:
-        """Check naming conventions."""
-        issues = []
-        lines = content.splitlines()
-
-        # Check class names (should be lowercase with underscores)
-        for match in self.CLASS_DEF.finditer(content):
-            class_name = match.group(1)
-            line_no = content[:match.start()].count('\n') + 1
-            if '::' in class_name:
-                parts = class_name.split('::')
-                for part in parts:
-                    if not re.match(r'^[a-z][a-z0-9_]*$', part):
-                        issues.append(PracticeIssue(
-                            file=str(filepath),
-                            line=line_no,
-                            severity="warning",
-                            category="naming",
-                            message=f"Class name '{class_name}' should use lowercase with underscores",
-                            suggestion=f"Rename to: {self._suggest_class_name(class_name)}"
-                        ))
-                        break
-
-        # Check resource names (should be lowercase with underscores)
-        for i, line in enumerate(lines, 1):
-            for match in self.RESOURCE_DECL.finditer(line):
+                match = self.STYLE_BULLET.match(rule)
+                if not match:
+                    continue
+                kind, severity, pattern, message = match.groups()
+                kind = kind.lower()
+                try:
+                    re.compile(pattern)
+                except re.error as e:
+                    print(f"Warning: Skipping style guide pattern `{pattern}`: {e}", file=sys.stderr)
+                    continue
+                if not message:
+                    message = f"Forbidden pattern `{pattern}`" if kind == "forbidden" \
+                        else f"Missing required pattern `{pattern}`"
+                patterns.append(StylePattern(kind, pattern, message,
+                                             (severity or "warning").lower(), current_section))
+
+        if patterns:
+            self.style_guide = StyleGuideMatcher(patterns)
+
+    def run_rules(self, content: str, filepath: Path, names: Iterable[str]) -> List[PracticeIssue]:
+        """Run the named rules over one shared scan of content.
+
+        The file is split into lines once; line and resource rules are
+        dispatched from a single pass over them, then file rules run with
+        the same scan. Issues are returned grouped by rule, in registry
+        order.
+        """
+        scan = ManifestScan(content, filepath, self.style_guide)
+        rules = [self.rules[name] for name in names]
+        found: Dict[str, List[Tuple[int, str, str]]] = {r.name: [] for r in rules}
+        if self.profiler:
+            checks = {r.name: self.profiler.timed(r.name, r.check) for r in rules}
+        else:
+            checks = {r.name: r.check for r in rules}
+        line_rules = [(checks[r.name], found[r.name]) for r in rules if r.scope == "line"]
+        resource_rules = [(checks[r.name], found[r.name]) for r in rules if r.scope == "resource"]
+
+        resource_decl = self.RESOURCE_DECL.search
+        for line_no, line in enumerate(scan.lines, 1):
+            for check, out in line_rules:
+                out.extend(check(scan, line_no, line))
+            match = resource_decl(line)
+            if match:
                 resource_type = match.group(1)
-                if not re.match(r'^[a-z][a-z0-9_]*$', resource_type):
-                    issues.append(PracticeIssue(
-                        file=str(filepath),
-                        line=i,
-                        severity="warning",
-                        category="naming",
-                        message=f"Resource type '{resource_type}' should use lowercase",
-                        suggestion=f"Use: {resource_type.lower()}"
-                    ))
+                scan.resources.append((line_no, resource_type))
+                for check, out in resource_rules:
+                    out.extend(check(scan, line_no, resource_type))
+
+        for r in rules:
+            if r.scope == "file":
+                found[r.name].extend(checks[r.name](scan))
 
+        issues = []
+        for r in rules:
+            for line, message, suggestion, *override in found[r.name]:
+                severity, category = override or (r.severity, r.category)
+                if r.name in self.severities:
+                    severity = r.severity
+                issues.append(PracticeIssue(file=scan.file, line=line, severity=severity, category=category,
+                                            message=message, suggestion=suggestion, rule=r.name))
         return issues
 
+    def check_naming_conventions(self, content: str, filepath: Path) -> List[PracticeIssue]:
+        """Check naming conventions."""
+        return self.run_rules(content, filepath, ["class-naming", "resource-naming"])
+
     def check_string_quotes(self, content: str, filepath: Path) -> List[PracticeIssue]:
         """Check string quote usage - prefer single quotes."""
-        issues = []
-        lines = content.splitlines()
-
-        for i, line in enumerate(lines, 1):
-            # Find double-quoted strings that don't contain variables
-            double_quotes = re.findall(r'"([^$"]*)"', line)
-            for _ in double_quotes:
-                # This is a simplified check
-                if '$' not in line and '\\' not in line:
-                    issues.append(PracticeIssue(
-                        file=str(filepath),
-                        line=i,
-                        severity="info",
-                        category="style",
-                        message="Prefer single quotes for static strings",
-                        suggestion="Replace with single quotes unless string contains variables or escapes"
-                    ))
-
-        return issues
+        return self.run_rules(content, filepath, ["string-quotes"])
 
     def check_parameter_defaults(self, content: str, filepath: Path) -> List[PracticeIssue]:
         """Check parameter default values."""
-        issues = []
-
-        # Look for parameters without type specifications
-        param_pattern = re.compile(r'^\s*(\$\w+)\s*=', re.MULTILINE)
-        for match in param_pattern.finditer(content):
-            param = match.group(1)
-            line_no = content[:match.start()].count('\n') + 1
-
-            # Check if this parameter is in a class definition with type
-            # This is simplified - proper parsing would need full grammar
-            issues.append(PracticeIssue(
-                file=str(filepath),
-                line=line_no,
-                severity="info",
-                category="parameters",
-                message=f"Parameter '{param}' should have a type specification",
-                suggestion="Add type: e.g., 'String $param_name ='"
-            ))
-
-        return issues
+        return self.run_rules(content, filepath, ["parameter-types"])
 
     def check_hiera_lookups(self, content: str, filepath: Path) -> List[PracticeIssue]:
         """Check for old-style hiera() function calls."""
-        issues = []
-
-        for match in self.HIERA_LOOKUP.finditer(content):
-            line_no = content[:match.start()].count('\n') + 1
-            key = match.group(1)
-            issues.append(PracticeIssue(
-                file=str(filepath),
-                line=line_no,
-                severity="warning",
-                category="hiera",
-                message=f"Use automatic parameter lookup instead of hiera() function",
-                suggestion=f"Replace with automatic lookup: use 'class { 'myclass::${key}': }' in Hiera data"
-            ))
-
-        return issues
+        return self.run_rules(content, filepath, ["hiera-function"])
 
     def check_resource_ordering(self, content: str, filepath: Path) -> List[PracticeIssue]:
         """Check for implicit ordering issues."""
-        issues = []
-        lines = content.splitlines()
-
-        # Look for resources without explicit ordering that might conflict
-        resource_types = defaultdict(list)
-        for i, line in enumerate(lines, 1):
-            match = self.RESOURCE_DECL.search(line)
-            if match:
-                resource_type = match.group(1)
-                resource_types[resource_type].append((i, line))
-
-        # Check for multiple packages/files that might need ordering
-        if len(resource_types.get('package', [])) > 3:
-            issues.append(PracticeIssue(
-                file=str(filepath),
-                line=resource_types['package'][0][0],
-                severity="info",
-                category="ordering",
-                message=f"Multiple package resources - consider explicit ordering",
-                suggestion="Use chaining or require/contain relationships"
-            ))
-
-        return issues
-
-    def _suggest_class_name(self, name: str) -> str:
-        """Suggest corrected class name."""
-        parts = name.split('::')
-        corrected = []
-        for part in parts:
-            # Convert CamelCase to snake_case
-            s1 = re.sub('(.)([A-Z][a-z]+)', r'\1_\2', part)
-            corrected.append(re.sub('([a-z0-9])([A-Z])', r'\1_\2', s1).lower())
-        return '::'.join(corrected)
+        return self.run_rules(content, filepath, ["resource-ordering"])
 
     def check_file(self, filepath: Path) -> List[PracticeIssue]:
         """Run all checks on a single file."""
@@ -217,25 +620,182 @@ class BestPracticeChecker:
         except Exception:
             return []
 
-        issues = []
-        issues.extend(self.check_naming_conventions(content, filepath))
-        issues.extend(self.check_string_quotes(content, filepath))
-        issues.extend(self.check_parameter_defaults(content, filepath))
-        issues.extend(self.check_hiera_lookups(content, filepath))
-        issues.extend(self.check_resource_ordering(content, filepath))
+        return self.check_content(content, filepath)
 
+    def check_content(self, content: str, filepath: Path) -> List[PracticeIssue]:
+        """Run all enabled rules on manifest content, reporting issues against filepath."""
+        names = [name for name, r in self.rules.items() if r.enabled]
+        if not self.profiler:
+            return self.run_rules(content, filepath, names)
+
+        start = time.perf_counter()
+        issues = self.run_rules(content, filepath, names)
+        self.profiler.record_file(str(filepath), time.perf_counter() - start)
         return issues
 
-    def check_directory(self, directory: Path) -> List[PracticeIssue]:
+    def iter_directory(self, directory: Path, jobs: int = 1) -> Iterator[Tuple[Path, List[PracticeIssue]]]:
+        """Yield ``(file, issues)`` for every .pp file in directory, in sorted path order.
+
+        With ``jobs > 1`` files are checked in a process pool. Results are
+        still yielded in path order, each one as soon as it and every file
+        before it are done, so callers can stream them.
+        """
+        return self.iter_files(sorted(directory.rglob("*.pp")), jobs)
+
+    def iter_files(self, files: List[Path], jobs: int = 1) -> Iterator[Tuple[Path, List[PracticeIssue]]]:
+        """Yield ``(file, issues)`` for each file, in the given order (see iter_directory)."""
+        if jobs > 1 and len(files) > 1:
+            # Small chunks keep the first results coming quickly
+            chunksize = max(1, min(64, len(files) // (jobs * 4)))
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                yield from zip(files, pool.map(self.check_file, files, chunksize=chunksize))
+        else:
+            for pp_file in files:
+                yield pp_file, self.check_file(pp_file)
+
+    def check_directory(self, directory: Path, jobs: int = 1) -> List[PracticeIssue]:
         """Check all .pp files in directory."""
         all_issues = []
-        for pp_file in directory.rglob("*.pp"):
-            all_issues.extend(self.check_file(pp_file))
+        for _, issues in self.iter_directory(directory, jobs):
+            all_issues.extend(issues)
         return all_issues
 
+    def check_environments(self, root: Path, jobs: int = 1) -> Dict[str, List[PracticeIssue]]:
+        """Check every environment directory under root (e.g. an r10k environments dir).
+
+        Environments usually share most of their module files, so each
+        file is hashed and each distinct content is checked only once,
+        through ``iter_files``; the resulting issues are copied to every
+        file with that content.
+        """
+        environments = {
+            env.name: sorted(env.rglob("*.pp"))
+            for env in sorted(root.iterdir())
+            if env.is_dir() and not env.name.startswith(".")
+        }
+
+        # content digest -> first file with that content, which is checked
+        first: Dict[str, Path] = {}
+        digests: Dict[Path, str] = {}
+        for files in environments.values():
+            for pp_file in files:
+                try:
+                    digest = hashlib.sha256(pp_file.read_bytes()).hexdigest()
+                except OSError:
+                    continue
+                digests[pp_file] = digest
+                first.setdefault(digest, pp_file)
+        checked = dict(self.iter_files(list(first.values()), jobs))
+
+        results = {}
+        for env, files in environments.items():
+            env_issues = []
+            for pp_file in files:
+                if pp_file not in digests:
+                    continue
+                checked_path = first[digests[pp_file]]
+                if checked_path == pp_file:
+                    env_issues.extend(checked[checked_path])
+                else:
+                    env_issues.extend(replace(issue, file=str(pp_file)) for issue in checked[checked_path])
+            results[env] = env_issues
+
+        return results
+
+
+def suggest_class_name(name: str) -> str:
+    """Suggest corrected class name."""
+    parts = name.split('::')
+    corrected = []
+    for part in parts:
+        # Convert CamelCase to snake_case
+        s1 = re.sub('(.)([A-Z][a-z]+)', r'\1_\2', part)
+        corrected.append(re.sub('([a-z0-9])([A-Z])', r'\1_\2', s1).lower())
+    return '::'.join(corrected)
+
+
+@rule("class-naming", "naming", "warning", "file")
+def check_class_naming(scan: ManifestScan):
+    """Class names should use lowercase with underscores."""
+    for match in BestPracticeChecker.CLASS_DEF.finditer(scan.content):
+        class_name = match.group(1)
+        if '::' in class_name:
+            for part in class_name.split('::'):
+                if not BestPracticeChecker.LOWERCASE_NAME.match(part):
+                    yield (scan.index.line(match.start()),
+                           f"Class name '{class_name}' should use lowercase with underscores",
+                           f"Rename to: {suggest_class_name(class_name)}")
+                    break
+
+
+@rule("resource-naming", "naming", "warning", "resource")
+def check_resource_naming(scan: ManifestScan, line_no: int, resource_type: str):
+    """Resource types should use lowercase."""
+    if BestPracticeChecker.LOWERCASE_NAME.match(resource_type):
+        return ()
+    return [(line_no, f"Resource type '{resource_type}' should use lowercase",
+             f"Use: {resource_type.lower()}")]
+
+
+@rule("string-quotes", "style", "info", "line")
+def check_string_quotes(scan: ManifestScan, line_no: int, line: str):
+    """Prefer single quotes for static strings."""
+    # This is a simplified check: any variable or escape on the line skips it
+    if '"' not in line or '$' in line or '\\' in line:
+        return ()
+    return [(line_no, "Prefer single quotes for static strings",
+             "Replace with single quotes unless string contains variables or escapes")
+            ] * len(BestPracticeChecker.DOUBLE_QUOTED.findall(line))
+
+
+@rule("parameter-types", "parameters", "info", "file")
+def check_parameter_types(scan: ManifestScan):
+    """Parameters should have a type specification."""
+    # This is simplified - proper parsing would need full grammar
+    for match in BestPracticeChecker.PARAMETER_ASSIGN.finditer(scan.content):
+        yield (scan.index.line(match.start()),
+               f"Parameter '{match.group(1)}' should have a type specification",
+               "Add type: e.g., 'String $param_name ='")
+
+
+@rule("hiera-function", "hiera", "warning", "file")
+def check_hiera_function(scan: ManifestScan):
+    """Use automatic parameter lookup instead of the hiera() function."""
+    for match in BestPracticeChecker.HIERA_LOOKUP.finditer(scan.content):
+        key = match.group(1)
+        yield (scan.index.line(match.start()),
+               "Use automatic parameter lookup instead of hiera() function",
+               f"Replace with automatic lookup: use 'class {{ 'myclass::${key}': }}' in Hiera data")
+
+
+@rule("resource-ordering", "ordering", "info", "file")
+def check_resource_ordering(scan: ManifestScan):
+    """Many resources of one type should have explicit ordering."""
+    resource_types = defaultdict(list)
+    for line_no, resource_type in scan.resources:
+        resource_types[resource_type].append(line_no)
+
+    # Check for multiple packages/files that might need ordering
+    if len(resource_types.get('package', [])) > 3:
+        yield (resource_types['package'][0],
+               "Multiple package resources - consider explicit ordering",
+               "Use chaining or require/contain relationships")
+
 
-def format_results(issues: List[PracticeIssue], target: Path) -> str:
-    """Format best practice check results."""
+@rule("style-guide", "style", "warning", "file")
+def check_style_guide(scan: ManifestScan):
+    """Forbidden and required patterns from the --style-guide file."""
+    return scan.style_guide.check(scan) if scan.style_guide else ()
+
+
+def format_results(issues: Iterable[PracticeIssue], target: Path) -> str:
+    """Format best practice check results.
+
+    ``issues`` may be an ``IssueStore``, whose counts are used to report
+    how many info issues were left out.
+    """
+    if not isinstance(issues, IssueStore):
+        issues = IssueStore(issues)
     if not issues:
         return f"✅ No best practice violations found in {target}"
 
@@ -273,10 +833,100 @@ def format_results(issues: List[PracticeIssue], target: Path) -> str:
             output.append(f"\n### {category.capitalize()} - INFO")
             for issue in info[:5]:  # Limit info messages
                 output.append(f"- **{issue.message}** at `{issue.file}:{issue.line}`")
+            hidden = issues.group_counts[(category, "info")] - len(info[:5])
+            if hidden:
+                output.append(f"- ... and {hidden} more")
 
     return "\n".join(output)
 
 
+def format_file_issues(pp_file: Path, issues: List[PracticeIssue]) -> str:
+    """Format one file's issues for streaming output."""
+    output = [f"### {pp_file}"]
+    for issue in issues:
+        output.append(f"- [{issue.severity}] {issue.category}: **{issue.message}** at `{issue.file}:{issue.line}`")
+        if issue.suggestion:
+            output.append(f"  💡 {issue.suggestion}")
+    return "\n".join(output)
+
+
+def write_streaming(results: Iterable[Tuple[Path, List[PracticeIssue]]], handle: TextIO) -> int:
+    """Write issues file by file as results arrive and return the issue count."""
+    files = total = 0
+    for pp_file, issues in results:
+        files += 1
+        if issues:
+            total += len(issues)
+            handle.write(format_file_issues(pp_file, issues) + "\n\n")
+            handle.flush()
+    handle.write(f"Checked {files} file(s): {total} issue(s)\n")
+    return total
+
+
+SARIF_LEVELS = {"critical": "error", "warning": "warning", "info": "note"}
+
+
+def write_json_array(issues: Iterable[PracticeIssue], handle: TextIO) -> int:
+    """Write issues as an indented JSON array, one issue at a time.
+
+    The output matches ``json.dumps(list, indent=2)`` without building the
+    list. Returns the issue count.
+    """
+    count = 0
+    for issue in issues:
+        item = json.dumps(issue.to_dict(), indent=2).replace("\n", "\n  ")
+        handle.write(("[\n  " if not count else ",\n  ") + item)
+        count += 1
+    handle.write("\n]\n" if count else "[]\n")
+    return count
+
+
+def write_ndjson(issues: Iterable[PracticeIssue], handle: TextIO) -> int:
+    """Write one JSON object per line as issues arrive and return the issue count."""
+    count = 0
+    for issue in issues:
+        handle.write(json.dumps(issue.to_dict()) + "\n")
+        count += 1
+    return count
+
+
+def write_sarif(issues: Iterable[PracticeIssue], handle: TextIO, rules: Iterable[Rule]) -> int:
+    """Write a SARIF 2.1.0 log, streaming one result per line, and return the issue count.
+
+    Results are written before the tool description so nothing has to be
+    held back; SARIF consumers do not depend on key order.
+    """
+    handle.write('{"$schema": "https://json.schemastore.org/sarif-2.1.0.json", '
+                 '"version": "2.1.0", "runs": [{"results": [')
+    count = 0
+    for issue in issues:
+        result = {
+            "ruleId": issue.rule or issue.category,
+            "level": SARIF_LEVELS.get(issue.severity, "note"),
+            "message": {"text": issue.message},
+            "locations": [{"physicalLocation": {
+                "artifactLocation": {"uri": sarif_uri(issue.file)},
+                "region": {"startLine": issue.line},
+            }}],
+        }
+        if issue.suggestion:
+            result["properties"] = {"suggestion": issue.suggestion}
+        handle.write(("\n" if not count else ",\n") + json.dumps(result))
+        count += 1
+
+    driver = {
+        "name": "check_best_practices",
+        "rules": [
+            {"id": r.name, "shortDescription": {"text": r.description},
+             "defaultConfiguration": {"level": SARIF_LEVELS.get(r.severity, "note")},
+             "properties": {"category": r.category}}
+            for r in rules
+        ],
+    }
+    handle.write(f'\n], "tool": {{"driver": {json.dumps(driver)}}}}}]}}\n')
+    return count
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Check Puppet manifests against best practices"
@@ -284,50 +934,272 @@ def main():
     parser.add_argument(
         "target",
         type=Path,
+        nargs="?",
         help="Path to Puppet manifest or directory"
     )
+    parser.add_argument(
+        "--environments",
+        action="store_true",
+        help="Treat target as an environments directory (e.g. r10k) and report each environment"
+    )
     parser.add_argument(
         "--style-guide",
         type=Path,
         help="Path to custom style guide markdown file"
     )
+    parser.add_argument(
+        "--format",
+        choices=["text", "json", "ndjson", "sarif"],
+        default="text",
+        help="Output format (default: text report); ndjson and sarif are streamed per issue"
+    )
     parser.add_argument(
         "--json",
         action="store_true",
-        help="Output results as JSON"
+        help="Output results as JSON (same as --format json)"
     )
     parser.add_argument(
         "--output",
         type=Path,
         help="Write output to file"
     )
+    parser.add_argument(
+        "--changed-since",
+        metavar="REF",
+        help="Only check .pp files changed since the merge base with git REF"
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes for checking files (0 = one per CPU)"
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Print each file's issues as soon as it is checked instead of a grouped report"
+    )
+    parser.add_argument(
+        "--enable",
+        metavar="RULE",
+        action="append",
+        default=[],
+        help="Enable a rule that is off by default (repeatable)"
+    )
+    parser.add_argument(
+        "--disable",
+        metavar="RULE",
+        action="append",
+        default=[],
+        help="Disable a rule (repeatable)"
+    )
+    parser.add_argument(
+        "--severity",
+        metavar="RULE=LEVEL",
+        action="append",
+        default=[],
+        help=f"Override a rule's severity ({', '.join(SEVERITIES)}; repeatable)"
+    )
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        metavar="FILE",
+        help="Only report findings not recorded in baseline FILE"
+    )
+    parser.add_argument(
+        "--write-baseline",
+        action="store_true",
+        help="Record every current finding in the --baseline FILE and exit"
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Report time and match counts per rule, per regex and for the slowest files on stderr"
+    )
+    parser.add_argument(
+        "--profile-json",
+        type=Path,
+        metavar="FILE",
+        help="Write the --profile report as JSON to FILE (implies --profile)"
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=10,
+        metavar="N",
+        help="Number of slowest files in the profile (default: 10)"
+    )
+    parser.add_argument(
+        "--list-rules",
+        action="store_true",
+        help="List available rules and exit"
+    )
 
     args = parser.parse_args()
+    if args.json:
+        args.format = "json"
+
+    if args.list_rules:
+        for r in RULES.values():
+            state = "" if r.enabled else " (disabled by default)"
+            print(f"{r.name:<20} {r.severity:<8} {r.category:<11} {r.description}{state}")
+        return 0
+
+    if args.target is None:
+        parser.error("the following arguments are required: target")
 
     if not args.target.exists():
         print(f"Error: Target path does not exist: {args.target}")
         return 1
 
-    checker = BestPracticeChecker(args.style_guide)
+    severities = {}
+    for item in args.severity:
+        name, sep, level = item.partition("=")
+        if not sep:
+            print(f"Error: --severity expects RULE=LEVEL, got: {item}")
+            return 1
+        severities[name] = level
+
+    baseline = None
+    if args.write_baseline and not args.baseline:
+        print("Error: --write-baseline requires --baseline FILE")
+        return 1
+    if args.baseline:
+        root = args.target if args.target.is_dir() else args.target.parent
+        if args.write_baseline:
+            baseline = Baseline(root)
+        else:
+            try:
+                baseline = Baseline.load(args.baseline, root)
+            except ValueError as e:
+                print(f"Error: {e}")
+                return 1
+
+    profiler = Profiler(args.profile_top) if args.profile or args.profile_json else None
+    try:
+        checker = BestPracticeChecker(args.style_guide, args.enable, args.disable, severities, profiler)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
 
-    if args.target.is_file() and args.target.suffix == ".pp":
-        issues = checker.check_file(args.target)
+    if profiler:
+        if args.jobs != 1:
+            # Timings recorded in worker processes would be lost
+            print("Note: --profile checks files in this process; ignoring --jobs", file=sys.stderr)
+            args.jobs = 1
+        with profiler.instrument(BestPracticeChecker, checker.style_guide):
+            status = report(args, checker, baseline)
     else:
-        issues = checker.check_directory(args.target)
+        status = report(args, checker, baseline)
+    if baseline and not args.write_baseline:
+        print(f"Baseline: {baseline.suppressed} known finding(s) suppressed", file=sys.stderr)
 
-    if args.json:
-        print(json.dumps([i.to_dict() for i in issues], indent=2))
+    if profiler:
+        print(profiler.format_table(), file=sys.stderr)
+        if args.profile_json:
+            args.profile_json.write_text(json.dumps(profiler.to_dict(), indent=2) + "\n")
+            print(f"Profile written to: {args.profile_json}", file=sys.stderr)
+
+    return status
+
+
+def record_baseline(args: argparse.Namespace, baseline: Baseline,
+                    results: Iterable[Tuple[object, List[PracticeIssue]]]) -> int:
+    """Record every finding in results as known and save the baseline."""
+    count = 0
+    for _, issues in results:
+        for issue in issues:
+            baseline.add(issue.rule or issue.category, issue.file, issue.line)
+            count += 1
+    baseline.save(args.baseline)
+    print(f"Baseline of {count} finding(s) written to: {args.baseline}")
+    return 0
+
+
+def filter_baseline(baseline: Baseline, results: Iterable[Tuple[object, List[PracticeIssue]]]
+                    ) -> Iterator[Tuple[object, List[PracticeIssue]]]:
+    """Drop known findings from ``(file or environment, issues)`` results as they stream past."""
+    for key, issues in results:
+        yield key, [issue for issue in issues
+                    if not baseline.is_known(issue.rule or issue.category, issue.file, issue.line)]
+
+
+def report(args: argparse.Namespace, checker: BestPracticeChecker,
+           baseline: Optional[Baseline] = None) -> int:
+    """Check args.target and write the report in the requested format; returns the exit status."""
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    if args.environments:
+        environments = checker.check_environments(args.target, jobs)
+        if baseline is not None:
+            if args.write_baseline:
+                return record_baseline(args, baseline, environments.items())
+            environments = dict(filter_baseline(baseline, environments.items()))
+        if args.format == "json":
+            print(json.dumps({env: [i.to_dict() for i in issues] for env, issues in environments.items()},
+                             indent=2))
+            return 1 if any(environments.values()) else 0
+        if args.format == "text":
+            output = "\n\n".join(f"# Environment: {env}\n\n{format_results(issues, args.target / env)}"
+                                 for env, issues in environments.items())
+            if args.output:
+                args.output.write_text(output)
+                print(f"Check results written to: {args.output}")
+            else:
+                print(output)
+            return 1 if any(environments.values()) else 0
+        # Paths already name the environment, so the streamed formats are flat
+        results = ((env, issues) for env, issues in environments.items())
     else:
-        output = format_results(issues, args.target)
+        if args.changed_since:
+            try:
+                changed, _ = git_changed_files(args.target, args.changed_since)
+                # Report the same paths as a full run, so baselines and SARIF URIs match
+                results = checker.iter_files(relative_to_target(args.target, changed), jobs)
+            except RuntimeError as e:
+                print(f"Error: {e}")
+                return 1
+        elif args.target.is_file() and args.target.suffix == ".pp":
+            results = iter([(args.target, checker.check_file(args.target))])
+        else:
+            results = checker.iter_directory(args.target, jobs)
+
+    if baseline is not None:
+        if args.write_baseline:
+            return record_baseline(args, baseline, results)
+        results = filter_baseline(baseline, results)
+
+    if args.format != "text" or args.stream:
+        issues = (issue for _, file_issues in results for issue in file_issues)
+        if args.format == "sarif":
+            enabled = [r for r in checker.rules.values() if r.enabled]
+            write = lambda handle: write_sarif(issues, handle, enabled)
+        elif args.format in ("json", "ndjson"):
+            writer = write_json_array if args.format == "json" else write_ndjson
+            write = lambda handle: writer(issues, handle)
+        else:
+            write = lambda handle: write_streaming(results, handle)
+
         if args.output:
-            args.output.write_text(output)
+            with args.output.open("w") as handle:
+                total = write(handle)
             print(f"Check results written to: {args.output}")
         else:
-            print(output)
+            total = write(sys.stdout)
+        return 1 if total else 0
 
-    return 1 if issues else 0
+    # The report lists only the first few info issues per category, so the
+    # rest are counted rather than kept
+    issues = IssueStore(info_limit=5)
+    for _, file_issues in results:
+        issues.extend(file_issues)
+    output = format_results(issues, args.target)
+    if args.output:
+        args.output.write_text(output)
+        print(f"Check results written to: {args.output}")
+    else:
+        print(output)
 
+    return 1 if issues else 0
 
 if __name__ == "__main__":
-    from collections import defaultdict
     exit(main())
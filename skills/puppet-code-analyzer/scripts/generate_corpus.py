@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Puppet Corpus Generator - Deterministic synthetic control repos
+
+This script writes a control repo shaped like a real one, for benchmarking
+the analyzer scripts: modules of classes with parameters, includes, chain
+arrows, include cycles, hiera() calls and double-quoted strings, plus a
+Puppet agent log with errors the tracer recognises. The same size and seed
+always produce byte-identical files.
+
+Usage:
+    python3 generate_corpus.py <output-dir>
+    python3 generate_corpus.py --modules 200 --classes 20 --log-lines 50000 <output-dir>
+"""
+
+import argparse
+import random
+import sys
+from pathlib import Path
+from typing import Dict
+
+
+# Log messages for each CommonIssuesDatabase category, plus noise
+LOG_ERRORS = [
+    "Error: Could not retrieve catalog from remote server: Error 500 on SERVER: "
+    "Duplicate declaration: Package[{pkg}] is already declared at {file}:{line}",
+    "Error: Evaluation Error: Unknown variable: '$::{module}_port' at {file}:{line}",
+    "Error: Found 1 dependency cycle: (Class[{cls}] => Class[{other}] => Class[{cls}])",
+    "Error: Could not find file {module}/templates/{module}.conf.erb at {file}:{line}",
+    "Error: Could not parse for environment production: Syntax error at '}}' at {file}:{line}",
+    "Error: Function lookup() did not find a value for the name '{module}::key' (key not found)",
+    "Error: Could not compile catalog for node{n}.example.com",
+    "Error: Could not find package {pkg}-extras",
+    "Error: Could not set 'file' on ensure: Permission denied at {file}:{line}",
+    "Warning: Unknown variable: '{module}_unused' at {file}:{line}",
+    "Error: Request failed with an unrecognised message {n}",
+]
+LOG_NOISE = [
+    "Info: Using environment 'production'",
+    "Info: Retrieving pluginfacts",
+    "Info: Applying configuration version '{n}'",
+    "Notice: /Stage[main]/{title}/Package[{pkg}]/ensure: created",
+    "Notice: Applied catalog in {n}.42 seconds",
+]
+
+
+def class_name(module: int, index: int) -> str:
+    """Name of class index in module (index 0 is the module's main class)."""
+    return f"mod{module}" if index == 0 else f"mod{module}::class{index}"
+
+
+def class_path(root: Path, module: int, index: int) -> Path:
+    """Manifest path of a class, following the module autoloader layout."""
+    manifests = root / "site-modules" / f"mod{module}" / "manifests"
+    return manifests / ("init.pp" if index == 0 else f"class{index}.pp")
+
+
+def render_class(rng: random.Random, module: int, index: int, modules: int, classes: int) -> str:
+    """Render one class manifest."""
+    name = class_name(module, index)
+    pkg = f"pkg-{module}-{index}"
+    conf = f"/etc/mod{module}/class{index}.conf"
+
+    lines = [
+        f"# @summary Generated class {name}",
+        f"class {name} (",
+        f"  String $package_name = '{pkg}',",
+        f"  $untyped_setting = \"static value {index}\",",
+        f"  Integer $port = {8000 + index},",
+        ") {",
+    ]
+
+    # The main class includes its module's classes; the rest include the next
+    # class in the module and a random class elsewhere.
+    if index == 0:
+        lines.extend(f"  include {class_name(module, i)}" for i in range(1, classes))
+    else:
+        if index + 1 < classes:
+            lines.append(f"  include {class_name(module, index + 1)}")
+        other = rng.randrange(modules)
+        lines.append(f"  include {class_name(other, rng.randrange(1, classes) if classes > 1 else 0)}")
+        # Every seventh class closes a short include cycle within its module
+        if index % 7 == 0 and index > 1:
+            lines.append(f"  include {class_name(module, index - rng.randrange(1, min(index, 4)))}")
+
+    if rng.random() < 0.3:
+        lines.append(f"  $legacy = hiera('mod{module}::class{index}::legacy', 'default')")
+
+    lines.extend([
+        "",
+        "  package { $package_name:",
+        "    ensure => installed,",
+        "  }",
+        "",
+        f"  file {{ '{conf}':",
+        "    ensure  => file,",
+        "    content => \"port ${port}\\n\",",
+        "    mode    => \"0644\",",
+        "  }",
+        "",
+        f"  service {{ \"svc-{module}-{index}\":",
+        "    ensure => running,",
+        "  }",
+        "",
+        f"  Package[$package_name] -> File['{conf}'] ~> Service['svc-{module}-{index}']",
+    ])
+    if index + 1 < classes and rng.random() < 0.5:
+        lines.append(f"  Class['{name}'] -> Class['{class_name(module, index + 1)}']")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+# Where the log says manifests live, so logs do not depend on the output dir
+LOG_CODEDIR = Path("/etc/puppetlabs/code/environments/production")
+
+
+def render_log(rng: random.Random, modules: int, classes: int, log_lines: int) -> str:
+    """Render a Puppet agent log; about one line in five is an error or warning."""
+    lines = []
+    for n in range(log_lines):
+        module = rng.randrange(modules)
+        index = rng.randrange(classes)
+        fields = {
+            "n": n,
+            "module": f"mod{module}",
+            "pkg": f"pkg-{module}-{index}",
+            "cls": class_name(module, index),
+            "other": class_name(module, (index + 1) % classes),
+            "title": class_name(module, index).title(),
+            "file": class_path(LOG_CODEDIR, module, index),
+            "line": rng.randrange(1, 40),
+        }
+        template = rng.choice(LOG_ERRORS) if rng.random() < 0.2 else rng.choice(LOG_NOISE)
+        lines.append(template.format(**fields))
+    return "\n".join(lines) + "\n"
+
+
+def generate_corpus(root: Path, modules: int = 50, classes: int = 10,
+                    log_lines: int = 1000, seed: int = 0) -> Dict[str, int]:
+    """Write a synthetic control repo under root and return what was written.
+
+    Output depends only on the arguments. Returns counts of ``manifests``
+    (one class each), ``bytes`` of manifest content and ``log_lines``.
+    """
+    rng = random.Random(seed)
+    total = 0
+    for module in range(modules):
+        for index in range(classes):
+            path = class_path(root, module, index)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            content = render_class(rng, module, index, modules, classes)
+            path.write_text(content)
+            total += len(content)
+
+    log = root / "logs" / "puppet.log"
+    log.parent.mkdir(parents=True, exist_ok=True)
+    log.write_text(render_log(rng, modules, classes, log_lines))
+
+    return {
+        "manifests": modules * classes,
+        "bytes": total,
+        "log_lines": log_lines,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate a deterministic synthetic Puppet control repo"
+    )
+    parser.add_argument(
+        "output",
+        type=Path,
+        help="Directory to write the control repo into"
+    )
+    parser.add_argument(
+        "--modules",
+        type=int,
+        default=50,
+        help="Number of modules (default: 50)"
+    )
+    parser.add_argument(
+        "--classes",
+        type=int,
+        default=10,
+        help="Classes per module, including the main class (default: 10)"
+    )
+    parser.add_argument(
+        "--log-lines",
+        type=int,
+        default=1000,
+        help="Lines in logs/puppet.log (default: 1000)"
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Random seed (default: 0)"
+    )
+
+    args = parser.parse_args()
+
+    if args.modules < 1 or args.classes < 1:
+        print("Error: --modules and --classes must be at least 1")
+        return 1
+
+    stats = generate_corpus(args.output, args.modules, args.classes, args.log_lines, args.seed)
+    print(f"Wrote {stats['manifests']} manifests ({stats['bytes']} bytes) "
+          f"and {stats['log_lines']} log lines to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
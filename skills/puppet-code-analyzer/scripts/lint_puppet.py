@@ -8,14 +8,44 @@ It respects .puppet-lint.rc configuration files if present.
 Usage:
     python3 lint_puppet.py <path-to-manifest-or-directory>
     python3 lint_puppet.py --fix <path-to-manifest-or-directory>
+    python3 lint_puppet.py --format sarif <path-to-manifest-or-directory> > lint.sarif
+    python3 lint_puppet.py --changed-since origin/main <path-to-manifest-or-directory>
+    python3 lint_puppet.py --jobs 8 <directory>
+    python3 lint_puppet.py --no-cache <path-to-manifest-or-directory>
+    python3 lint_puppet.py --timeout 300 --total-timeout 1800 <path-to-manifest-or-directory>
+    python3 lint_puppet.py <manifest> <manifest> <directory> ...
+    git diff --name-only | python3 lint_puppet.py --files-from -
+    python3 lint_puppet.py --baseline known.json --write-baseline <path-to-manifest-or-directory>
+    python3 lint_puppet.py --baseline known.json <path-to-manifest-or-directory>
+    python3 lint_puppet.py --serve /tmp/lint.sock --workers 4
+    python3 lint_puppet.py --connect /tmp/lint.sock <path-to-manifest-or-directory> ...
+    python3 lint_puppet.py --serve -
 """
 
 import argparse
+import hashlib
+import heapq
 import json
+import os
+import queue
+import selectors
+import shlex
+import shutil
+import socket
+import socketserver
+import sqlite3
 import subprocess
 import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from analyzer_common import (
+    Baseline, SqliteCache, default_cache_dir, git_changed_files, relative_to_target, sarif_uri
+)
 
 
 class LintResult:
@@ -54,9 +84,95 @@ def find_puppet_lint_rc(start_path: Path) -> Optional[Path]:
     return None
 
 
-def run_puppet_lint(target: Path, fix: bool = False,
-                    config: Optional[Path] = None) -> List[LintResult]:
-    """Run puppet-lint and parse results."""
+class ConfigResolver:
+    """Memoized ``find_puppet_lint_rc`` for linting many paths at once.
+
+    Every directory visited while walking up from a path is mapped to the
+    config found for it, so paths sharing ancestors cost at most one
+    ``exists()`` call per directory in total.
+    """
+
+    def __init__(self):
+        self.by_dir: Dict[Path, Optional[Path]] = {}
+
+    def find(self, start_path: Path) -> Optional[Path]:
+        current = start_path if start_path.is_dir() else start_path.parent
+        visited = []
+        found = None
+        while current != current.parent:
+            if current in self.by_dir:
+                found = self.by_dir[current]
+                break
+            visited.append(current)
+            config = current / ".puppet-lint.rc"
+            if config.exists():
+                found = config
+                break
+            current = current.parent
+
+        for directory in visited:
+            self.by_dir[directory] = found
+        return found
+
+
+def expand_targets(paths: List[Path]) -> Tuple[Path, List[Path]]:
+    """Expand paths into manifests, without duplicates, in first-seen order.
+
+    Directories are replaced by the .pp files under them, named below the
+    directory as given, the way puppet-lint names them; a file reached
+    twice keeps its first name. Returns the deepest directory containing
+    every manifest (resolved), and the manifests.
+    """
+    files: Dict[Path, Path] = {}
+    for path in paths:
+        for pp_file in sorted(path.rglob("*.pp")) if path.is_dir() else [path]:
+            files.setdefault(pp_file.resolve(), pp_file)
+    if not files:
+        return Path.cwd(), []
+
+    root = Path(os.path.commonpath([str(f) for f in files]))
+    if root in files:
+        root = root.parent
+    return root, list(files.values())
+
+
+def group_by_config(paths: List[Path], config: Optional[Path] = None
+                    ) -> Tuple[Path, Dict[Optional[Path], List[Path]]]:
+    """Expand paths into manifests and group them by the config that applies to each.
+
+    Returns the root from ``expand_targets``, and the manifests grouped
+    by resolved .puppet-lint.rc (all under ``config`` if one is given),
+    in first-seen order.
+    """
+    root, files = expand_targets(paths)
+    resolver = ConfigResolver()
+    groups: Dict[Optional[Path], List[Path]] = {}
+    for pp_file in files:
+        groups.setdefault(config or resolver.find(pp_file.resolve()), []).append(pp_file)
+    return root, groups
+
+
+def parse_lint_output(lines: Iterable[str], fix: bool = False) -> Iterator[LintResult]:
+    """Parse puppet-lint output lines in our --format, yielding one result per issue."""
+    for line in lines:
+        if line.strip():
+            parts = line.split(":", 5)
+            if len(parts) == 6:
+                file_path, line_no, column, severity, rule, msg = parts
+                yield LintResult(
+                    file=file_path,
+                    line=int(line_no),
+                    column=int(column),
+                    severity=severity.lower(),
+                    rule_code=rule,
+                    message=msg.strip(),
+                    fixable=fix
+                )
+
+
+def puppet_lint_command(paths: List[Path], fix: bool = False,
+                        config: Optional[Path] = None) -> List[str]:
+    """Build the puppet-lint command line for paths."""
     cmd = ["puppet-lint"]
 
     if fix:
@@ -71,34 +187,98 @@ def run_puppet_lint(target: Path, fix: bool = False,
         "--format", "%{path}:%{line}:%{column}:%{kind}:%{check}:%{message}"
     ])
 
-    cmd.append(str(target))
+    cmd.extend(str(path) for path in paths)
+    return cmd
+
+
+class LintTimeout(Exception):
+    """puppet-lint was stopped by a timeout.
 
+    ``results`` holds what was reported before it was stopped and has not
+    already been yielded to the caller.
+    """
+
+    def __init__(self, message: str, results: Optional[List[LintResult]] = None):
+        super().__init__(message)
+        self.results = results or []
+
+
+def stop_process(process: subprocess.Popen, grace: float = 5.0):
+    """Terminate a process, killing it if it does not exit within grace seconds."""
+    process.terminate()
     try:
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=False
-        )
+        process.wait(grace)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def stream_puppet_lint(cmd: List[str], fix: bool = False, cwd: Optional[Path] = None,
+                       timeout: Optional[float] = None,
+                       deadline: Optional[float] = None,
+                       started: Optional[Callable[[subprocess.Popen], None]] = None) -> Iterator[LintResult]:
+    """Run a puppet-lint command, yielding results as its output lines arrive.
 
-        issues = []
-        for line in result.stdout.splitlines():
-            if line.strip():
-                parts = line.split(":", 5)
-                if len(parts) == 6:
-                    file_path, line_no, column, severity, rule, msg = parts
-                    issues.append(LintResult(
-                        file=file_path,
-                        line=int(line_no),
-                        column=int(column),
-                        severity=severity.lower(),
-                        rule_code=rule,
-                        message=msg.strip(),
-                        fixable=fix
-                    ))
-
-        return issues
+    The process is stopped once it has run for ``timeout`` seconds or the
+    ``time.monotonic()`` clock passes ``deadline``; LintTimeout is raised
+    after everything read until then has been yielded. The process is
+    also stopped if the caller abandons the generator. ``started`` is
+    called with the process as soon as it runs, so another thread can
+    kill it.
+    """
+    start = time.monotonic()
+    limit = deadline
+    if timeout is not None:
+        limit = start + timeout if limit is None else min(limit, start + timeout)
 
+    process = subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    if started:
+        started(process)
+    selector = selectors.DefaultSelector()
+    selector.register(process.stdout, selectors.EVENT_READ)
+    pending = b""
+    try:
+        while True:
+            wait = None if limit is None else limit - time.monotonic()
+            if wait is not None and wait <= 0:
+                raise LintTimeout(f"puppet-lint stopped after {time.monotonic() - start:.1f}s")
+            if not selector.select(wait):
+                continue
+            chunk = os.read(process.stdout.fileno(), 65536)
+            if not chunk:
+                break
+            *lines, pending = (pending + chunk).split(b"\n")
+            yield from parse_lint_output((line.decode(errors="replace") for line in lines), fix)
+        yield from parse_lint_output([pending.decode(errors="replace")], fix)
+
+        try:
+            process.wait(None if limit is None else max(0.0, limit - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            raise LintTimeout(f"puppet-lint stopped after {time.monotonic() - start:.1f}s")
+    finally:
+        selector.close()
+        if process.poll() is None:
+            stop_process(process)
+        process.stdout.close()
+
+
+def run_puppet_lint(target: Path, fix: bool = False, config: Optional[Path] = None,
+                    timeout: Optional[float] = None, deadline: Optional[float] = None) -> List[LintResult]:
+    """Run puppet-lint and parse results.
+
+    Raises LintTimeout, carrying the results parsed so far, if a timeout
+    (see ``stream_puppet_lint``) stops puppet-lint.
+    """
+    cmd = puppet_lint_command([target], fix, config)
+
+    results = []
+    try:
+        for r in stream_puppet_lint(cmd, fix, timeout=timeout, deadline=deadline):
+            results.append(r)
+        return results
+
+    except LintTimeout as e:
+        raise LintTimeout(str(e), results)
     except FileNotFoundError:
         print("Error: puppet-lint not found. Install with: gem install puppet-lint")
         return []
@@ -107,6 +287,604 @@ def run_puppet_lint(target: Path, fix: bool = False,
         return []
 
 
+def shard_files(files: List[Path], shards: int) -> List[List[Path]]:
+    """Split files into at most shards groups of roughly equal total size.
+
+    Lint time grows with file size, so files are dealt largest first to
+    the currently smallest group. Each group keeps the files' original
+    order.
+    """
+    sizes = {}
+    for pp_file in files:
+        try:
+            sizes[pp_file] = pp_file.stat().st_size
+        except OSError:
+            sizes[pp_file] = 0
+
+    groups: List[List[Path]] = [[] for _ in range(min(shards, len(files)))]
+    heap = [(0, i) for i in range(len(groups))]
+    for pp_file in sorted(files, key=lambda f: -sizes[f]):
+        load, i = heapq.heappop(heap)
+        groups[i].append(pp_file)
+        heapq.heappush(heap, (load + sizes[pp_file], i))
+
+    order = {pp_file: i for i, pp_file in enumerate(files)}
+    return [sorted(group, key=order.__getitem__) for group in groups]
+
+
+# Limits for the paths on one puppet-lint command line; ARG_MAX is as low
+# as 256 KiB on some systems and also has to hold the environment
+MAX_COMMAND_PATHS = 2000
+MAX_COMMAND_BYTES = 96 * 1024
+
+
+def command_batches(paths: List[Path], max_paths: int = MAX_COMMAND_PATHS,
+                    max_bytes: int = MAX_COMMAND_BYTES) -> List[List[Path]]:
+    """Split paths, in order, into runs short enough for one command line each."""
+    batches: List[List[Path]] = []
+    size = 0
+    for path in paths:
+        length = len(os.fsencode(str(path))) + 1
+        if not batches or len(batches[-1]) >= max_paths or size + length > max_bytes:
+            batches.append([])
+            size = 0
+        batches[-1].append(path)
+        size += length
+    return batches
+
+
+def lint_shards(files: List[Path], jobs: int, fix: bool = False,
+                config: Optional[Path] = None, timeout: Optional[float] = None,
+                deadline: Optional[float] = None,
+                known: Optional[Dict[str, List[LintResult]]] = None) -> Iterator[LintResult]:
+    """Lint files with up to jobs concurrent puppet-lint processes, yielding results as they come.
+
+    Files are split by ``shard_files`` and passed to puppet-lint as given,
+    from the current directory, so each result names its file as the
+    caller did; a shard too long for one command line is linted by
+    several processes in turn (see ``command_batches``). Results are
+    yielded in the order of ``files``, keeping puppet-lint's order within
+    each file, so output does not depend on sharding or timing: a file's
+    results go out once it and every file before it are done, and a file
+    is done once its shard reports a later file or finishes. Files named
+    in ``known`` are not linted; their results are yielded in their place.
+
+    Errors starting puppet-lint are raised. ``timeout`` applies to each
+    process; if any is stopped, the other shards still finish (or reach
+    ``deadline``), everything reported is yielded and LintTimeout is raised.
+    If the caller stops early, running puppet-lint processes are killed
+    and the shard threads are left to wind down on their own.
+    """
+    known = known or {}
+    index = {}
+    for i, pp_file in enumerate(files):
+        index.setdefault(str(pp_file), i)
+    found: List[List[LintResult]] = [list(known.get(str(pp_file), ())) for pp_file in files]
+    done = [str(pp_file) in known for pp_file in files]
+    shards = shard_files([f for f in files if str(f) not in known], jobs)
+
+    # Shard threads post ("result", (file index, result)), ("done", file
+    # indexes) and, last, ("end", exception or None)
+    events: "queue.Queue[Tuple[str, object]]" = queue.Queue()
+    stop = threading.Event()
+    # Every puppet-lint process started, so an early close can kill them;
+    # the lock keeps one from starting unseen while they are killed
+    processes: List[subprocess.Popen] = []
+    processes_lock = threading.Lock()
+
+    def started(process: subprocess.Popen):
+        with processes_lock:
+            processes.append(process)
+            if stop.is_set():
+                process.kill()
+
+    def lint(shard: List[Path]):
+        positions = [index[str(pp_file)] for pp_file in shard]
+        position_of = {str(pp_file): k for k, pp_file in enumerate(shard)}
+        current = 0  # position in shard of the file being reported
+        try:
+            start = 0
+            for batch in command_batches(shard):
+                if stop.is_set():
+                    return
+                cmd = puppet_lint_command(batch, fix, config)
+                for r in stream_puppet_lint(cmd, fix, timeout=timeout, deadline=deadline, started=started):
+                    if stop.is_set():
+                        return
+                    # puppet-lint reports files in argument order, so a
+                    # later file means the ones before it are complete
+                    position = max(current, position_of.get(r.file, current))
+                    if position > current:
+                        events.put(("done", positions[current:position]))
+                        current = position
+                    events.put(("result", (positions[current], r)))
+                start += len(batch)
+                events.put(("done", positions[current:start]))
+                current = start
+        except Exception as e:
+            events.put(("end", e))
+        else:
+            events.put(("end", None))
+
+    pool = ThreadPoolExecutor(max_workers=max(1, len(shards)))
+    try:
+        for shard in shards:
+            pool.submit(lint, shard)
+        running = len(shards)
+        failures: List[Exception] = []
+        following = 0
+        while True:
+            while following < len(files) and done[following]:
+                yield from found[following]
+                found[following] = []
+                following += 1
+            if not running:
+                break
+            kind, value = events.get()
+            if kind == "result":
+                position, r = value
+                found[position].append(r)
+            elif kind == "done":
+                for position in value:
+                    done[position] = True
+            else:
+                running -= 1
+                if value is not None:
+                    failures.append(value)
+    finally:
+        with processes_lock:
+            stop.set()
+        for process in processes:
+            if process.poll() is None:
+                process.kill()
+        # Killed processes end their shards' output, so the threads finish
+        # shortly; a caller that stopped early need not wait for them
+        pool.shutdown(wait=False)
+
+    # Files a stopped shard never finished still get what it reported
+    for position in range(following, len(files)):
+        yield from found[position]
+    errors = [e for e in failures if not isinstance(e, LintTimeout)]
+    if errors:
+        raise errors[0]
+    if failures:
+        raise LintTimeout(f"{len(failures)} of {len(shards)} puppet-lint process(es) timed out")
+
+
+def run_puppet_lint_parallel(files: List[Path], jobs: int, fix: bool = False,
+                             config: Optional[Path] = None, timeout: Optional[float] = None,
+                             deadline: Optional[float] = None) -> Iterator[LintResult]:
+    """``lint_shards``, reporting errors other than LintTimeout instead of raising them."""
+    try:
+        yield from lint_shards(files, jobs, fix, config, timeout, deadline)
+    except LintTimeout:
+        raise
+    except FileNotFoundError:
+        print("Error: puppet-lint not found. Install with: gem install puppet-lint")
+    except Exception as e:
+        print(f"Error running puppet-lint: {e}")
+
+
+# puppet-lint executable -> its --version output, for puppet_lint_version
+_PUPPET_LINT_VERSIONS: Dict[str, str] = {}
+
+
+def puppet_lint_version(timeout: Optional[float] = None) -> Optional[str]:
+    """Output of ``puppet-lint --version``, or None if it cannot be run.
+
+    The answer is remembered per executable found on PATH, so Ruby is
+    started for it at most once per process, however many config groups
+    are linted.
+    """
+    executable = shutil.which("puppet-lint")
+    if executable is None:
+        return None
+    if executable not in _PUPPET_LINT_VERSIONS:
+        try:
+            result = subprocess.run([executable, "--version"], capture_output=True, text=True,
+                                    check=False, timeout=timeout)
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        _PUPPET_LINT_VERSIONS[executable] = result.stdout.strip()
+    return _PUPPET_LINT_VERSIONS[executable]
+
+
+def module_path(pp_file: Path) -> str:
+    """Path of a manifest from its module directory down, e.g. ``ntp/manifests/init.pp``.
+
+    Checks such as autoloader_layout depend on it. Files outside any
+    ``manifests`` directory are named by their resolved path.
+    """
+    resolved = pp_file.resolve()
+    parts = resolved.parts
+    for i in range(len(parts) - 2, 0, -1):
+        if parts[i] == "manifests":
+            return "/".join(parts[i - 1:])
+    return resolved.as_posix()
+
+
+class LintCache(SqliteCache):
+    """Persistent cache of per-file lint results.
+
+    Entries are keyed by the file's content hash, its ``module_path``,
+    the hash of the configuration file and the puppet-lint version, so
+    editing the config or upgrading puppet-lint misses every entry, and
+    the same content in another module or location is linted afresh. See
+    ``SqliteCache`` for storage, sharing and eviction.
+    """
+
+    FILENAME = "lint_puppet.sqlite3"
+    LABEL = "Lint cache"
+    # Part of every key; bump whenever the stored payload changes
+    CACHE_VERSION = "2"
+
+    def __init__(self, cache_dir: Path, max_bytes: int = 64 * 1024 * 1024):
+        super().__init__(cache_dir, max_bytes)
+
+    @classmethod
+    def key(cls, digest: str, path: str, config_digest: str, version: str) -> str:
+        """Cache key for a file's SHA-256 hex digest and module path under a config and puppet-lint version."""
+        tool = hashlib.sha256(version.encode()).hexdigest()[:16]
+        location = hashlib.sha256(path.encode()).hexdigest()[:16]
+        return f"{cls.CACHE_VERSION}:{tool}:{config_digest}:{location}:{digest}"
+
+    def get(self, key: str) -> Optional[List[Tuple[int, int, str, str, str]]]:
+        """Return the cached ``(line, column, severity, rule_code, message)`` list for key."""
+        payload = self._load(key)
+        if payload is None:
+            return None
+        return [tuple(item) for item in json.loads(payload)]
+
+    def put(self, key: str, problems: List[Tuple[int, int, str, str, str]]):
+        """Queue a file's problems for storage on the next ``flush``."""
+        self._store(key, json.dumps(problems, separators=(",", ":")))
+
+
+def run_puppet_lint_cached(files: List[Path], cache: LintCache, jobs: int = 1,
+                           fix: bool = False, config: Optional[Path] = None,
+                           timeout: Optional[float] = None,
+                           deadline: Optional[float] = None) -> Iterator[LintResult]:
+    """Lint files, passing only files without a cached result to puppet-lint.
+
+    Results are yielded as by ``lint_shards``, cached ones in their place
+    under the file's name as given, so they go out as soon as every file
+    before them is done. New entries are queued as files are linted and
+    written when linting ends. With ``fix``, files cached as clean are
+    skipped and the rest are fixed; the entries of files that were
+    rewritten are dropped, and their new content is linted again to
+    refresh the cache. Files that could not be read are always linted.
+    On LintTimeout nothing is stored.
+    """
+    version = puppet_lint_version(timeout)
+    if version is None:
+        print("Error: puppet-lint not found. Install with: gem install puppet-lint")
+        return
+    config_digest = hashlib.sha256(config.read_bytes()).hexdigest()[:16] if config else "-"
+
+    def file_key(pp_file: Path) -> Optional[str]:
+        try:
+            digest = hashlib.sha256(pp_file.read_bytes()).hexdigest()
+        except OSError:
+            return None
+        return LintCache.key(digest, module_path(pp_file), config_digest, version)
+
+    def store(results: List[LintResult], linted: List[Path]):
+        # Every linted file gets an entry, clean ones an empty list
+        problems = defaultdict(list)
+        for r in results:
+            problems[r.file].append((r.line, r.column, r.severity, r.rule_code, r.message))
+        for pp_file in linted:
+            key = file_key(pp_file)
+            if key:
+                cache.put(key, problems.get(str(pp_file), []))
+
+    keys = {pp_file: file_key(pp_file) for pp_file in files}
+    known: Dict[str, List[LintResult]] = {}
+    pending = []
+    for pp_file in files:
+        cached = cache.get(keys[pp_file]) if keys[pp_file] else None
+        if cached is None or (fix and cached):
+            pending.append(pp_file)
+        else:
+            # With fix, only files cached as clean get here
+            known[str(pp_file)] = [LintResult(str(pp_file), line, column, severity, rule_code, message)
+                                   for line, column, severity, rule_code, message in cached]
+
+    linted: List[LintResult] = []
+    try:
+        for r in lint_shards(files, jobs, fix, config, timeout, deadline, known):
+            if r.file not in known:
+                linted.append(r)
+            yield r
+        if fix:
+            rewritten = {f for f in pending if keys[f] and file_key(f) != keys[f]}
+            for pp_file in rewritten:
+                cache.delete(keys[pp_file])
+            refresh = [f for f in pending if f in rewritten]
+            store(list(lint_shards(refresh, jobs, False, config, timeout, deadline)), refresh)
+            # Files left as they were got their plain results from the fix run
+            store(linted, [f for f in pending if f not in rewritten])
+        else:
+            store(linted, pending)
+    except LintTimeout:
+        raise
+    except Exception as e:
+        print(f"Error running puppet-lint: {e}")
+    finally:
+        cache.flush()
+
+
+# Backend for LintWorker: loads the puppet-lint gem once, then lints one
+# path per stdin line, answering in our --format followed by an empty line.
+# Options after "--" (e.g. --config FILE) are parsed as by puppet-lint.
+WORKER_SCRIPT = r"""
+require 'puppet-lint'
+PuppetLint::OptParser.build.parse!(ARGV)
+$stdout.sync = true
+$stdin.each_line do |request|
+  path = request.chomp
+  begin
+    linter = PuppetLint.new
+    linter.file = path
+    linter.run
+    linter.problems.each do |problem|
+      next if problem[:kind] == :ignored
+      puts [path, problem[:line], problem[:column], problem[:kind], problem[:check],
+            problem[:message].to_s.tr("\n", ' ')].join(':')
+    end
+  rescue StandardError => e
+    puts [path, 1, 1, 'error', 'lint_worker', e.message.tr("\n", ' ')].join(':')
+  end
+  puts
+end
+"""
+
+
+class LintWorker:
+    """A resident lint backend process, linting one file per request.
+
+    The backend reads a manifest path per line on stdin and answers with
+    its issues in our --format, one per line, then an empty line.
+    ``WORKER_SCRIPT`` is the puppet-lint backend; any command speaking
+    the same protocol can stand in for it.
+    """
+
+    def __init__(self, command: List[str], cwd: Optional[Path] = None):
+        self.process = subprocess.Popen(
+            command, cwd=cwd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, text=True, encoding="utf-8", errors="replace", bufsize=1
+        )
+
+    def lint(self, path: Path, timeout: Optional[float] = None) -> List[LintResult]:
+        """Lint one file.
+
+        Raises RuntimeError if the backend exits, or is stopped for not
+        answering within ``timeout`` seconds; the worker is unusable then.
+        """
+        timer = threading.Timer(timeout, stop_process, [self.process]) if timeout else None
+        start = time.monotonic()
+        lines = []
+        try:
+            if timer:
+                timer.start()
+            self.process.stdin.write(f"{path}\n")
+            self.process.stdin.flush()
+            while True:
+                line = self.process.stdout.readline()
+                if line in ("", "\n"):
+                    break
+                lines.append(line)
+        except OSError:
+            line = ""
+        finally:
+            if timer:
+                timer.cancel()
+
+        if line == "":
+            if timeout and time.monotonic() - start >= timeout:
+                raise RuntimeError(f"lint worker stopped after {timeout:.1f}s on {path}")
+            raise RuntimeError(f"lint worker exited while linting {path}")
+        return list(parse_lint_output(lines))
+
+    def close(self):
+        """Let the backend exit at end of input, stopping it if it lingers."""
+        try:
+            self.process.stdin.close()
+            self.process.wait(5.0)
+        except (OSError, subprocess.TimeoutExpired):
+            stop_process(self.process)
+        self.process.stdout.close()
+
+
+class LintServer:
+    """Pools of warm lint workers answering JSON-RPC 2.0 requests.
+
+    Requests and responses are JSON objects, one per line. ``lint`` takes
+    ``{"paths": [...]}`` (absolute paths of manifests or directories) and
+    returns the issues as LintResult dicts, grouped by file in request
+    order; ``shutdown`` stops the server. Each manifest is linted by a
+    worker started for its .puppet-lint.rc (or ``config``), with up to
+    ``workers`` per config started on demand and kept between requests,
+    so neither Python nor Ruby starts up per file.
+    """
+
+    def __init__(self, command: List[str], workers: int = 2, config: Optional[Path] = None,
+                 timeout: Optional[float] = None):
+        self.command = command
+        self.workers = workers
+        self.config = config
+        self.timeout = timeout
+        self.resolver = ConfigResolver()
+        self.idle: Dict[Optional[Path], List[LintWorker]] = defaultdict(list)
+        self.running: Dict[Optional[Path], int] = defaultdict(int)
+        self.available = threading.Condition()
+        self.executor = ThreadPoolExecutor(max_workers=max(workers, os.cpu_count() or 1))
+
+    def _acquire(self, config: Optional[Path]) -> LintWorker:
+        with self.available:
+            while not self.idle[config] and self.running[config] >= self.workers:
+                self.available.wait()
+            if self.idle[config]:
+                return self.idle[config].pop()
+            self.running[config] += 1
+        try:
+            if config:
+                return LintWorker(self.command + ["--config", str(config)], config.parent)
+            return LintWorker(self.command)
+        except OSError:
+            self._release(config, None)
+            raise
+
+    def _release(self, config: Optional[Path], worker: Optional[LintWorker]):
+        # worker is None when it could not be started or has failed
+        with self.available:
+            if worker:
+                self.idle[config].append(worker)
+            else:
+                self.running[config] -= 1
+            self.available.notify_all()
+
+    def lint_file(self, pp_file: Path, config: Optional[Path]) -> List[LintResult]:
+        worker = self._acquire(config)
+        try:
+            results = worker.lint(pp_file, self.timeout)
+        except RuntimeError:
+            worker.close()
+            self._release(config, None)
+            raise
+        self._release(config, worker)
+        return results
+
+    def lint(self, paths: List[Path]) -> List[LintResult]:
+        """Lint paths on the pooled workers, files of one config in parallel."""
+        _, files = expand_targets(paths)
+        with self.available:
+            configs = [self.config or self.resolver.find(f) for f in files]
+        outputs = self.executor.map(self.lint_file, files, configs)
+        return [r for found in outputs for r in found]
+
+    def handle(self, line: str) -> Tuple[Dict, bool]:
+        """Answer one request line; also returns whether the server should stop."""
+        def error(request_id, code: int, message: str) -> Tuple[Dict, bool]:
+            return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}, False
+
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return error(None, -32700, "Parse error")
+        if not isinstance(request, dict):
+            return error(None, -32600, "Invalid request")
+
+        request_id = request.get("id")
+        method = request.get("method")
+        params = request.get("params") or {}
+        if method == "shutdown":
+            return {"jsonrpc": "2.0", "id": request_id, "result": None}, True
+        if method != "lint":
+            return error(request_id, -32601, f"Method not found: {method}")
+
+        paths = params.get("paths") if isinstance(params, dict) else None
+        if not isinstance(paths, list) or not all(isinstance(p, str) for p in paths):
+            return error(request_id, -32602, "params.paths must be a list of strings")
+        missing = [p for p in paths if not Path(p).exists()]
+        if missing:
+            return error(request_id, -32602, f"Target path does not exist: {missing[0]}")
+
+        try:
+            results = self.lint([Path(p) for p in paths])
+        except (OSError, RuntimeError) as e:
+            return error(request_id, -32603, str(e))
+        return {"jsonrpc": "2.0", "id": request_id, "result": [r.to_dict() for r in results]}, False
+
+    def close(self):
+        self.executor.shutdown()
+        with self.available:
+            workers = [w for idle in self.idle.values() for w in idle]
+            self.idle.clear()
+        for worker in workers:
+            worker.close()
+
+
+def serve_stdio(server: LintServer, requests: TextIO, responses: TextIO):
+    """Answer requests from one client, in order, until end of input or shutdown."""
+    for line in requests:
+        if not line.strip():
+            continue
+        response, stop = server.handle(line)
+        responses.write(json.dumps(response) + "\n")
+        responses.flush()
+        if stop:
+            break
+
+
+class LintRequestHandler(socketserver.StreamRequestHandler):
+    """One client connection to ``serve_socket``, answered request by request."""
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            response, stop = self.server.lint_server.handle(line.decode(errors="replace"))
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+            if stop:
+                # shutdown() waits for serve_forever, so it cannot run on this thread
+                threading.Thread(target=self.server.shutdown).start()
+                break
+
+
+def serve_socket(server: LintServer, address: Path):
+    """Serve clients on a Unix domain socket at address until shutdown.
+
+    A socket file left behind by a server that is gone is replaced;
+    RuntimeError is raised if another server is still listening on it.
+    """
+    if address.exists():
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(str(address))
+            except OSError:
+                address.unlink()
+            else:
+                raise RuntimeError(f"A lint server is already listening on {address}")
+
+    with socketserver.ThreadingUnixStreamServer(str(address), LintRequestHandler) as listener:
+        listener.daemon_threads = True
+        listener.lint_server = server
+        try:
+            print(f"Listening on {address}", file=sys.stderr)
+            listener.serve_forever()
+        finally:
+            address.unlink(missing_ok=True)
+
+
+def lint_via_server(address: Path, paths: List[Path],
+                    timeout: Optional[float] = None) -> List[LintResult]:
+    """Lint paths with the server listening on address (see ``serve_socket``).
+
+    Reported paths are absolute. Raises OSError if the server cannot be
+    reached in time and RuntimeError if it returns an error.
+    """
+    request = {
+        "jsonrpc": "2.0",
+        "id": 1,
+        "method": "lint",
+        "params": {"paths": [str(p.resolve()) for p in paths]},
+    }
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(str(address))
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        with sock.makefile("rb") as reply:
+            line = reply.readline()
+    if not line:
+        raise RuntimeError("lint server closed the connection")
+
+    response = json.loads(line)
+    if "error" in response:
+        raise RuntimeError(response["error"]["message"])
+    return [LintResult(**item) for item in response["result"]]
+
+
 def format_results(results: List[LintResult], target: Path) -> str:
     """Format lint results for display."""
     if not results:
@@ -146,52 +924,366 @@ def format_results(results: List[LintResult], target: Path) -> str:
     return "\n".join(output)
 
 
+SARIF_LEVELS = {"error": "error", "warning": "warning", "warn": "warning", "info": "note"}
+
+
+def write_json_array(results: Iterable[LintResult], handle: TextIO) -> int:
+    """Write results as an indented JSON array, one result at a time.
+
+    The output matches ``json.dumps(list, indent=2)`` without building the
+    list. Returns the result count.
+    """
+    count = 0
+    for r in results:
+        item = json.dumps(r.to_dict(), indent=2).replace("\n", "\n  ")
+        handle.write(("[\n  " if not count else ",\n  ") + item)
+        count += 1
+    handle.write("\n]\n" if count else "[]\n")
+    return count
+
+
+def write_ndjson(results: Iterable[LintResult], handle: TextIO) -> int:
+    """Write one JSON object per line as results arrive and return the result count."""
+    count = 0
+    for r in results:
+        handle.write(json.dumps(r.to_dict()) + "\n")
+        count += 1
+    return count
+
+
+def write_sarif(results: Iterable[LintResult], handle: TextIO) -> int:
+    """Write a SARIF 2.1.0 log, streaming one result per line, and return the result count.
+
+    Results are written before the tool description, whose rule list is
+    built from the check names seen; SARIF consumers do not depend on key
+    order.
+    """
+    handle.write('{"$schema": "https://json.schemastore.org/sarif-2.1.0.json", '
+                 '"version": "2.1.0", "runs": [{"results": [')
+    count = 0
+    rule_codes = set()
+    for r in results:
+        rule_codes.add(r.rule_code)
+        result = {
+            "ruleId": r.rule_code,
+            "level": SARIF_LEVELS.get(r.severity, "note"),
+            "message": {"text": r.message},
+            "locations": [{"physicalLocation": {
+                "artifactLocation": {"uri": sarif_uri(r.file)},
+                "region": {"startLine": r.line, "startColumn": r.column},
+            }}],
+        }
+        handle.write(("\n" if not count else ",\n") + json.dumps(result))
+        count += 1
+
+    driver = {
+        "name": "puppet-lint",
+        "informationUri": "http://puppet-lint.com/",
+        "rules": [{"id": code} for code in sorted(rule_codes)],
+    }
+    handle.write(f'\n], "tool": {{"driver": {json.dumps(driver)}}}}}]}}\n')
+    return count
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Run puppet-lint with project-specific rules"
     )
     parser.add_argument(
-        "target",
+        "targets",
         type=Path,
-        help="Path to Puppet manifest or directory"
+        nargs="*",
+        metavar="target",
+        help="Paths to Puppet manifests or directories"
+    )
+    parser.add_argument(
+        "--files-from",
+        metavar="FILE",
+        help="Read more targets from FILE, one per line ('-' for stdin)"
     )
     parser.add_argument(
         "--fix",
         action="store_true",
         help="Automatically fix lint issues where possible"
     )
+    parser.add_argument(
+        "--format",
+        choices=["text", "json", "ndjson", "sarif"],
+        default="text",
+        help="Output format (default: text report); ndjson and sarif are streamed per issue"
+    )
     parser.add_argument(
         "--json",
         action="store_true",
-        help="Output results as JSON"
+        help="Output results as JSON (same as --format json)"
+    )
+    parser.add_argument(
+        "--changed-since",
+        metavar="REF",
+        help="Only lint .pp files changed since the merge base with git REF"
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of concurrent puppet-lint processes for a directory (0 = one per CPU)"
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        metavar="SECONDS",
+        help="Stop any single puppet-lint process after SECONDS and report partial results"
+    )
+    parser.add_argument(
+        "--total-timeout",
+        type=float,
+        metavar="SECONDS",
+        help="Stop linting after SECONDS in total and report partial results"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        help="Directory for the lint result cache (default: ~/.cache/puppet-code-analyzer)"
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=64,
+        help="Maximum lint cache size in MB (default: 64)"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the lint cache"
+    )
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        metavar="FILE",
+        help="Only report issues not recorded in baseline FILE"
+    )
+    parser.add_argument(
+        "--write-baseline",
+        action="store_true",
+        help="Record every current issue in the --baseline FILE and exit"
     )
     parser.add_argument(
         "--config",
         type=Path,
         help="Path to .puppet-lint.rc configuration file"
     )
+    parser.add_argument(
+        "--serve",
+        metavar="SOCKET",
+        help="Run a resident lint server on Unix socket SOCKET ('-' for JSON-RPC on stdin/stdout)"
+    )
+    parser.add_argument(
+        "--connect",
+        type=Path,
+        metavar="SOCKET",
+        help="Lint the targets with the server listening on SOCKET"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=2,
+        help="Warm lint workers per config for --serve (0 = one per CPU, default: 2)"
+    )
+    parser.add_argument(
+        "--worker-command",
+        metavar="CMD",
+        help="Lint backend command for --serve workers (default: puppet-lint loaded in ruby)"
+    )
 
     args = parser.parse_args()
+    if args.json:
+        args.format = "json"
+
+    if args.serve:
+        if args.targets or args.files_from or args.fix or args.connect:
+            print("Error: --serve takes no targets, --files-from, --fix or --connect")
+            sys.exit(1)
+        command = (shlex.split(args.worker_command) if args.worker_command
+                   else ["ruby", "-e", WORKER_SCRIPT, "--"])
+        workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+        server = LintServer(command, workers, args.config, args.timeout)
+        try:
+            if args.serve == "-":
+                serve_stdio(server, sys.stdin, sys.stdout)
+            else:
+                serve_socket(server, Path(args.serve))
+        except RuntimeError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+        sys.exit(0)
+
+    paths = list(args.targets)
+    if args.files_from:
+        try:
+            listing = sys.stdin.read() if args.files_from == "-" else Path(args.files_from).read_text()
+        except OSError as e:
+            print(f"Error: Could not read {args.files_from}: {e}")
+            sys.exit(1)
+        paths.extend(Path(line.strip()) for line in listing.splitlines() if line.strip())
+    if not paths:
+        parser.error("at least one target is required")
 
-    if not args.target.exists():
-        print(f"Error: Target path does not exist: {args.target}")
+    for path in paths:
+        if not path.exists():
+            print(f"Error: Target path does not exist: {path}")
+            sys.exit(1)
+
+    if args.write_baseline and not args.baseline:
+        print("Error: --write-baseline requires --baseline FILE")
+        sys.exit(1)
+    if args.connect and args.fix:
+        print("Error: --fix cannot be used with --connect")
         sys.exit(1)
 
+    # Several targets are linted as a batch: one puppet-lint run per config
+    batch = None
+    if len(paths) > 1 and args.changed_since:
+        print("Error: --changed-since takes a single target")
+        sys.exit(1)
+    if len(paths) > 1 and args.connect:
+        # The server resolves configs itself
+        args.target = expand_targets(paths)[0]
+    elif len(paths) > 1:
+        args.target, batch = group_by_config(paths, args.config)
+        for group_config, files in batch.items():
+            print(f"Using config: {group_config or 'none'} for {len(files)} file(s)", file=sys.stderr)
+    else:
+        args.target = paths[0]
+    root = args.target if args.target.is_dir() else args.target.parent
+    baseline = None
+    if args.baseline and not args.write_baseline:
+        try:
+            baseline = Baseline.load(args.baseline, root)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
     # Find config file if not specified
-    config = args.config or find_puppet_lint_rc(args.target)
+    config = args.config or (find_puppet_lint_rc(args.target) if batch is None and not args.connect else None)
 
-    if config:
-        print(f"Using config: {config}")
+    if config and batch is None:
+        # stderr keeps machine-readable output on stdout clean
+        print(f"Using config: {config}", file=sys.stderr)
 
-    results = run_puppet_lint(args.target, args.fix, config)
+    cache = None
+    if not args.no_cache and not args.connect:
+        try:
+            cache = LintCache(args.cache_dir or default_cache_dir(), args.cache_size * 1024 * 1024)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Warning: Lint cache disabled: {e}", file=sys.stderr)
 
-    if args.json:
-        print(json.dumps([r.to_dict() for r in results], indent=2))
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    targets = None
+    if args.changed_since:
+        try:
+            changed, _ = git_changed_files(args.target, args.changed_since)
+            targets = relative_to_target(args.target, changed)
+        except RuntimeError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+    timeout = args.timeout
+    deadline = time.monotonic() + args.total_timeout if args.total_timeout else None
+    timeouts = []
+
+    remote = None
+    if args.connect:
+        try:
+            remote = lint_via_server(args.connect, targets if targets is not None else paths,
+                                     args.total_timeout)
+        except (OSError, RuntimeError, ValueError) as e:
+            print(f"Error: Lint server at {args.connect}: {e}")
+            sys.exit(1)
+        # The server reports resolved paths; name files as a local run would
+        names = {pp_file.resolve(): str(pp_file)
+                 for pp_file in expand_targets(targets if targets is not None else paths)[1]}
+        for r in remote:
+            r.file = names.get(Path(r.file), r.file)
+
+    def lint() -> Iterator[LintResult]:
+        # Every mode streams: results are yielded in file order as soon as
+        # they are known, cached ones without waiting for puppet-lint.
+        try:
+            if remote is not None:
+                yield from remote
+            elif batch is not None:
+                for group_config, files in batch.items():
+                    try:
+                        if cache:
+                            yield from run_puppet_lint_cached(files, cache, jobs, args.fix,
+                                                              group_config, timeout, deadline)
+                        else:
+                            yield from run_puppet_lint_parallel(files, jobs, args.fix,
+                                                                group_config, timeout, deadline)
+                    except LintTimeout as e:
+                        # Later groups still run (unless the total timeout has passed)
+                        print(f"Warning: {e}; reporting partial results", file=sys.stderr)
+                        timeouts.append(e)
+                        yield from e.results
+            elif targets is not None and cache:
+                yield from run_puppet_lint_cached(targets, cache, jobs, args.fix, config, timeout, deadline)
+            elif targets is not None:
+                yield from run_puppet_lint_parallel(targets, jobs, args.fix, config, timeout, deadline)
+            elif cache:
+                files = sorted(args.target.rglob("*.pp")) if args.target.is_dir() else [args.target]
+                yield from run_puppet_lint_cached(files, cache, jobs, args.fix, config, timeout, deadline)
+            elif jobs > 1 and args.target.is_dir():
+                files = sorted(args.target.rglob("*.pp"))
+                yield from run_puppet_lint_parallel(files, jobs, args.fix, config, timeout, deadline)
+            else:
+                cmd = puppet_lint_command([args.target], args.fix, config)
+                yield from stream_puppet_lint(cmd, args.fix, timeout=timeout, deadline=deadline)
+        except LintTimeout as e:
+            print(f"Warning: {e}; reporting partial results", file=sys.stderr)
+            timeouts.append(e)
+            yield from e.results
+        except FileNotFoundError:
+            print("Error: puppet-lint not found. Install with: gem install puppet-lint")
+        except OSError as e:
+            print(f"Error running puppet-lint: {e}")
+
+    results = lint()
+
+    if args.write_baseline:
+        baseline = Baseline(root)
+        count = 0
+        for r in results:
+            baseline.add(r.rule_code, r.file, r.line)
+            count += 1
+        if timeouts:
+            print("Error: Not writing a baseline from partial results")
+            sys.exit(1)
+        baseline.save(args.baseline)
+        print(f"Baseline of {count} issue(s) written to: {args.baseline}")
+        sys.exit(0)
+    if baseline:
+        results = (r for r in results if not baseline.is_known(r.rule_code, r.file, r.line))
+
+    writers = {"json": write_json_array, "ndjson": write_ndjson, "sarif": write_sarif}
+    if args.format in writers:
+        count = writers[args.format](results, sys.stdout)
     else:
+        results = list(results)
+        count = len(results)
         print(format_results(results, args.target))
 
-    # Exit with error code if issues found
-    sys.exit(1 if results else 0)
+    if cache:
+        # stderr keeps machine-readable output on stdout clean
+        print(cache.stats(), file=sys.stderr)
+    if baseline:
+        print(f"Baseline: {baseline.suppressed} known issue(s) suppressed", file=sys.stderr)
+
+    # Exit with error code if issues found or the results are partial
+    sys.exit(1 if count or timeouts else 0)
 
 
 if __name__ == "__main__":
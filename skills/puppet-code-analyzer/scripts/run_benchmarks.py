@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+"""
+Puppet Analyzer Benchmarks - Scaling checks for the analyzer scripts
+
+This script builds synthetic inputs of increasing size and times the hot
+paths of the analyzer scripts. Each suite reports time per element, so
+super-linear behaviour shows up as a growing per-element cost. Results
+can be saved as a JSON baseline and later runs compared against it.
+
+Usage:
+    python3 run_benchmarks.py
+    python3 run_benchmarks.py --suite scc --sizes 100000 200000 400000
+    python3 run_benchmarks.py --repeat 3 --save-baseline baseline.json
+    python3 run_benchmarks.py --repeat 3 --compare baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from analyze_deps import DependencyGraph, PuppetParser  # noqa: E402
+from check_best_practices import (  # noqa: E402
+    BestPracticeChecker, ManifestScan, StyleGuideMatcher, StylePattern
+)
+from generate_corpus import generate_corpus  # noqa: E402
+from lint_puppet import run_puppet_lint  # noqa: E402
+from trace_error import CommonIssuesDatabase, parse_error_file  # noqa: E402
+
+# Classes per module in generated corpora; suite sizes count modules
+CORPUS_CLASSES = 10
+
+# Stands in for puppet-lint: prints PUPPET_LINT_STUB_LINES lines of output
+# in the format run_puppet_lint requests, whatever the arguments
+PUPPET_LINT_STUB = """#!{python}
+import os, sys
+lines = int(os.environ.get("PUPPET_LINT_STUB_LINES", "0"))
+row = "site-modules/mod{{0}}/manifests/class{{1}}.pp:{{2}}:3:warning:double_quoted_strings:" \\
+      "double quoted string containing no variables\\n"
+sys.stdout.write("".join(row.format(i % 50, i % 10, i % 40 + 1) for i in range(lines)))
+"""
+
+
+def build_synthetic_graph(size: int, seed: int = 0) -> DependencyGraph:
+    """Build a dependency graph shaped like a large control repo.
+
+    Every class includes the next one, giving one include chain as deep as
+    the graph, plus a few random forward edges per class. Every 1000th class
+    also points back a short distance, so the graph has many small cycles.
+    """
+    rng = random.Random(seed)
+    graph = DependencyGraph()
+    names = [f"module{i // 50}::class{i}" for i in range(size)]
+
+    for i, name in enumerate(names):
+        graph.add_class(name)
+        if i + 1 < size:
+            graph.add_dependency(name, names[i + 1], "include")
+        for _ in range(2):
+            j = rng.randrange(i, size)
+            graph.add_dependency(name, names[j], "require")
+        if i % 1000 == 999:
+            graph.add_dependency(name, names[i - rng.randrange(1, 10)], "notify")
+
+    return graph
+
+
+def bench_scc(size: int) -> Dict:
+    """Time cycle detection on a synthetic graph."""
+    graph = build_synthetic_graph(size)
+
+    start = time.perf_counter()
+    cycles = graph.find_circular_dependencies()
+    elapsed = time.perf_counter() - start
+
+    # A second call must be served from the cache
+    start = time.perf_counter()
+    graph.find_circular_dependencies()
+    cached = time.perf_counter() - start
+
+    return {
+        "size": size,
+        "elements": len(graph.nodes) + len(graph.edges),
+        "seconds": elapsed,
+        "detail": f"{len(cycles)} cycles, cached call {cached * 1000:.2f} ms",
+    }
+
+
+def bench_reachability(size: int) -> Dict:
+    """Time building the reachability index and answering impact queries."""
+    graph = build_synthetic_graph(size)
+    names = sorted(graph.nodes)
+    probes = [names[i * len(names) // 10] for i in range(10)]
+
+    start = time.perf_counter()
+    index = graph.reachability()
+    for name in probes:
+        index.impacted_by(name)
+        index.depends_on(name)
+    elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for name in probes:
+        index.impacted_by(name)
+    per_query = (time.perf_counter() - start) / len(probes)
+
+    return {
+        "size": size,
+        "elements": len(graph.nodes) + len(graph.edges),
+        "seconds": elapsed,
+        "detail": f"warm query {per_query * 1000:.2f} ms",
+    }
+
+
+def build_synthetic_manifest(size: int) -> str:
+    """Build one generated-looking manifest with size parameters."""
+    lines = ["class generated::params ("]
+    lines.extend(f"  $param_{i} = 'value_{i}'," for i in range(size))
+    lines.append(") {")
+    lines.extend(f"  $lookup_{i} = hiera('generated::key_{i}', 'default')" for i in range(0, size, 10))
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def bench_best_practices(size: int) -> Dict:
+    """Time all best practice checks on one large manifest."""
+    content = build_synthetic_manifest(size)
+    checker = BestPracticeChecker()
+
+    start = time.perf_counter()
+    issues = checker.check_content(content, Path("generated/manifests/params.pp"))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "size": size,
+        "elements": len(content),
+        "seconds": elapsed,
+        "detail": f"{len(issues)} issues",
+    }
+
+
+def bench_style_guide(size: int) -> Dict:
+    """Time size style guide patterns on one manifest, against one scan per pattern."""
+    content = build_synthetic_manifest(2000)
+    scan = ManifestScan(content, Path("generated/manifests/params.pp"))
+    patterns = [
+        StylePattern("forbidden", rf"\bdeprecated_function_{i}\(", f"Do not call deprecated_function_{i}",
+                     "warning", "house rules")
+        for i in range(size)
+    ]
+    # A few patterns that do match, so verification is part of the timing
+    patterns.extend(StylePattern("forbidden", rf"\$param_{i}\b", f"param_{i} is reserved",
+                                 "warning", "house rules") for i in range(0, size, 100))
+
+    matcher = StyleGuideMatcher(patterns)
+    start = time.perf_counter()
+    issues = list(matcher.check(scan))
+    elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for p in patterns:
+        list(re.finditer(p.pattern, content, re.MULTILINE))
+    per_pattern = time.perf_counter() - start
+
+    return {
+        "size": size,
+        "elements": len(patterns),
+        "seconds": elapsed,
+        "detail": f"{len(issues)} issues, one scan per pattern {per_pattern * 1000:.1f} ms",
+    }
+
+
+def bench_parser(size: int) -> Dict:
+    """Time PuppetParser on a generated control repo of size modules."""
+    with tempfile.TemporaryDirectory() as root:
+        stats = generate_corpus(Path(root), size, CORPUS_CLASSES, log_lines=0)
+        parser = PuppetParser()
+
+        start = time.perf_counter()
+        parser.parse_directory(Path(root))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "size": size,
+        "elements": stats["bytes"],
+        "seconds": elapsed,
+        "detail": f"{stats['manifests']} manifests, {len(parser.graph.edges)} edges",
+    }
+
+
+def bench_checker(size: int) -> Dict:
+    """Time BestPracticeChecker on a generated control repo of size modules."""
+    with tempfile.TemporaryDirectory() as root:
+        stats = generate_corpus(Path(root), size, CORPUS_CLASSES, log_lines=0)
+        checker = BestPracticeChecker()
+
+        start = time.perf_counter()
+        issues = checker.check_directory(Path(root))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "size": size,
+        "elements": stats["bytes"],
+        "seconds": elapsed,
+        "detail": f"{stats['manifests']} manifests, {len(issues)} issues",
+    }
+
+
+def bench_trace(size: int) -> Dict:
+    """Time parse_error_file and CommonIssuesDatabase.analyze on a size-line log."""
+    with tempfile.TemporaryDirectory() as root:
+        generate_corpus(Path(root), 50, CORPUS_CLASSES, log_lines=size)
+        log = Path(root) / "logs" / "puppet.log"
+
+        start = time.perf_counter()
+        errors = parse_error_file(log)
+        analyses = [CommonIssuesDatabase.analyze(error) for error in errors]
+        elapsed = time.perf_counter() - start
+
+    unknown = sum(1 for a in analyses if a.error_type == "Unknown Error")
+    return {
+        "size": size,
+        "elements": size,
+        "seconds": elapsed,
+        "detail": f"{len(errors)} errors, {unknown} unrecognised",
+    }
+
+
+def bench_lint(size: int) -> Dict:
+    """Time run_puppet_lint parsing size lines from a stub puppet-lint."""
+    with tempfile.TemporaryDirectory() as root:
+        stub = Path(root) / "puppet-lint"
+        stub.write_text(PUPPET_LINT_STUB.format(python=sys.executable))
+        stub.chmod(0o755)
+
+        saved = {name: os.environ.get(name) for name in ("PATH", "PUPPET_LINT_STUB_LINES")}
+        os.environ["PATH"] = f"{root}{os.pathsep}{saved['PATH'] or ''}"
+        try:
+            # Process start-up alone, to separate it from output handling
+            os.environ["PUPPET_LINT_STUB_LINES"] = "0"
+            start = time.perf_counter()
+            run_puppet_lint(Path(root))
+            startup = time.perf_counter() - start
+
+            os.environ["PUPPET_LINT_STUB_LINES"] = str(size)
+            start = time.perf_counter()
+            results = run_puppet_lint(Path(root))
+            elapsed = time.perf_counter() - start
+        finally:
+            for name, value in saved.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+    return {
+        "size": size,
+        "elements": size,
+        "seconds": elapsed,
+        "detail": f"{len(results)} results, stub start-up {startup * 1000:.1f} ms",
+    }
+
+
+SUITES: Dict[str, Callable[[int], Dict]] = {
+    "best-practices": bench_best_practices,
+    "checker": bench_checker,
+    "lint": bench_lint,
+    "parser": bench_parser,
+    "reachability": bench_reachability,
+    "scc": bench_scc,
+    "style-guide": bench_style_guide,
+    "trace": bench_trace,
+}
+
+DEFAULT_SIZES: Dict[str, List[int]] = {
+    "best-practices": [5000, 10000, 20000],
+    "checker": [50, 100, 200],
+    "lint": [10000, 40000, 160000],
+    "parser": [50, 100, 200],
+    "reachability": [10000, 20000, 40000],
+    "scc": [25000, 100000, 200000],
+    "style-guide": [100, 400, 1600],
+    "trace": [10000, 40000, 160000],
+}
+
+
+def format_table(suite: str, results: List[Dict]) -> str:
+    """Format one suite's results as a Markdown table."""
+    output = [
+        f"### {suite}",
+        "| Size | Elements | Seconds | µs/element | Detail |",
+        "|------|----------|---------|------------|--------|",
+    ]
+    for r in results:
+        per_element = r["seconds"] / r["elements"] * 1e6 if r["elements"] else 0.0
+        output.append(
+            f"| {r['size']} | {r['elements']} | {r['seconds']:.3f} | "
+            f"{per_element:.2f} | {r['detail']} |"
+        )
+    return "\n".join(output)
+
+
+def run_suite(suite: str, size: int, repeat: int) -> Dict:
+    """Run one benchmark repeat times and keep the fastest run."""
+    return min((SUITES[suite](size) for _ in range(repeat)), key=lambda r: r["seconds"])
+
+
+def to_baseline(results: Dict[str, List[Dict]]) -> Dict:
+    """Machine-readable form of a run, as written by --save-baseline."""
+    return {
+        "version": 1,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "suites": {
+            suite: [
+                {
+                    "size": r["size"],
+                    "elements": r["elements"],
+                    "seconds": r["seconds"],
+                    "us_per_element": r["seconds"] / r["elements"] * 1e6 if r["elements"] else 0.0,
+                }
+                for r in suite_results
+            ]
+            for suite, suite_results in results.items()
+        },
+    }
+
+
+def find_regressions(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Compare two baselines and describe every result slower than tolerance allows.
+
+    Results are matched by suite and size; per-element times are compared
+    so changes to the generated inputs do not show up as regressions.
+    """
+    regressions = []
+    for suite, results in current["suites"].items():
+        previous = {r["size"]: r for r in baseline.get("suites", {}).get(suite, [])}
+        for r in results:
+            before = previous.get(r["size"])
+            if not before or not before["us_per_element"]:
+                continue
+            ratio = r["us_per_element"] / before["us_per_element"]
+            if ratio > tolerance:
+                regressions.append(
+                    f"| {suite} | {r['size']} | {before['us_per_element']:.2f} | "
+                    f"{r['us_per_element']:.2f} | {ratio:.2f}x |"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the Puppet analyzer scripts on synthetic inputs"
+    )
+    parser.add_argument(
+        "--suite",
+        choices=sorted(SUITES),
+        action="append",
+        help="Suite to run (repeatable, default: all)"
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        help="Input sizes to benchmark (default: per-suite sizes)"
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=1,
+        help="Run each benchmark N times and keep the fastest (default: 1)"
+    )
+    parser.add_argument(
+        "--save-baseline",
+        type=Path,
+        metavar="FILE",
+        help="Write results as a JSON baseline"
+    )
+    parser.add_argument(
+        "--compare",
+        type=Path,
+        metavar="FILE",
+        help="Compare results with a JSON baseline and exit 1 on regressions"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=1.25,
+        help="With --compare, slowdown per element that counts as a regression (default: 1.25)"
+    )
+
+    args = parser.parse_args()
+
+    results = {}
+    for suite in args.suite or sorted(SUITES):
+        sizes = args.sizes or DEFAULT_SIZES[suite]
+        results[suite] = [run_suite(suite, size, max(1, args.repeat)) for size in sizes]
+        print(format_table(suite, results[suite]))
+        print()
+
+    current = to_baseline(results)
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(current, indent=2) + "\n")
+        print(f"Baseline written to: {args.save_baseline}")
+
+    if args.compare:
+        try:
+            baseline = json.loads(args.compare.read_text())
+        except (OSError, ValueError) as e:
+            print(f"Error: Could not read baseline {args.compare}: {e}")
+            return 1
+        regressions = find_regressions(current, baseline, args.tolerance)
+        if regressions:
+            print(f"### Regressions (over {args.tolerance:.2f}x baseline)")
+            print("| Suite | Size | Baseline µs/element | Current µs/element | Ratio |")
+            print("|-------|------|---------------------|--------------------|-------|")
+            print("\n".join(regressions))
+            return 1
+        print(f"No regressions against {args.compare}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
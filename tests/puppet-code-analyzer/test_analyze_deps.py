@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Regression tests for analyze_deps.py
+
+Usage:
+    python3 -m unittest discover tests/puppet-code-analyzer
+"""
+
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+SCRIPTS = Path(__file__).resolve().parents[2] / "skills" / "puppet-code-analyzer" / "scripts"
+sys.path.insert(0, str(SCRIPTS))
+
+from analyze_deps import (  # noqa: E402
+    CondensedGraph, DependencyGraph, DependencyWatcher, Profiler, PuppetParser, _InotifySource
+)
+from generate_corpus import generate_corpus  # noqa: E402
+
+# The per-relationship patterns the single-pass scanner replaced
+CLASS_DEF = re.compile(r'class\s+([a-z][a-z0-9_:]*)\s*(?:\(|\s*\{|\s*$)', re.MULTILINE)
+FUNCTIONS = [
+    ("include", re.compile(r'include\s+([a-z][a-z0-9_:]*)')),
+    ("require", re.compile(r'Require\s*\(\s*[\'"]?([a-z][a-z0-9_:]*)')),
+    ("contain", re.compile(r'Contain\s*\(\s*[\'"]?([a-z][a-z0-9_:]*)')),
+    ("notify", re.compile(r'Notify\s*\(\s*[\'"]?([a-z][a-z0-9_:]*)')),
+    ("subscribe", re.compile(r'Subscribe\s*\(\s*[\'"]?([a-z][a-z0-9_:]*)')),
+]
+CHAIN_ARROW = re.compile(r'([a-z][a-z0-9_:]*)\s*(->|~>|<-|<~)\s*([a-z][a-z0-9_:]*)')
+
+
+def per_pattern_edges(content: str):
+    """Edges as found by the original one-pass-per-relationship parser."""
+    class_match = CLASS_DEF.search(content)
+    if not class_match:
+        return None, []
+    current_class = class_match.group(1)
+    edges = [(current_class, match.group(1), relationship)
+             for relationship, pattern in FUNCTIONS for match in pattern.finditer(content)]
+    for match in CHAIN_ARROW.finditer(content):
+        source, arrow, target = match.groups()
+        if arrow in ("->", "~>"):
+            edges.append((current_class, target, "require" if arrow == "->" else "notify"))
+        else:
+            edges.append((source, current_class, "require" if arrow == "<-" else "subscribe"))
+    return current_class, edges
+
+
+def random_graph(rng: random.Random, classes: int, edges: int) -> DependencyGraph:
+    """A graph over mod::c0.. with random (possibly cyclic) edges."""
+    graph = DependencyGraph()
+    names = [f"mod::c{i}" for i in range(classes)]
+    for name in names:
+        graph.add_class(name)
+    for _ in range(edges):
+        graph.add_dependency(rng.choice(names), rng.choice(names), rng.choice(["include", "require"]))
+    return graph
+
+
+def reachable(adjacency, start: str) -> list:
+    """Classes reachable from start by breadth-first search, start excluded."""
+    seen, queue = {start}, [start]
+    while queue:
+        for target in adjacency.get(queue.pop(), ()):
+            if target not in seen:
+                seen.add(target)
+                queue.append(target)
+    return sorted(seen - {start})
+
+
+def cycle_sets(graph: DependencyGraph) -> set:
+    """Cycles as sets of classes, independent of where each path starts."""
+    return {frozenset(cycle) for cycle in graph.find_circular_dependencies()}
+
+
+class ScannerTest(unittest.TestCase):
+
+    # Manifests whose heredocs and regex literals hold quotes or '#'; none of
+    # them has a relationship inside a comment or string, so the old parser's
+    # edges are the expected ones
+    MANIFESTS = {
+        "apostrophe in heredoc": (
+            "class foo {\n  $msg = @(EOT)\n    Don't do this\n    | EOT\n  include bar\n  notify { 'done': }\n}\n"
+        ),
+        "heredoc with interpolation and options": (
+            "class foo {\n  notify { 'x': message => @(\"EOT\"/L) }\n    it's ${x}\n"
+            "  |- EOT\n  include bar\n  Class['a'] -> Class['b']\n}\n"
+        ),
+        "code after heredoc opener": (
+            "class foo {\n  $x = [@(A), Require(baz)]\n    a \"quote\n  |A\n  include bar\n}\n"
+        ),
+        "hash in regex literal": (
+            "class foo {\n  if $x =~ /#foo/ { include quux }\n  include bar\n}\n"
+        ),
+        "quote in case regex": (
+            "class foo {\n  case $h {\n    /web'1/: { include web }\n    default: { include other }\n  }\n}\n"
+        ),
+        "division": (
+            "class foo {\n  $a = $b / 2\n  $c = (4) / $d\n  include bar\n  contain baz\n}\n"
+        ),
+    }
+
+    def test_matches_per_pattern_parser(self):
+        for name, content in self.MANIFESTS.items():
+            with self.subTest(name):
+                self.assertEqual(PuppetParser.extract_edges(content), per_pattern_edges(content))
+
+    def test_matches_per_pattern_parser_on_corpus(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            generate_corpus(Path(tmp), modules=4, classes=6, log_lines=0)
+            files = sorted(Path(tmp).rglob("*.pp"))
+            self.assertTrue(files)
+            for path in files:
+                content = path.read_text()
+                self.assertEqual(PuppetParser.extract_edges(content), per_pattern_edges(content), path.name)
+
+    def test_ignores_relationships_in_comments_strings_and_heredocs(self):
+        content = ("class foo {\n  # include commented\n  $s = 'include quoted'\n"
+                   "  $h = @(EOT)\n    include heredoc\n    | EOT\n  include bar\n}\n")
+        self.assertEqual(PuppetParser.extract_edges(content), ("foo", [("foo", "bar", "include")]))
+
+
+class ReachabilityIndexTest(unittest.TestCase):
+
+    def test_matches_breadth_first_search(self):
+        rng = random.Random(6)
+        for _ in range(20):
+            graph = random_graph(rng, classes=15, edges=rng.randint(5, 30))
+            forward = dict(graph.adjacency)
+            backward = {}
+            for source, targets in forward.items():
+                for target in targets:
+                    backward.setdefault(target, []).append(source)
+            index = graph.reachability()
+            for name in sorted(graph.nodes):
+                self.assertEqual(index.depends_on(name), reachable(forward, name), name)
+                self.assertEqual(index.impacted_by(name), reachable(backward, name), name)
+
+    def test_index_is_rebuilt_after_the_graph_changes(self):
+        graph = DependencyGraph()
+        graph.add_dependency("a", "b", "include")
+        self.assertEqual(graph.reachability().impacted_by("b"), ["a"])
+        graph.add_dependency("c", "a", "require")
+        self.assertEqual(graph.reachability().impacted_by("b"), ["a", "c"])
+        self.assertEqual(graph.reachability().depends_on("c"), ["a", "b"])
+
+
+class IncrementalCyclesTest(unittest.TestCase):
+
+    def test_incremental_cycles_match_a_fresh_graph(self):
+        rng = random.Random(7)
+        classes = [f"mod::c{i}" for i in range(12)]
+        graph = DependencyGraph()
+        present = set()
+        for step in range(400):
+            edge = (rng.choice(classes), rng.choice(classes), rng.choice(["include", "require"]))
+            if edge in present and rng.random() < 0.6:
+                graph.remove_dependency(*edge)
+                present.discard(edge)
+            elif edge not in present:
+                graph.add_dependency(*edge)
+                present.add(edge)
+            # Ask between edits so the incremental bookkeeping is exercised
+            if step % 7 == 0:
+                fresh = DependencyGraph()
+                for source, target, relationship in sorted(present):
+                    fresh.add_dependency(source, target, relationship)
+                self.assertEqual(cycle_sets(graph), cycle_sets(fresh), f"after step {step}")
+
+
+class DependencyWatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name) / "site"
+        (self.root / "a" / "manifests").mkdir(parents=True)
+        self.write("a/manifests/init.pp", "class a {\n  include b\n}\n")
+        self.write("a/manifests/b.pp", "class b {\n  include c\n}\n")
+        self.parser = PuppetParser(track_files=True)
+        self.dependencies = self.parser.parse_directory(self.root)
+        self.watcher = DependencyWatcher(self.parser, self.root, poll=True)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name: str, content: str) -> Path:
+        path = self.root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+        return path
+
+    def assertMatchesFreshParse(self):
+        fresh = PuppetParser()
+        dependencies = fresh.parse_directory(self.root)
+        self.assertEqual(self.dependencies, dependencies)
+        self.assertEqual(sorted(self.parser.graph.edges), sorted(fresh.graph.edges))
+        self.assertEqual(set(self.parser.graph.nodes), set(fresh.graph.nodes))
+        self.assertEqual(cycle_sets(self.parser.graph), cycle_sets(fresh.graph))
+
+    def test_add_modify_and_delete(self):
+        added = self.write("a/manifests/c.pp", "class c {\n  include a\n}\n")
+        self.watcher.apply({added}, self.dependencies)
+        self.assertMatchesFreshParse()
+        self.assertEqual(cycle_sets(self.parser.graph), {frozenset({"a", "b", "c"})})
+
+        modified = self.write("a/manifests/b.pp", "class b {\n  contain d\n}\n")
+        self.watcher.apply({modified}, self.dependencies)
+        self.assertMatchesFreshParse()
+        self.assertEqual(cycle_sets(self.parser.graph), set())
+
+        added.unlink()
+        self.watcher.apply({added}, self.dependencies)
+        self.assertMatchesFreshParse()
+        self.assertNotIn("c", self.dependencies)
+
+    def test_class_defined_twice_survives_deleting_one_file(self):
+        copy = self.write("z/manifests/b.pp", "class b {\n  include e\n}\n")
+        self.watcher.apply({copy}, self.dependencies)
+        self.assertMatchesFreshParse()
+
+        copy.unlink()
+        self.watcher.apply({copy}, self.dependencies)
+        self.assertMatchesFreshParse()
+        self.assertEqual(self.dependencies["b"], {"c"})
+
+    def wait(self, source) -> set:
+        """source.wait(), failing instead of blocking when no change is reported."""
+        changed = []
+        waiter = threading.Thread(target=lambda: changed.append(source.wait()), daemon=True)
+        waiter.start()
+        waiter.join(5)
+        self.assertFalse(waiter.is_alive(), "no change reported")
+        return changed[0]
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "inotify is Linux only")
+    def test_directory_moved_out_reports_its_manifests(self):
+        source = _InotifySource(self.root)
+        (self.root / "a" / "manifests" / "sub").mkdir()
+        nested = self.write("a/manifests/sub/d.pp", "class d {\n}\n")
+        self.assertEqual(self.wait(source), {nested})
+
+        outside = Path(self.tmp.name) / "moved"
+        shutil.move(str(self.root / "a"), str(outside))
+        changed = self.wait(source)
+        self.assertEqual(changed, {self.root / "a" / "manifests" / name
+                                   for name in ("init.pp", "b.pp", "sub/d.pp")})
+
+        self.watcher.apply(changed, self.dependencies)
+        self.assertEqual(self.dependencies, {})
+        self.assertEqual(list(self.parser.graph.edges), [])
+
+        # The moved tree is no longer watched under its old path
+        (outside / "manifests" / "init.pp").write_text("class x {\n}\n")
+        self.write("e.pp", "class e {\n}\n")
+        self.assertEqual(self.wait(source), {self.root / "e.pp"})
+
+
+class CondensedGraphTest(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = DependencyGraph()
+        for source, target in [("a::x", "a::z"), ("a::x", "b::y"), ("b::y", "a::z"),
+                               ("a::z", "b::y"), ("b::y", "c::w"), ("c::w", "d::v")]:
+            self.graph.add_dependency(source, target, "include")
+        self.graph.add_class("e::q")
+        self.view = CondensedGraph.from_graph(self.graph)
+
+    def test_modules_in_a_cycle_collapse_into_one_node(self):
+        self.assertEqual(self.view.nodes, {
+            "a + b": {"modules": ["a", "b"], "classes": 3, "internal": 4},
+            "c": {"modules": ["c"], "classes": 1, "internal": 0},
+            "d": {"modules": ["d"], "classes": 1, "internal": 0},
+            "e": {"modules": ["e"], "classes": 1, "internal": 0},
+        })
+        self.assertEqual(self.view.edges, {("a + b", "c"): 1, ("c", "d"): 1})
+        self.assertEqual(self.view.cycles(), ["a + b"])
+
+    def test_every_class_edge_is_counted_once(self):
+        rng = random.Random(9)
+        names = [f"m{rng.randrange(5)}::c{i}" for i in range(30)]
+        for _ in range(10):
+            graph = DependencyGraph()
+            for _ in range(60):
+                graph.add_dependency(rng.choice(names), rng.choice(names), rng.choice(["include", "require"]))
+            view = CondensedGraph.from_graph(graph)
+            self.assertEqual(sum(node["internal"] for node in view.nodes.values()) + sum(view.edges.values()),
+                             len(graph.edges))
+            self.assertEqual(sum(node["classes"] for node in view.nodes.values()), len(graph.nodes))
+            self.assertEqual(sorted(m for node in view.nodes.values() for m in node["modules"]),
+                             sorted({CondensedGraph.module_of(name) for name in graph.nodes}))
+
+    def test_focus_follows_edges_both_ways(self):
+        self.assertEqual(list(self.view.focus("c::w", 1).nodes), ["a + b", "c", "d"])
+        self.assertEqual(list(self.view.focus("b", 1).nodes), ["a + b", "c"])
+        focused = self.view.focus("b", 2)
+        self.assertEqual(list(focused.nodes), ["a + b", "c", "d"])
+        self.assertEqual(focused.edges, self.view.edges)
+        self.assertEqual(list(self.view.focus("e", 3).nodes), ["e"])
+        with self.assertRaises(LookupError):
+            self.view.focus("missing", 1)
+
+
+class AnalyzeDepsTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.work = Path(cls.tmp.name)
+        generate_corpus(cls.work / "corpus", modules=5, classes=6, log_lines=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def run_script(self, *args: str) -> subprocess.CompletedProcess:
+        """Run analyze_deps.py from the work directory."""
+        result = subprocess.run(
+            [sys.executable, str(SCRIPTS / "analyze_deps.py"), *args],
+            cwd=self.work, capture_output=True, text=True, check=False
+        )
+        # 1 means circular dependencies were found
+        self.assertIn(result.returncode, (0, 1), result.stdout + result.stderr)
+        return result
+
+    def analyze(self, *args: str) -> str:
+        """Run analyze_deps.py and return its stdout."""
+        return self.run_script(*args).stdout
+
+    def test_cache_matches_no_cache(self):
+        expected = self.analyze("--format", "jsonl", "--no-cache", "corpus")
+        self.assertTrue(expected)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cold = self.analyze("--format", "jsonl", "--cache-dir", cache_dir, "corpus")
+            warm = self.analyze("--format", "jsonl", "--cache-dir", cache_dir, "corpus")
+            warm_jobs = self.analyze("--format", "jsonl", "--cache-dir", cache_dir, "--jobs", "3", "corpus")
+        self.assertEqual(cold, expected)
+        self.assertEqual(warm, expected)
+        self.assertEqual(warm_jobs, expected)
+
+    def test_impact_queries(self):
+        impacted = self.analyze("--no-cache", "--impacted-by", "mod0::class3", "corpus")
+        depends = self.analyze("--no-cache", "--depends-on", "mod0", "corpus")
+        self.assertIn("mod0", impacted.split())
+        self.assertIn("mod0::class3", depends.split())
+
+    def test_condensed_focus(self):
+        condensed = self.analyze("--no-cache", "--condense", "corpus")
+        focused = self.analyze("--no-cache", "--focus", "mod1::class2", "--depth", "0", "corpus")
+        self.assertIn("## Puppet Module Dependency Overview", condensed)
+        self.assertIn("**Modules**: 1 ", focused)
+
+    def test_profiler_restores_scanner(self):
+        scanner = PuppetParser.SCANNER
+        profiler = Profiler()
+        files = sorted((self.work / "corpus").rglob("*.pp"))
+        profiled = PuppetParser.scan_paths(files, profiler=profiler)
+        self.assertIs(PuppetParser.SCANNER, scanner)
+        self.assertEqual(profiled, PuppetParser.scan_paths(files))
+        self.assertGreater(profiler.regexes["SCANNER"][0], 0)
+        self.assertEqual(profiler.phases["scan"][0], len(files))
+
+    def test_environments_are_deduplicated_but_analyzed_separately(self):
+        envs = self.work / "envs"
+        for env in ("dev", "production"):
+            shutil.copytree(self.work / "corpus", envs / env)
+        # Close a cycle in dev only
+        extra = envs / "dev" / "site-modules" / "mod4" / "manifests" / "back.pp"
+        extra.write_text("class mod4::back {\n  include mod0\n}\n")
+        with (envs / "dev" / "site-modules" / "mod0" / "manifests" / "init.pp").open("a") as handle:
+            handle.write("class mod0::tail {\n}\n")
+        try:
+            result = self.run_script("--no-cache", "--environments", "--format", "text", "envs")
+            corpus = self.analyze("--no-cache", "corpus")
+        finally:
+            shutil.rmtree(envs)
+
+        files = len(list((self.work / "corpus").rglob("*.pp")))
+        self.assertIn(f"Environments: 2, files: {2 * files + 1}, unique contents: {files + 2}", result.stderr)
+        dev, production = result.stdout.split("# Environment: production")
+        self.assertIn("# Environment: dev", dev)
+        self.assertIn("mod4::back", dev)
+        self.assertNotIn("mod4::back", production)
+        self.assertEqual(production.strip(), corpus.strip())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Regression tests for analyzer_common.py
+
+Usage:
+    python3 -m unittest discover tests/puppet-code-analyzer
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+SCRIPTS = Path(__file__).resolve().parents[2] / "skills" / "puppet-code-analyzer" / "scripts"
+sys.path.insert(0, str(SCRIPTS))
+
+from analyzer_common import Baseline, relative_to_target, sarif_uri  # noqa: E402
+
+
+class BaselineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.work = Path(self.tmp.name)
+        self.root = self.work / "root"
+        (self.root / "manifests").mkdir(parents=True)
+        (self.root / "manifests" / "init.pp").write_text("class a {\n  include b\n}\n")
+        # Same relative name, other content, under another working directory
+        (self.work / "other" / "manifests").mkdir(parents=True)
+        (self.work / "other" / "manifests" / "init.pp").write_text("class z {\n  include y\n}\n")
+        self.cwd = os.getcwd()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def fingerprint_from(self, cwd: Path, file: str) -> str:
+        os.chdir(cwd)
+        return Baseline(self.root).fingerprint("rule", file, 2)
+
+    def test_relative_paths_resolve_against_root_first(self):
+        expected = self.fingerprint_from(self.root, "manifests/init.pp")
+        self.assertEqual(self.fingerprint_from(self.work / "other", "manifests/init.pp"), expected)
+        self.assertEqual(self.fingerprint_from(self.work, "root/manifests/init.pp"), expected)
+        self.assertEqual(self.fingerprint_from(self.work, str(self.root / "manifests" / "init.pp")), expected)
+
+    def test_fingerprint_survives_lines_inserted_above(self):
+        baseline = Baseline(self.root)
+        baseline.add("rule", "manifests/init.pp", 2)
+        (self.root / "manifests" / "init.pp").write_text("# header\nclass a {\n    include   b\n}\n")
+        self.assertTrue(Baseline(self.root, baseline.counts).is_known("rule", "manifests/init.pp", 3))
+
+    def test_each_recorded_occurrence_matches_once(self):
+        baseline = Baseline(self.root)
+        baseline.add("rule", "manifests/init.pp", 2)
+        self.assertTrue(baseline.is_known("rule", "manifests/init.pp", 2))
+        self.assertFalse(baseline.is_known("rule", "manifests/init.pp", 2))
+        self.assertEqual(baseline.suppressed, 1)
+
+    def test_save_and_load(self):
+        baseline = Baseline(self.root)
+        baseline.add("rule", "manifests/init.pp", 2)
+        path = self.work / "baseline.json"
+        baseline.save(path)
+        self.assertEqual(Baseline.load(path, self.root).counts, baseline.counts)
+        path.write_text("[]")
+        with self.assertRaises(ValueError):
+            Baseline.load(path, self.root)
+
+
+class SarifUriTest(unittest.TestCase):
+
+    def test_relative_and_absolute_paths(self):
+        self.assertEqual(sarif_uri("site/a.pp"), "site/a.pp")
+        self.assertEqual(sarif_uri("/srv/site/a b.pp"), "file:///srv/site/a%20b.pp")
+
+
+class RelativeToTargetTest(unittest.TestCase):
+
+    def test_names_files_below_the_target_as_given(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            target = Path(tmp) / "site"
+            (target / "m").mkdir(parents=True)
+            manifest = (target / "m" / "c.pp").resolve()
+            manifest.write_text("")
+            self.assertEqual(relative_to_target(target, [manifest]), [target / "m" / "c.pp"])
+            self.assertEqual(relative_to_target(target / "m" / "c.pp", [manifest]), [target / "m" / "c.pp"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Regression tests for check_best_practices.py
+
+Usage:
+    python3 -m unittest discover tests/puppet-code-analyzer
+"""
+
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+SCRIPTS = Path(__file__).resolve().parents[2] / "skills" / "puppet-code-analyzer" / "scripts"
+sys.path.insert(0, str(SCRIPTS))
+
+from check_best_practices import BestPracticeChecker, Profiler  # noqa: E402
+
+GIT_ENV = {"GIT_AUTHOR_NAME": "test", "GIT_AUTHOR_EMAIL": "test@example.com",
+           "GIT_COMMITTER_NAME": "test", "GIT_COMMITTER_EMAIL": "test@example.com"}
+
+MANIFEST = 'class site::{name} {{\n  notify {{ "hello": }}\n  $value = 1\n}}\n'
+
+
+class CheckBestPracticesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.work = Path(self.tmp.name)
+        self.site = self.work / "site" / "manifests"
+        self.site.mkdir(parents=True)
+        (self.site / "a.pp").write_text(MANIFEST.format(name="a"))
+        self.env = dict(os.environ, **GIT_ENV)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def check(self, *args: str, cwd: Path = None) -> list:
+        """Run check_best_practices.py and return its ndjson issues."""
+        result = subprocess.run(
+            [sys.executable, str(SCRIPTS / "check_best_practices.py"), "--format", "ndjson", *args],
+            cwd=cwd or self.work, env=self.env, capture_output=True, text=True, check=False
+        )
+        self.assertIn(result.returncode, (0, 1), result.stdout + result.stderr)
+        return [json.loads(line) for line in result.stdout.splitlines()]
+
+    def git(self, *args: str):
+        subprocess.run(["git", *args], cwd=self.work, env=self.env, capture_output=True, check=True)
+
+    def test_environments_share_results_for_identical_files(self):
+        for env in ("dev", "production", "staging"):
+            manifests = self.work / "envs" / env / "site" / "manifests"
+            manifests.mkdir(parents=True)
+            (manifests / "a.pp").write_text(MANIFEST.format(name="a"))
+        (self.work / "envs" / "dev" / "site" / "manifests" / "b.pp").write_text(MANIFEST.format(name="b"))
+
+        serial = self.check("--environments", "envs")
+        self.assertEqual(self.check("--environments", "--jobs", "3", "envs"), serial)
+
+        per_file = {}
+        for issue in serial:
+            per_file.setdefault(issue["file"], []).append((issue["rule"], issue["line"]))
+        self.assertEqual(sorted(per_file), [f"envs/{env}/site/manifests/{name}" for env, name in
+                                            [("dev", "a.pp"), ("dev", "b.pp"),
+                                             ("production", "a.pp"), ("staging", "a.pp")]])
+        self.assertEqual(len({tuple(issues) for issues in per_file.values()}), 1)
+
+    def test_environment_rule_errors_are_not_swallowed(self):
+        (self.work / "envs" / "dev").mkdir(parents=True)
+        (self.work / "envs" / "dev" / "a.pp").write_text(MANIFEST.format(name="a"))
+
+        def broken_rule(*args):
+            raise RuntimeError("rule bug")
+
+        checker = BestPracticeChecker()
+        checker.run_rules = broken_rule
+        with self.assertRaisesRegex(RuntimeError, "rule bug"):
+            checker.check_environments(self.work / "envs")
+
+    def test_changed_since_reports_paths_like_a_full_run(self):
+        self.git("init", "-q")
+        self.git("add", ".")
+        self.git("commit", "-q", "-m", "base")
+        (self.site / "b.pp").write_text(MANIFEST.format(name="b"))
+
+        changed = self.check("--changed-since", "HEAD", "site")
+        full = [issue for issue in self.check("site") if issue["file"].endswith("b.pp")]
+        self.assertTrue(changed)
+        self.assertEqual(changed, full)
+        self.assertEqual({issue["file"] for issue in changed}, {"site/manifests/b.pp"})
+
+    def test_severity_option_overrides_style_guide_entries(self):
+        guide = self.work / "guide.md"
+        guide.write_text("## Security\n- Forbidden (critical): `notify` - No notify resources\n")
+        args = ["--style-guide", str(guide), "--disable", "string-quotes", "--disable", "parameter-types"]
+
+        self.assertEqual([i["severity"] for i in self.check(*args, "site")], ["critical"])
+        overridden = self.check(*args, "--severity", "style-guide=info", "site")
+        self.assertEqual([(i["severity"], i["category"]) for i in overridden], [("info", "security")])
+
+    def test_profiler_restores_patterns(self):
+        guide = self.work / "guide.md"
+        guide.write_text("## Security\n- Forbidden (critical): `notify` - No notify resources\n")
+        profiler = Profiler()
+        checker = BestPracticeChecker(guide, profiler=profiler)
+        compiled = checker.style_guide.compiled
+        with profiler.instrument(BestPracticeChecker, checker.style_guide):
+            checker.check_file(self.site / "a.pp")
+            self.assertNotIsInstance(BestPracticeChecker.RESOURCE_DECL, re.Pattern)
+            self.assertIsNot(checker.style_guide.compiled, compiled)
+        self.assertIsInstance(BestPracticeChecker.RESOURCE_DECL, re.Pattern)
+        self.assertIs(checker.style_guide.compiled, compiled)
+        self.assertGreater(profiler.regexes["RESOURCE_DECL"][0], 0)
+
+    def test_profile_option_reports_rules(self):
+        result = subprocess.run(
+            [sys.executable, str(SCRIPTS / "check_best_practices.py"), "--profile", "site"],
+            cwd=self.work, capture_output=True, text=True, check=False
+        )
+        self.assertIn(result.returncode, (0, 1), result.stderr)
+        self.assertIn("string-quotes", result.stderr)
+        self.assertIn("site/manifests/a.pp", result.stderr)
+
+    def test_baseline_does_not_depend_on_working_directory(self):
+        baseline = self.work / "baseline.json"
+        subprocess.run(
+            [sys.executable, str(SCRIPTS / "check_best_practices.py"),
+             "--baseline", str(baseline), "--write-baseline", "site"],
+            cwd=self.work, capture_output=True, check=True
+        )
+        self.assertEqual(self.check("--baseline", str(baseline), ".", cwd=self.work / "site"), [],
+                         "run from the target")
+        self.assertEqual(self.check("--baseline", str(baseline), str(self.work / "site"), cwd=self.site),
+                         [], "run from below the target")
+
+        (self.site / "b.pp").write_text(MANIFEST.format(name="b"))
+        self.assertEqual({i["file"] for i in self.check("--baseline", str(baseline), "site")},
+                         {"site/manifests/b.pp"}, "new findings are still reported")
+
+
+if __name__ == "__main__":
+    unittest.main()
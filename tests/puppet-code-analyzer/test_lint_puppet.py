@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""
+Regression tests for lint_puppet.py
+
+puppet-lint is replaced by a stand-in on PATH that reports every double
+quoted string and every class outside its autoloader path, naming files
+the way puppet-lint does, so the tests need neither Ruby nor the gem.
+Files with "slow" in their name make it go quiet for a minute first,
+like a stuck puppet-lint. The resident lint server gets a stand-in
+backend speaking the LintWorker protocol in the same way.
+
+Usage:
+    python3 -m unittest discover tests/puppet-code-analyzer
+"""
+
+import json
+import os
+import shlex
+import subprocess
+import socket
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+SCRIPTS = Path(__file__).resolve().parents[2] / "skills" / "puppet-code-analyzer" / "scripts"
+sys.path.insert(0, str(SCRIPTS))
+
+from generate_corpus import generate_corpus  # noqa: E402
+from lint_puppet import (  # noqa: E402
+    ConfigResolver, LintServer, LintTimeout, LintWorker, command_batches, lint_shards,
+    lint_via_server, module_path, serve_socket, stream_puppet_lint
+)
+
+PUPPET_LINT_STUB = """#!{python}
+import glob, os, re, sys, time
+args = sys.argv[1:]
+if "--version" in args:
+    print("puppet-lint 0.0.0-stub")
+    sys.exit(0)
+fix = "--fix" in args
+paths, skip = [], False
+for arg in args:
+    if skip or arg in ("--config", "--format"):
+        skip = not skip
+    elif not arg.startswith("--"):
+        paths.append(arg)
+with open(os.environ["PUPPET_LINT_STUB_LOG"], "a") as log:
+    log.write(" ".join(paths) + "\\n")
+with open(os.environ["PUPPET_LINT_STUB_LOG"] + ".pids", "a") as log:
+    log.write(f"{{os.getpid()}}\\n")
+for path in paths:
+    files = sorted(glob.glob(path.rstrip("/") + "/**/*.pp", recursive=True)) if os.path.isdir(path) else [path]
+    for name in files:
+        if "slow" in name:
+            time.sleep(60)
+        with open(name) as handle:
+            lines = handle.read().split("\\n")
+        for number, line in enumerate(lines, 1):
+            title = re.match(r"class ([a-z][a-z0-9_:]*)", line)
+            if title:
+                parts = title.group(1).split("::")
+                expected = "/".join([parts[0], "manifests", *(parts[1:] or ["init"])]) + ".pp"
+                if not os.path.abspath(name).endswith("/" + expected):
+                    print(f"{{name}}:{{number}}:1:error:autoloader_layout:"
+                          f"{{title.group(1)}} not in autoload module layout", flush=True)
+            if '"' in line and "$" not in line:
+                kind = "fixed" if fix else "warning"
+                print(f"{{name}}:{{number}}:{{line.index(chr(34)) + 1}}:{{kind}}:double_quoted_strings:"
+                      "double quoted string containing no variables", flush=True)
+                lines[number - 1] = line.replace('"', "'") if fix else line
+        if fix:
+            with open(name, "w") as handle:
+                handle.write("\\n".join(lines))
+"""
+
+WORKER_STUB = """
+import os, sys, time
+with open(sys.argv[1], "a") as log:
+    log.write(f"{os.getpid()}\\n")
+for request in sys.stdin:
+    path = request.rstrip("\\n")
+    if "slow" in path:
+        time.sleep(60)
+    if "crash" in path:
+        sys.exit(1)
+    with open(path) as handle:
+        for number, line in enumerate(handle, 1):
+            if '"' in line and "$" not in line:
+                print(f"{path}:{number}:{line.index(chr(34)) + 1}:warning:double_quoted_strings:"
+                      "double quoted string containing no variables")
+    print(flush=True)
+"""
+
+
+def alive(pid: int) -> bool:
+    """Whether a process is still running (not exited or a zombie)."""
+    try:
+        with open(f"/proc/{pid}/stat") as handle:
+            return handle.read().split(")")[-1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+class LintPuppetTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.work = Path(cls.tmp.name)
+        generate_corpus(cls.work / "corpus", modules=6, classes=5, log_lines=0)
+
+        bin_dir = cls.work / "bin"
+        bin_dir.mkdir()
+        stub = bin_dir / "puppet-lint"
+        stub.write_text(PUPPET_LINT_STUB.format(python=sys.executable))
+        stub.chmod(0o755)
+        cls.env = dict(os.environ, PATH=f"{bin_dir}{os.pathsep}{os.environ['PATH']}",
+                       PUPPET_LINT_STUB_LOG=str(cls.work / "stub.log"))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def run_script(self, *args: str) -> str:
+        """Run lint_puppet.py from the work directory and return its stdout."""
+        result = subprocess.run(
+            [sys.executable, str(SCRIPTS / "lint_puppet.py"), *args],
+            cwd=self.work, env=self.env, capture_output=True, text=True, check=False
+        )
+        self.assertIn(result.returncode, (0, 1), result.stdout + result.stderr)
+        return result.stdout
+
+    def lint(self, *args: str) -> list:
+        """Run lint_puppet.py and return its ndjson results."""
+        return [json.loads(line) for line in self.run_script("--format", "ndjson", *args).splitlines()]
+
+    def test_reports_paths_as_given(self):
+        results = self.lint("--no-cache", "corpus")
+        self.assertTrue(results)
+        self.assertTrue(all(r["file"].startswith("corpus/site-modules/") for r in results))
+
+    def test_jobs_match_serial_run(self):
+        serial = self.lint("--no-cache", "corpus")
+        self.assertEqual(self.lint("--no-cache", "--jobs", "1", "corpus"), serial)
+        self.assertEqual(self.lint("--no-cache", "--jobs", "4", "corpus"), serial)
+
+    def test_cache_matches_no_cache(self):
+        expected = self.lint("--no-cache", "corpus")
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cold = self.lint("--cache-dir", cache_dir, "corpus")
+            warm = self.lint("--cache-dir", cache_dir, "corpus")
+            warm_jobs = self.lint("--cache-dir", cache_dir, "--jobs", "4", "corpus")
+        self.assertEqual(cold, expected)
+        self.assertEqual(warm, expected)
+        self.assertEqual(warm_jobs, expected)
+
+    def test_cache_relints_changed_files_only(self):
+        manifest = self.work / "corpus" / "site-modules" / "mod0" / "manifests" / "extra.pp"
+        log = self.work / "stub.log"
+        with tempfile.TemporaryDirectory() as cache_dir:
+            try:
+                manifest.write_text("class mod0::extra {\n  $a = 'x'\n}\n")
+                self.lint("--cache-dir", cache_dir, "corpus")
+                manifest.write_text("class mod0::extra {\n  notify { \"x\": }\n}\n")
+                log.write_text("")
+                results = self.lint("--cache-dir", cache_dir, "corpus")
+            finally:
+                manifest.unlink()
+        linted = log.read_text().split()
+        self.assertEqual(linted, ["corpus/site-modules/mod0/manifests/extra.pp"])
+        self.assertIn("corpus/site-modules/mod0/manifests/extra.pp", {r["file"] for r in results})
+
+    def test_cache_keeps_identical_content_at_other_paths_apart(self):
+        modules = self.work / "corpus" / "site-modules"
+        copies = [modules / "mod0" / "manifests" / "shared.pp", modules / "mod1" / "manifests" / "shared.pp"]
+        with tempfile.TemporaryDirectory() as cache_dir:
+            try:
+                for copy in copies:
+                    copy.write_text("class mod0::shared {\n  $a = 'x'\n}\n")
+                self.assertEqual(self.lint("--cache-dir", cache_dir, str(copies[0])), [])
+                expected = self.lint("--no-cache", str(copies[1]))
+                self.assertEqual([r["rule_code"] for r in expected], ["autoloader_layout"])
+                self.assertEqual(self.lint("--cache-dir", cache_dir, str(copies[1])), expected)
+            finally:
+                for copy in copies:
+                    copy.unlink()
+
+    def test_module_path(self):
+        self.assertEqual(module_path(Path("/srv/code/ntp/manifests/server/init.pp")),
+                         "ntp/manifests/server/init.pp")
+        self.assertEqual(module_path(Path("/srv/site.pp")), "/srv/site.pp")
+
+    def test_batch_targets_keep_given_names(self):
+        results = self.lint("--no-cache", "corpus/site-modules/mod1",
+                            "corpus/site-modules/mod0/manifests/init.pp")
+        files = {r["file"] for r in results}
+        self.assertIn("corpus/site-modules/mod0/manifests/init.pp", files)
+        self.assertTrue(all(f.startswith("corpus/site-modules/mod") for f in files))
+
+    def test_files_from_stdin_run_one_puppet_lint_per_config(self):
+        batch = self.work / "batch"
+        names = ["batch/a/x.pp", "batch/a/y.pp", "batch/b/z.pp"]
+        try:
+            for group in ("a", "b"):
+                (batch / group).mkdir(parents=True)
+                (batch / group / ".puppet-lint.rc").write_text("--no-140chars-check\n")
+            for name in names:
+                (self.work / name).write_text('notify { "x": }\n')
+            log = self.work / "stub.log"
+            log.write_text("")
+            result = subprocess.run(
+                [sys.executable, str(SCRIPTS / "lint_puppet.py"), "--format", "ndjson",
+                 "--no-cache", "--files-from", "-"],
+                input="".join(f"{name}\n" for name in names),
+                cwd=self.work, env=self.env, capture_output=True, text=True, check=False
+            )
+            self.assertEqual(result.returncode, 1, result.stderr)
+            self.assertEqual([json.loads(line)["file"] for line in result.stdout.splitlines()], names)
+            self.assertEqual(log.read_text().splitlines(), ["batch/a/x.pp batch/a/y.pp", "batch/b/z.pp"])
+        finally:
+            for path in sorted(batch.rglob("*"), reverse=True):
+                path.rmdir() if path.is_dir() else path.unlink()
+            batch.rmdir()
+
+    def test_config_resolver_walks_each_directory_once(self):
+        manifests = self.work / "corpus" / "site-modules" / "mod0" / "manifests"
+        resolver = ConfigResolver()
+        resolver.find(manifests / "init.pp")
+        with mock.patch.object(Path, "exists", autospec=True, side_effect=Path.exists) as exists:
+            self.assertIsNone(resolver.find(manifests / "class0.pp"))
+            self.assertIsNone(resolver.find(manifests.parent.parent / "mod1" / "manifests" / "init.pp"))
+        self.assertEqual(len(exists.call_args_list), 2, "only mod1/manifests and mod1 are new")
+
+    def test_baseline_suppresses_everything_it_recorded(self):
+        with tempfile.TemporaryDirectory() as scratch:
+            baseline = Path(scratch) / "baseline.json"
+            self.run_script("--no-cache", "--baseline", str(baseline), "--write-baseline", "corpus")
+            self.assertEqual(self.lint("--no-cache", "--baseline", str(baseline), "corpus"), [])
+            self.assertEqual(self.lint("--no-cache", "--jobs", "3", "--baseline", str(baseline),
+                                       str(self.work / "corpus")), [])
+
+    def test_command_batches_cap_arguments(self):
+        paths = [Path("site-modules") / f"mod{i}" / "manifests" / "init.pp" for i in range(5000)]
+        batches = command_batches(paths, max_paths=2000, max_bytes=64 * 1024)
+        self.assertEqual([p for batch in batches for p in batch], paths)
+        for batch in batches:
+            self.assertLessEqual(len(batch), 2000)
+            self.assertLessEqual(sum(len(str(p)) + 1 for p in batch), 64 * 1024)
+
+    def test_stream_yields_results_before_timeout(self):
+        cmd = [sys.executable, "-c",
+               "import time; print('a.pp:2:3:warning:x:first', flush=True); time.sleep(60)"]
+        results = []
+        start = time.monotonic()
+        with self.assertRaises(LintTimeout):
+            for r in stream_puppet_lint(cmd, timeout=1):
+                results.append(r)
+                self.assertLess(time.monotonic() - start, 1, "result held back until the timeout")
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertEqual([(r.file, r.line, r.message) for r in results], [("a.pp", 2, "first")])
+
+    def test_timeouts_report_partial_results(self):
+        scratch = self.work / "timeouts"
+        scratch.mkdir()
+        try:
+            for name in ("fast.pp", "slow.pp"):
+                (scratch / name).write_text('class a {\n  notify { "x": }\n}\n')
+            for args in (["--timeout", "1", "--jobs", "2"], ["--total-timeout", "1"]):
+                with self.subTest(args=args):
+                    start = time.monotonic()
+                    result = subprocess.run(
+                        [sys.executable, str(SCRIPTS / "lint_puppet.py"), "--format", "ndjson",
+                         "--no-cache", *args, "timeouts"],
+                        cwd=self.work, env=self.env, capture_output=True, text=True, check=False
+                    )
+                    self.assertLess(time.monotonic() - start, 20)
+                    self.assertEqual(result.returncode, 1, result.stderr)
+                    self.assertIn("partial results", result.stderr)
+                    files = {json.loads(line)["file"] for line in result.stdout.splitlines()}
+                    self.assertEqual(files, {"timeouts/fast.pp"})
+        finally:
+            for pp_file in scratch.iterdir():
+                pp_file.unlink()
+            scratch.rmdir()
+
+    @unittest.skipUnless(Path("/proc/self/stat").exists(), "needs /proc")
+    def test_closing_early_kills_running_puppet_lint(self):
+        with tempfile.TemporaryDirectory() as scratch:
+            fast = Path(scratch) / "fast.pp"
+            slow = Path(scratch) / "slow.pp"
+            for pp_file in (fast, slow):
+                pp_file.write_text('class a {\n  notify { "x": }\n}\n')
+            pids = Path(self.env["PUPPET_LINT_STUB_LOG"] + ".pids")
+            pids.write_text("")
+
+            start = time.monotonic()
+            with mock.patch.dict(os.environ, self.env):
+                results = lint_shards([fast, slow], jobs=2)
+                self.assertEqual(next(results).file, str(fast))
+                results.close()
+            self.assertLess(time.monotonic() - start, 10)
+
+            started = [int(pid) for pid in pids.read_text().split()]
+            self.assertEqual(len(started), 2)
+            deadline = time.monotonic() + 5
+            while any(alive(pid) for pid in started) and time.monotonic() < deadline:
+                time.sleep(0.05)
+            self.assertFalse(any(alive(pid) for pid in started))
+
+
+class LintServerTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.work = Path(cls.tmp.name)
+        generate_corpus(cls.work / "corpus", modules=3, classes=3, log_lines=0)
+        cls.files = sorted((cls.work / "corpus").rglob("*.pp"))
+        for name in ("slow.pp", "crash.pp"):
+            (cls.work / name).write_text('notify { "x": }\n')
+        backend = cls.work / "worker.py"
+        backend.write_text(WORKER_STUB)
+        cls.log = cls.work / "workers.log"
+        cls.command = [sys.executable, str(backend), str(cls.log)]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def setUp(self):
+        self.log.write_text("")
+
+    def expected(self, files) -> list:
+        """What the stand-in backend reports for files, one at a time."""
+        worker = LintWorker(self.command)
+        try:
+            return [r.to_dict() for pp_file in files for r in worker.lint(pp_file)]
+        finally:
+            worker.close()
+
+    def workers_started(self) -> int:
+        return len(self.log.read_text().split())
+
+    def test_worker_answers_each_request(self):
+        worker = LintWorker(self.command)
+        try:
+            results = [worker.lint(pp_file) for pp_file in self.files]
+        finally:
+            worker.close()
+        self.assertTrue(any(results))
+        for pp_file, found in zip(self.files, results):
+            self.assertTrue(all(r.file == str(pp_file) for r in found))
+        self.assertEqual(self.workers_started(), 1)
+
+    def test_worker_timeout_and_exit_raise(self):
+        for name, timeout in (("slow.pp", 1), ("crash.pp", None)):
+            with self.subTest(name=name):
+                worker = LintWorker(self.command)
+                start = time.monotonic()
+                with self.assertRaises(RuntimeError):
+                    worker.lint(self.work / name, timeout)
+                self.assertLess(time.monotonic() - start, 10)
+                worker.close()
+
+    def test_server_keeps_workers_warm_between_requests(self):
+        expected = self.expected(self.files)
+        self.log.write_text("")
+        server = LintServer(self.command, workers=2)
+        try:
+            self.assertEqual([r.to_dict() for r in server.lint(self.files)], expected)
+            self.assertEqual([r.to_dict() for r in server.lint([self.work / "corpus"])], expected)
+        finally:
+            server.close()
+        self.assertLessEqual(self.workers_started(), 2)
+
+    def test_server_replaces_failed_workers(self):
+        server = LintServer(self.command, workers=1, timeout=1)
+        try:
+            for name in ("crash.pp", "slow.pp"):
+                response, _ = server.handle(json.dumps(
+                    {"jsonrpc": "2.0", "id": 1, "method": "lint", "params": {"paths": [str(self.work / name)]}}
+                ))
+                self.assertEqual(response["error"]["code"], -32603)
+            self.assertEqual([r.to_dict() for r in server.lint(self.files[:1])], self.expected(self.files[:1]))
+        finally:
+            server.close()
+
+    def test_server_rejects_bad_requests(self):
+        server = LintServer(self.command)
+        requests = [
+            ("not json", -32700),
+            ("[1]", -32600),
+            ('{"jsonrpc": "2.0", "id": 1, "method": "format"}', -32601),
+            ('{"jsonrpc": "2.0", "id": 1, "method": "lint", "params": {"paths": "a.pp"}}', -32602),
+            ('{"jsonrpc": "2.0", "id": 1, "method": "lint", "params": {"paths": ["/no/such.pp"]}}', -32602),
+        ]
+        try:
+            for line, code in requests:
+                with self.subTest(line=line):
+                    response, stop = server.handle(line)
+                    self.assertEqual(response["error"]["code"], code)
+                    self.assertFalse(stop)
+            response, stop = server.handle('{"jsonrpc": "2.0", "id": 7, "method": "shutdown"}')
+            self.assertEqual(response, {"jsonrpc": "2.0", "id": 7, "result": None})
+            self.assertTrue(stop)
+        finally:
+            server.close()
+        self.assertEqual(self.workers_started(), 0)
+
+    def test_lint_via_server_over_socket(self):
+        address = self.work / "lint.sock"
+        server = LintServer(self.command, workers=2)
+        thread = threading.Thread(target=serve_socket, args=(server, address), daemon=True)
+        thread.start()
+        try:
+            deadline = time.monotonic() + 5
+            while not address.exists() and time.monotonic() < deadline:
+                time.sleep(0.05)
+            results = lint_via_server(address, [self.work / "corpus"], timeout=10)
+            self.assertEqual([r.to_dict() for r in results], self.expected(self.files))
+            with self.assertRaisesRegex(RuntimeError, "does not exist"):
+                lint_via_server(address, [self.work / "missing.pp"], timeout=10)
+        finally:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(str(address))
+                sock.sendall(b'{"jsonrpc": "2.0", "id": 2, "method": "shutdown"}\n')
+                sock.recv(1024)
+            thread.join(10)
+            server.close()
+        self.assertFalse(thread.is_alive())
+        self.assertFalse(address.exists())
+
+    def test_serve_stdio(self):
+        requests = [
+            {"jsonrpc": "2.0", "id": 1, "method": "lint", "params": {"paths": [str(self.work / "corpus")]}},
+            {"jsonrpc": "2.0", "id": 2, "method": "shutdown"},
+        ]
+        result = subprocess.run(
+            [sys.executable, str(SCRIPTS / "lint_puppet.py"), "--serve", "-",
+             "--worker-command", shlex.join(self.command)],
+            input="".join(json.dumps(r) + "\n" for r in requests),
+            capture_output=True, text=True, timeout=60, check=False
+        )
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+        responses = [json.loads(line) for line in result.stdout.splitlines()]
+        self.assertEqual([r["id"] for r in responses], [1, 2])
+        self.assertEqual(responses[0]["result"], self.expected(self.files))
+
+
+if __name__ == "__main__":
+    unittest.main()